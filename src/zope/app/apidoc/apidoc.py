@@ -20,11 +20,17 @@ import zope.component
 from zope.interface import implementer
 from zope.location.interfaces import ILocation
 from zope.publisher.browser import applySkin
+from zope.security.proxy import removeSecurityProxy
 
 from zope.app.apidoc.interfaces import IDocumentationModule
 from zope.app.apidoc.utilities import ReadContainerBase
 
 
+# The attribute of the traversed objects that keeps their documentation; it
+# is volatile, so that persistent objects do not store it.
+_DOCUMENTATIONS = '_v_apidocDocumentations'
+
+
 @implementer(ILocation)
 class APIDocumentation(ReadContainerBase):
     """
@@ -95,4 +101,18 @@ class apidocNamespace:
 
 def handleNamespace(ob, name):
     """Used to traverse to an API Documentation."""
-    return APIDocumentation(ob, '++apidoc++' + name)
+    # The documentation is kept on ob, so that traversing to it again, for
+    # example in the next request, reuses it together with the copies of the
+    # documentation modules made beneath it. Its parent is not the proxy of
+    # the request that made it, but ob itself; it is proxied again when it
+    # is traversed to.
+    name = '++apidoc++' + name
+    naked = removeSecurityProxy(ob)
+    try:
+        documentations = naked.__dict__.setdefault(_DOCUMENTATIONS, {})
+    except AttributeError:
+        return APIDocumentation(ob, name)
+    apidoc = documentations.get(name)
+    if apidoc is None:
+        apidoc = documentations[name] = APIDocumentation(naked, name)
+    return apidoc
@@ -13,9 +13,13 @@
 ##############################################################################
 """Class Registry
 """
+import heapq
 import operator
+import re
 import sys
+import time
 
+from zope.interface import implementedBy
 from zope.testing.cleanup import addCleanUp
 
 
@@ -23,16 +27,116 @@ __docformat__ = 'restructuredtext'
 
 __import_unknown_modules__ = False
 
+
+class _ModuleList(list):
+    # A list of module names that counts its changes, so that the pattern
+    # matching them is only compiled again when they change.
+
+    version = 0
+
+
+def _changing(name):
+    method = getattr(list, name)
+
+    def change(self, *args, **kwargs):
+        self.version += 1
+        return method(self, *args, **kwargs)
+
+    change.__name__ = name
+    return change
+
+
+for _name in ('__setitem__', '__delitem__', '__iadd__', '__imul__',
+              'append', 'extend', 'insert', 'pop', 'remove', 'clear',
+              'sort', 'reverse'):
+    setattr(_ModuleList, _name, _changing(_name))
+
+
 # List of modules that should never be imported.
 # TODO: List hard-coded for now.
-IGNORE_MODULES = ['twisted']
+IGNORE_MODULES = _ModuleList(['twisted'])
+
+_countgetter = operator.itemgetter(1)
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _matchRank(path, text):
+    # Exact names first, then names and paths starting with the text, then
+    # the other matches; shorter paths first.
+    name = path.rsplit('.', 1)[-1]
+    if name == text:
+        rank = 0
+    elif name.startswith(text):
+        rank = 1
+    elif path.startswith(text):
+        rank = 2
+    else:
+        rank = 3
+    return rank, len(path), path
+
+
+def _implementedIdentifiers(klass):
+    try:
+        spec = implementedBy(klass)
+    except TypeError:
+        return ()
+    return tuple({iface.__identifier__ for iface in spec.flattened()})
+
+
+def _className(klass):
+    return '{}.{}'.format(getattr(klass, '__module__', None),
+                          getattr(klass, '__qualname__', None))
+
 
+def describeClass(klass):
+    """Describe what the class registry indexes for klass.
 
-_pathgetter = operator.itemgetter(0)
+    The description is a dictionary of lists of strings: the identifiers of
+    the interfaces the class implements, and the dotted names of its base
+    classes and direct base classes. It can be stored as JSON and given to
+    :meth:`ClassRegistry.defer`.
+    """
+    return {
+        'interfaces': sorted(_implementedIdentifiers(klass)),
+        'bases': [_className(base)
+                  for base in getattr(klass, '__mro__', ())[1:]],
+        'directBases': [_className(base)
+                        for base in getattr(klass, '__bases__', ())],
+    }
+
+
+class _DeferredClass:
+    # A registry entry whose class is imported only when it is needed.
+
+    __slots__ = ('path', 'info')
+
+    def __init__(self, path, info):
+        self.path = path
+        self.info = info
+
+    def resolve(self):
+        module_path, name = self.path.rsplit('.', 1)
+        module = safe_import(module_path)
+        klass = getattr(module, name, None)
+        return klass if isinstance(klass, type) else None
 
 
 class ClassRegistry(dict):
-    """A simple registry for classes."""
+    """A simple registry for classes.
+
+    The registry keeps indexes of the interfaces the classes implement, of
+    their base classes and of the trigrams of their paths, which are
+    updated whenever an entry is set or removed. Interfaces declared for a
+    class only after it was registered are not in the index; register the
+    class again to update it.
+
+    Entries can also be added with :meth:`defer`, from a description of the
+    class; the class is then only imported when it is looked up, or, once
+    its module is imported, when the classes implementing an interface are.
+    """
 
     # This is not a WeakValueDictionary; the classes in here
     # are kept alive almost certainly by the codemodule.class_.Class object,
@@ -41,23 +145,244 @@ class ClassRegistry(dict):
     # global site manager. So they can't go away without clearing all that,
     # which happens (usually only) with test tear downs.
 
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        #: Maps interface identifiers to the paths of the classes
+        #: implementing them, directly or not.
+        self._implementers = {}
+        #: Maps the dotted names of classes to the paths of their
+        #: registered subclasses.
+        self._subclasses = {}
+        #: Maps the dotted names of classes to the paths of their
+        #: registered direct subclasses.
+        self._directSubclasses = {}
+        #: Maps the three-character substrings of the paths to the paths.
+        self._pathTrigrams = {}
+        #: Maps paths to what we indexed for them: the interface
+        #: identifiers, the base classes, the direct base classes and the
+        #: trigrams of the path.
+        self._indexed = {}
+        #: The paths of the entries that are not imported yet.
+        self._deferred = set()
+        #: Registers the classes that are not registered yet; see
+        #: setCompleter().
+        self._completer = None
+        self.update(*args, **kwargs)
+
+    def setCompleter(self, complete):
+        """Call complete before the next lookup that needs all classes.
+
+        The lookups by interface, by base class and by path do; getting a
+        class does not. complete registers the classes that are missing;
+        it is called only once.
+        """
+        self._completer = complete
+
+    def _complete(self):
+        complete, self._completer = self._completer, None
+        if complete is not None:
+            complete()
+
+    def _index(self, path, klass):
+        if isinstance(klass, _DeferredClass):
+            info = klass.info
+            self._deferred.add(path)
+        else:
+            info = describeClass(klass)
+        identifiers = tuple(info['interfaces'])
+        bases = tuple(info['bases'])
+        direct_bases = tuple(info['directBases'])
+        trigrams = tuple(_trigrams(path))
+        self._indexed[path] = (identifiers, bases, direct_bases, trigrams)
+        for index, keys in ((self._implementers, identifiers),
+                            (self._subclasses, bases),
+                            (self._directSubclasses, direct_bases),
+                            (self._pathTrigrams, trigrams)):
+            for key in keys:
+                index.setdefault(key, set()).add(path)
+
+    def _unindex(self, path):
+        self._deferred.discard(path)
+        indexed = self._indexed.pop(path, None)
+        if indexed is None:
+            return
+        for index, keys in zip((self._implementers, self._subclasses,
+                                self._directSubclasses, self._pathTrigrams),
+                               indexed):
+            for key in keys:
+                paths = index[key]
+                paths.discard(path)
+                if not paths:
+                    del index[key]
+
+    def __setitem__(self, path, klass):
+        self._unindex(path)
+        super().__setitem__(path, klass)
+        self._index(path, klass)
+
+    def __getitem__(self, path):
+        klass = super().__getitem__(path)
+        if isinstance(klass, _DeferredClass):
+            resolved = klass.resolve()
+            if resolved is None:
+                # The class is gone; forget it.
+                del self[path]
+                raise KeyError(path)
+            self[path] = klass = resolved
+        return klass
+
+    def __delitem__(self, path):
+        super().__delitem__(path)
+        self._unindex(path)
+
+    def get(self, path, default=None):
+        try:
+            return self[path]
+        except KeyError:
+            return default
+
+    def values(self):
+        if not self._deferred:
+            return super().values()
+        return [klass for _, klass in self.items()]
+
+    def items(self):
+        if not self._deferred:
+            return super().items()
+        return list(self._resolved(list(self)))
+
+    def _resolved(self, paths):
+        # The entries for paths, leaving out the classes that are gone.
+        for path in paths:
+            klass = self.get(path)
+            if klass is not None:
+                yield path, klass
+
+    def defer(self, path, info):
+        """Add a class that is imported only when it is looked up.
+
+        The class is the one named like the last part of path in the module
+        named by the rest of it. info is its description, as returned by
+        :func:`describeClass`. Registered classes are not replaced.
+        Classes that cannot be imported when they are looked up are removed
+        from the registry.
+        """
+        if path not in self:
+            self[path] = _DeferredClass(path, info)
+
+    def clear(self):
+        super().clear()
+        self._deferred.clear()
+        self._implementers.clear()
+        self._subclasses.clear()
+        self._directSubclasses.clear()
+        self._pathTrigrams.clear()
+        self._indexed.clear()
+
+    def pop(self, path, *default):
+        if path not in self:
+            return super().pop(path, *default)
+        klass = self.get(path)
+        if klass is None:
+            if default:
+                return default[0]
+            raise KeyError(path)
+        del self[path]
+        return klass
+
+    def popitem(self):
+        path, klass = super().popitem()
+        self._unindex(path)
+        if isinstance(klass, _DeferredClass):
+            klass = klass.resolve()
+        return path, klass
+
+    def setdefault(self, path, default=None):
+        if path not in self:
+            self[path] = default
+        return self[path]
+
+    def update(self, *args, **kwargs):
+        for path, klass in dict(*args, **kwargs).items():
+            self[path] = klass
+
     def getClassesThatImplement(self, iface):
         """Return all class items that implement iface.
 
         Methods returns a sorted list of 2-tuples of the form (path, class).
         """
-        return sorted(((path, klass) for path, klass in self.items()
-                       if iface.implementedBy(klass)),
-                      key=_pathgetter)
+        self._complete()
+        self._resolveImported()
+        paths = self._implementers.get(iface.__identifier__, ())
+        # Different interfaces may share an identifier.
+        return [(path, klass)
+                for path, klass in self._resolved(sorted(paths))
+                if iface.implementedBy(klass)]
+
+    def _resolveImported(self):
+        # The interfaces of a deferred class may be declared after it is
+        # described, for example in ZCML. Index the classes whose modules
+        # are imported anyway as they are now.
+        for path in list(self._deferred):
+            if path.rpartition('.')[0] in sys.modules:
+                self.get(path)
+
+    def _getItems(self, index, klass, accept):
+        self._complete()
+        # Different classes may share a name.
+        paths = index.get(_className(klass), ())
+        return [(path, found)
+                for path, found in self._resolved(sorted(paths))
+                if accept(found)]
 
     def getSubclassesOf(self, klass):
         """Return all class items that are proper subclasses of klass.
 
         Methods returns a sorted list of 2-tuples of the form (path, class).
+        Only real subclasses are found, not the virtual subclasses of
+        abstract base classes.
+        """
+        return self._getItems(self._subclasses, klass,
+                              lambda found: klass in found.__mro__[1:])
+
+    def findPaths(self, text, limit=None):
+        """Return the paths that contain text, best matches first.
+
+        Paths whose last name is text come first, then those whose last
+        name or whole path starts with text, then all others; shorter paths
+        come before longer ones. At most limit paths are returned, if
+        given.
         """
-        return sorted(((path, klass2) for path, klass2 in self.items()
-                       if issubclass(klass2, klass) and klass2 is not klass),
-                      key=_pathgetter)
+        self._complete()
+        if len(text) < 3:
+            candidates = self.keys()
+        else:
+            # Only the paths that have all the trigrams of text can
+            # contain it; start with the rarest one.
+            sets = []
+            for trigram in _trigrams(text):
+                paths = self._pathTrigrams.get(trigram)
+                if not paths:
+                    return []
+                sets.append(paths)
+            sets.sort(key=len)
+            candidates = sets[0].intersection(*sets[1:])
+        matches = (path for path in candidates if text in path)
+
+        def key(path):
+            return _matchRank(path, text)
+
+        if limit is None:
+            return sorted(matches, key=key)
+        return heapq.nsmallest(limit, matches, key=key)
+
+    def getDirectSubclassesOf(self, klass):
+        """Return all class items that have klass as a direct base class.
+
+        Methods returns a sorted list of 2-tuples of the form (path, class).
+        """
+        return self._getItems(self._directSubclasses, klass,
+                              lambda found: klass in found.__bases__)
 
 
 #: The global class registry object. Cleaned up
@@ -67,22 +392,105 @@ classRegistry = ClassRegistry()
 
 def cleanUp():
     classRegistry.clear()
+    classRegistry.setCompleter(None)
+    _failedImports.clear()
+    _importTimes.clear()
 
 
 addCleanUp(cleanUp)
 
 
+# Maps the paths that could not be imported to the number of times they
+# were looked up.
+_failedImports = {}
+# Maps the imported paths to the seconds it took.
+_importTimes = {}
+# The IGNORE_MODULES list, its version and the function matching their
+# prefixes.
+_ignoreMatcher = (None, None, None)
+
+
+def setIgnoreModules(names):
+    """Replace `IGNORE_MODULES` by the module *names*.
+
+    The list that was replaced is returned.
+    """
+    global IGNORE_MODULES
+    old = IGNORE_MODULES
+    if not isinstance(names, _ModuleList):
+        names = _ModuleList(names)
+    IGNORE_MODULES = names
+    return old
+
+
+def _compileIgnored():
+    global _ignoreMatcher
+    if not isinstance(IGNORE_MODULES, _ModuleList):
+        # The list was replaced without setIgnoreModules().
+        setIgnoreModules(IGNORE_MODULES)
+    names = IGNORE_MODULES
+    if names:
+        match = re.compile('|'.join(
+            re.escape(name) for name in sorted(names))).match
+    else:
+        def match(path):
+            return None
+    _ignoreMatcher = (names, names.version, match)
+    return match
+
+
+def isIgnored(path):
+    """Return whether path starts with one of the `IGNORE_MODULES`.
+
+    The names are matched by a regular expression, which is compiled again
+    when `IGNORE_MODULES` is changed or replaced.
+    """
+    names, version, match = _ignoreMatcher
+    if names is not IGNORE_MODULES or version != names.version:
+        match = _compileIgnored()
+    return match(path) is not None
+
+
 def safe_import(path, default=None):
-    """Import a given path as efficiently as possible and without failure."""
+    """Import a given path as efficiently as possible and without failure.
+
+    Paths that could not be imported are not tried again.
+    """
+    if isIgnored(path):
+        return default
     module = sys.modules.get(path, default)
-    for exclude_name in IGNORE_MODULES:
-        if path.startswith(exclude_name):
-            return default
     if module is default and __import_unknown_modules__:
+        if path in _failedImports:
+            _failedImports[path] += 1
+            return default
+        start = time.perf_counter()
         try:
             module = __import__(path, {}, {}, ('*',))
         # Some software, we cannot control, might raise all sorts of errors;
         # thus catch all exceptions and return the default.
         except Exception:
+            _failedImports[path] = 1
             return default
+        finally:
+            _importTimes[path] = time.perf_counter() - start
     return module
+
+
+def getImportStatistics(top=10):
+    """Return statistics of the imports done by `safe_import`.
+
+    This is a dictionary with the number of ``imports`` tried, how many of
+    them were ``failures``, the total ``seconds`` they took, the *top*
+    ``slowest`` imports as ``(path, seconds)`` pairs, and the *top* most
+    ``failing`` paths, with the number of times they were looked up, as
+    ``(path, count)`` pairs.
+    """
+    return {
+        'imports': len(_importTimes),
+        'failures': len(_failedImports),
+        'seconds': sum(_importTimes.values()),
+        'slowest': heapq.nlargest(top, _importTimes.items(),
+                                  key=_countgetter),
+        'failing': heapq.nlargest(top, _failedImports.items(),
+                                  key=_countgetter),
+    }
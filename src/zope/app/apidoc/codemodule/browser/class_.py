@@ -26,8 +26,8 @@ from zope.traversing.browser import absoluteURL
 from zope.traversing.interfaces import TraversalError
 
 from zope.app.apidoc.browser.utilities import findAPIDocumentationRoot
+from zope.app.apidoc.utilities import getAllPermissionIds
 from zope.app.apidoc.utilities import getFunctionSignature
-from zope.app.apidoc.utilities import getPermissionIds
 from zope.app.apidoc.utilities import getPythonPath
 from zope.app.apidoc.utilities import isReferencable
 from zope.app.apidoc.utilities import renderText
@@ -109,16 +109,19 @@ class ClassDetails:
         # remove the security proxy, so that `attr` is not proxied. We could
         # unproxy `attr` for each turn, but that would be less efficient.
         #
-        # `getPermissionIds()` also expects the class's security checker not
-        # to be proxied.
+        # `getAllPermissionIds()` also expects the class's security checker
+        # not to be proxied.
         klass = removeSecurityProxy(self.context)
-        for name, attr, iface in klass.getAttributes():
+        attributes = klass.getAttributes()
+        permissions = getAllPermissionIds(
+            [name for name, _, _ in attributes], klass.getSecurityChecker())
+        for name, attr, iface in attributes:
             entry = {'name': name,
                      'value': repr(attr),
                      'type': type(attr).__name__,
                      'type_link': getTypeLink(type(attr)),
                      'interface': getInterfaceInfo(iface)}
-            entry.update(getPermissionIds(name, klass.getSecurityChecker()))
+            entry.update(permissions[name])
             attrs.append(entry)
         return attrs
 
@@ -128,25 +131,31 @@ class ClassDetails:
         # remove the security proxy, so that `attr` is not proxied. We could
         # unproxy `attr` for each turn, but that would be less efficient.
         #
-        # `getPermissionIds()` also expects the class's security checker not
-        # to be proxied.
+        # `getAllPermissionIds()` also expects the class's security checker
+        # not to be proxied.
         klass = removeSecurityProxy(self.context)
-        for name, attr, iface in klass.getMethodDescriptors():
+        descriptors = klass.getMethodDescriptors()
+        functions = klass.getMethods()
+        permissions = getAllPermissionIds(
+            [name for name, _, _ in descriptors]
+            + [name for name, _, _ in functions],
+            klass.getSecurityChecker())
+        for name, attr, iface in descriptors:
             entry = {'name': name,
                      'signature': "(...)",
                      'doc': renderText(attr.__doc__ or '',
                                        inspect.getmodule(attr)),
                      'interface': getInterfaceInfo(iface)}
-            entry.update(getPermissionIds(name, klass.getSecurityChecker()))
+            entry.update(permissions[name])
             methods.append(entry)
 
-        for name, attr, iface in klass.getMethods():
+        for name, attr, iface in functions:
             entry = {'name': name,
                      'signature': getFunctionSignature(attr, ignore_self=True),
                      'doc': renderText(attr.__doc__ or '',
                                        inspect.getmodule(attr)),
                      'interface': getInterfaceInfo(iface)}
-            entry.update(getPermissionIds(name, klass.getSecurityChecker()))
+            entry.update(permissions[name])
             methods.append(entry)
         return methods
 
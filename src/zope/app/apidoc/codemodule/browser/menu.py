@@ -38,9 +38,14 @@ class Menu:
     context = None
     request = None
 
+    #: The maximum number of classes `findClasses()` returns.
+    maxResults = 200
+
     def findClasses(self):
         """Find the classes that match a partial path.
 
+        The best `maxResults` matches are returned, sorted by path.
+
         Examples::
           Setup the view.
 
@@ -67,20 +72,28 @@ class Menu:
           >>> info = menu.findClasses()
           >>> pprint(info)
           []
+
+          Only the best matches are returned; the classes named like the
+          search come first.
+
+          >>> menu.maxResults = 1
+          >>> menu.request = TestRequest(form={'path': 'Menu'})
+          >>> pprint(menu.findClasses())
+          [{'path': 'zope.app.apidoc.ifacemodule.menu.Menu',
+            'url': 'http://.../Code/zope/app/apidoc/ifacemodule/menu/Menu/'}]
         """
         path = self.request.get('path', None)
         if path is None:
             return []
         classModule = findAPIDocumentationRoot(self.context)['Code']
-        removeSecurityProxy(classModule).setup()
-        found = [p for p in classRegistry if path in p]
-        results = []
-        for p in found:
-            klass = traverse(classModule, p.replace('.', '/'))
-            results.append({
-                'path': p,
-                'url': absoluteURL(klass, self.request) + '/'
-            })
+        removeSecurityProxy(classModule).setupTree()
+        found = classRegistry.findPaths(path, self.maxResults)
+        # The URLs of the classes follow their paths; we do not need to
+        # traverse to them.
+        module_url = absoluteURL(classModule, self.request)
+        results = [{'path': p,
+                    'url': '{}/{}/'.format(module_url, p.replace('.', '/'))}
+                   for p in found]
         results.sort(key=_pathgetter)
         return results
 
@@ -116,7 +129,8 @@ class Menu:
           1
         """
         classModule = findAPIDocumentationRoot(self.context)['Code']
-        removeSecurityProxy(classModule).setup()  # run setup if not yet done
+        # run setup if not yet done
+        removeSecurityProxy(classModule).setupTree()
         results = []
         counter = 0
 
@@ -25,6 +25,7 @@ from zope.app.apidoc.browser.utilities import findAPIDocumentationRootURL
 from zope.app.apidoc.codemodule.interfaces import IClassDocumentation
 from zope.app.apidoc.codemodule.interfaces import IFunctionDocumentation
 from zope.app.apidoc.codemodule.interfaces import IModuleDocumentation
+from zope.app.apidoc.codemodule.interfaces import ISourceInterface
 from zope.app.apidoc.codemodule.interfaces import ITextFile
 from zope.app.apidoc.codemodule.interfaces import IZCMLFile
 from zope.app.apidoc.utilities import getPythonPath
@@ -78,7 +79,8 @@ class ModuleDetails(BrowserView):
                 entry['doc'] = formatDocString(
                     obj.getDocString(), obj.getPath(), True)
                 self.modules.append(entry)
-            elif IInterface.providedBy(obj):
+            elif (IInterface.providedBy(obj)
+                  or ISourceInterface.providedBy(obj)):
                 entry['path'] = getPythonPath(removeAllProxies(obj))
                 entry['doc'] = formatDocString(
                     obj.__doc__, obj.__module__, True)
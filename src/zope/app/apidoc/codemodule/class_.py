@@ -16,9 +16,11 @@
 
 __docformat__ = 'restructuredtext'
 
+import collections
 from inspect import isfunction
 from inspect import ismethoddescriptor
 
+from zope.cachedescriptors.property import Lazy
 from zope.interface import implementedBy
 from zope.interface import implementer
 from zope.location.interfaces import ILocation
@@ -26,8 +28,18 @@ from zope.security.checker import getCheckerForInstancesOf
 
 from zope.app.apidoc.classregistry import classRegistry
 from zope.app.apidoc.codemodule.interfaces import IClassDocumentation
-from zope.app.apidoc.utilities import getInterfaceForAttribute
-from zope.app.apidoc.utilities import getPublicAttributes
+
+
+#: The kinds of attributes of a class.
+ATTRIBUTE = 'attribute'
+METHOD = 'method'
+METHOD_DESCRIPTOR = 'methodDescriptor'
+
+
+#: A public attribute of a class: its name, value and kind, the interface
+#: declaring it, if any, and the class in whose namespace it is found.
+AttributeInfo = collections.namedtuple(
+    'AttributeInfo', 'name obj kind interface declaredIn')
 
 
 @implementer(ILocation, IClassDocumentation)
@@ -66,28 +78,58 @@ class Class:
         """See :class:`~zope.app.apidoc.codemodule.interfaces.IClassDocumentation`."""  # noqa: E501 line too long
         return self.__interfaces
 
-    def _iterAllAttributes(self):
-        for name in getPublicAttributes(self.__klass):
-            iface = getInterfaceForAttribute(
-                name, self.__all_ifaces, asPath=False)
-            yield name, getattr(self.__klass, name), iface
+    @Lazy
+    def _attributes(self):
+        # Classify the public attributes once; the table is shared by
+        # getAttributes(), getMethods() and getMethodDescriptors().
+        klass = self.__klass
+        ifaces = {}
+        for iface in self.__all_ifaces:
+            for name in iface.names():
+                ifaces.setdefault(name, iface)
+        table = []
+        for name in dir(klass):
+            if name.startswith('_'):
+                continue
+            try:
+                obj = getattr(klass, name)
+            except AttributeError:
+                continue
+            if isfunction(obj):
+                kind = METHOD
+            elif ismethoddescriptor(obj):
+                kind = METHOD_DESCRIPTOR
+            else:
+                kind = ATTRIBUTE
+            declaredIn = next((base for base in klass.__mro__
+                               if name in vars(base)), None)
+            table.append(
+                AttributeInfo(name, obj, kind, ifaces.get(name), declaredIn))
+        return tuple(table)
+
+    def _getAttributesOfKind(self, kind):
+        return [(info.name, info.obj, info.interface)
+                for info in self._attributes
+                if info.kind == kind]
+
+    def getAttributeTable(self):
+        """Get the public attributes of the class.
+
+        They are returned as a tuple of :class:`AttributeInfo`, sorted by
+        name. The table is made the first time it is asked for.
+        """
+        return self._attributes
 
     def getAttributes(self):
         """See :class:`~zope.app.apidoc.codemodule.interfaces.IClassDocumentation`."""  # noqa: E501 line too long
-        return [(name, obj, iface)
-                for name, obj, iface in self._iterAllAttributes()
-                if not isfunction(obj) and not ismethoddescriptor(obj)]
+        return self._getAttributesOfKind(ATTRIBUTE)
 
     def getMethods(self):
         """See :class:`~zope.app.apidoc.codemodule.interfaces.IClassDocumentation`."""  # noqa: E501 line too long
-        return [(name, obj, iface)
-                for name, obj, iface in self._iterAllAttributes()
-                if isfunction(obj)]
+        return self._getAttributesOfKind(METHOD)
 
     def getMethodDescriptors(self):
-        return [(name, obj, iface)
-                for name, obj, iface in self._iterAllAttributes()
-                if ismethoddescriptor(obj)]
+        return self._getAttributesOfKind(METHOD_DESCRIPTOR)
 
     def getSecurityChecker(self):
         """See :class:`~zope.app.apidoc.codemodule.interfaces.IClassDocumentation`."""  # noqa: E501 line too long
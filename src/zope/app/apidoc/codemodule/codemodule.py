@@ -26,10 +26,14 @@ import zope.component
 from zope.i18nmessageid import ZopeMessageFactory as _
 from zope.interface import implementer
 
+from zope.app.apidoc.classregistry import classRegistry
 from zope.app.apidoc.classregistry import safe_import
+from zope.app.apidoc.codemodule import snapshot
+from zope.app.apidoc.codemodule import source
 from zope.app.apidoc.codemodule.interfaces import IAPIDocRootModule
 from zope.app.apidoc.codemodule.module import Module
 from zope.app.apidoc.interfaces import IDocumentationModule
+from zope.app.apidoc.utilities import cachedLocatedCopy
 
 
 @implementer(IDocumentationModule)
@@ -62,10 +66,18 @@ class CodeModule(Module):
     permissions required to access it.
     """)
 
+    _copyGeneration = 0
+
     def __init__(self):
         """Initialize object."""
         super().__init__(None, '', None, False)
         self.__isSetup = False
+        # The classes are registered as their modules are set up; the
+        # registry has the rest set up when it is asked about all classes.
+        classRegistry.setCompleter(_completeClassRegistry)
+        # The copies made with withParentAndName() before have the modules
+        # of the previous set up.
+        self._copyGeneration += 1
 
     def setup(self):
         """Setup module and class tree."""
@@ -73,18 +85,40 @@ class CodeModule(Module):
             return
         self.__isSetup = True
         self._children = {}
+        # Document the modules from their source code, or build the
+        # modules that did not change from the snapshot, if there is one.
+        store = analysis = None
+        getModule = _getModule
+        if source.sourceAnalysis:
+            analysis = source.Analysis(source.sourceWorkers)
+            getModule = analysis.getModule
+        elif snapshot.snapshotFile:
+            store = snapshot.Snapshot(snapshot.snapshotFile)
+            getModule = store.getModule
         for name, mod in zope.component.getUtilitiesFor(IAPIDocRootModule):
-            module = safe_import(mod)
+            module = getModule(self, name, mod)
             if module is not None:
-                self._children[name] = Module(self, name, module)
+                self._children[name] = module
 
         # And the builtins are always available, since that's the
         # most common root module linked to from docs.
-        builtin_module = safe_import('builtins')
+        builtin_module = getModule(self, 'builtins', 'builtins')
         assert builtin_module is not None
-        builtin_module = Module(self, builtin_module.__name__, builtin_module)
         self._children['builtins'] = builtin_module
 
+        if analysis is not None:
+            analysis.register()
+        if store is not None:
+            # The snapshot needs all modules.
+            super().setupTree()
+            store.save(self)
+
+    def setupTree(self):
+        """Setup the whole module and class tree."""
+        self.setup()
+        super().setupTree()
+
+    @cachedLocatedCopy
     def withParentAndName(self, parent, name):
         located = type(self)()
         located.__parent__ = parent
@@ -116,6 +150,19 @@ class CodeModule(Module):
         return super().items()
 
 
+def _getModule(parent, name, path):
+    module = safe_import(path)
+    if module is not None:
+        module = Module(parent, name, module)
+    return module
+
+
+def _completeClassRegistry():
+    code = zope.component.queryUtility(IDocumentationModule, name='Code')
+    if code is not None:
+        code.setupTree()
+
+
 def _cleanUp():
     from zope.component import getGlobalSiteManager
     code = getGlobalSiteManager().queryUtility(
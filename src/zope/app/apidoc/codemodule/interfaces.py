@@ -119,6 +119,15 @@ class IClassDocumentation(zope.interface.Interface):
         """Return the __init__ method, or None if there isn't one."""
 
 
+class ISourceInterface(zope.interface.Interface):
+    """An interface that was found in the source code of a module, without
+    importing it.
+
+    It has the ``__name__``, ``__module__`` and ``__doc__`` of the
+    interface.
+    """
+
+
 class IFunctionDocumentation(zope.interface.Interface):
     """Representation of a function for documentation."""
 
@@ -11,8 +11,8 @@
 # FOR A PARTICULAR PURPOSE.
 #
 ##############################################################################
-"""This module handles the 'apidoc:rootModule' and 'apidoc:moduleImport'
- namespace directives.
+"""This module handles the 'apidoc:rootModule', 'apidoc:moduleImport',
+ 'apidoc:codeSnapshot' and 'apidoc:sourceAnalysis' namespace directives.
 
 """
 __docformat__ = 'restructuredtext'
@@ -20,6 +20,8 @@ from zope.component.zcml import utility
 from zope.interface import implementer
 
 from zope.app.apidoc import classregistry
+from zope.app.apidoc.codemodule import snapshot
+from zope.app.apidoc.codemodule import source
 from zope.app.apidoc.codemodule.interfaces import IAPIDocRootModule
 
 
@@ -43,3 +45,28 @@ def moduleImport(_context, allow):
         ('apidoc', '__import_unknown_modules__'),
         setModuleImport,
         (allow, ))
+
+
+def setSnapshotFile(filename):
+    snapshot.snapshotFile = filename
+
+
+def codeSnapshot(_context, file):
+    """Set the file the snapshot of the module tree is kept in"""
+    return _context.action(
+        ('apidoc', 'codeSnapshot'),
+        setSnapshotFile,
+        (file, ))
+
+
+def setSourceAnalysis(flag, workers=0):
+    source.sourceAnalysis = flag
+    source.sourceWorkers = workers
+
+
+def sourceAnalysis(_context, enabled, workers=0):
+    """Set whether modules are documented from their source code"""
+    return _context.action(
+        ('apidoc', 'sourceAnalysis'),
+        setSourceAnalysis,
+        (enabled, workers))
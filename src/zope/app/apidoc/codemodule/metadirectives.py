@@ -15,6 +15,7 @@
 
 """
 __docformat__ = 'restructuredtext'
+import zope.configuration.fields
 import zope.interface
 import zope.schema
 
@@ -40,3 +41,37 @@ class IModuleImport(zope.interface.Interface):
         required=True,
         default=False
     )
+
+
+class ICodeSnapshot(zope.interface.Interface):
+    """Keep a snapshot of the module tree of the class documentation module,
+       so that it can be set up without importing all modules."""
+
+    file = zope.configuration.fields.Path(
+        title="Snapshot File",
+        description="The file the snapshot is kept in.",
+        required=True
+    )
+
+
+class ISourceAnalysis(zope.interface.Interface):
+    """Set whether the class documentation module documents the modules
+       from their source code, instead of importing them."""
+
+    enabled = zope.schema.Bool(
+        title="Enable Source Analysis",
+        description="When set to true, modules are imported only when the"
+                    " source code is not enough to document them.",
+        required=True,
+        default=False
+    )
+
+    workers = zope.schema.Int(
+        title="Worker Processes",
+        description="The number of processes parsing the source files."
+                    " With less than two, they are parsed in the process"
+                    " setting up the class documentation module.",
+        required=False,
+        min=0,
+        default=0
+    )
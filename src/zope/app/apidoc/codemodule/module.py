@@ -16,6 +16,7 @@
 """
 __docformat__ = 'restructuredtext'
 import os
+import threading
 import types
 
 from zope.cachedescriptors.property import Lazy
@@ -35,6 +36,7 @@ from zope.app.apidoc.codemodule.interfaces import IModuleDocumentation
 from zope.app.apidoc.codemodule.text import TextFile
 from zope.app.apidoc.codemodule.zcml import ZCMLFile
 from zope.app.apidoc.utilities import ReadContainerBase
+from zope.app.apidoc.utilities import cachedLocatedCopy
 
 
 # Ignore these files, since they are not necessary or cannot be imported
@@ -54,6 +56,25 @@ IGNORE_FILES = frozenset((
     '__main__.py',
 ))
 
+# Guards setting up the submodules of the module trees, which the threads
+# of the server share.
+_treeLock = threading.RLock()
+
+
+class _ModulePlaceholder:
+    # Stands in for a submodule until it is needed.
+
+    __slots__ = ('name', 'kind', 'path', 'filename')
+
+    def __init__(self, name, kind, path, filename):
+        self.name = name
+        self.kind = kind
+        self.path = path
+        self.filename = filename
+
+    def __repr__(self):
+        return '<_ModulePlaceholder {} {!r}>'.format(self.kind, self.path)
+
 
 @implementer(ILocation, IModuleDocumentation)
 class Module(ReadContainerBase):
@@ -61,6 +82,8 @@ class Module(ReadContainerBase):
 
     _package = False
     _children = None
+    # Whether setupTree() set up all submodules already.
+    _isTreeSetup = False
 
     def __init__(self, parent, name, module, setup=True):
         """Initialize object."""
@@ -68,6 +91,7 @@ class Module(ReadContainerBase):
         self.__name__ = name
         self._module = module
         self._children = {}
+        self._isTreeSetup = False
         if setup:
             self.__setup()
 
@@ -108,24 +132,22 @@ class Module(ReadContainerBase):
 
                 path = os.path.join(mod_dir, mod_file)
 
+                # Submodules are imported and set up when first needed.
                 if os.path.isdir(path) and '__init__.py' in os.listdir(path):
                     # subpackage
                     # XXX Implicit packages don't have __init__.py
 
                     fullname = self._module.__name__ + '.' + mod_file
-                    module = safe_import(fullname)
-                    if module is not None:
-                        self._children[mod_file] = Module(
-                            self, mod_file, module)
+                    self._children[mod_file] = _ModulePlaceholder(
+                        mod_file, 'package', fullname, path)
                 elif os.path.isfile(path):
                     if mod_file.endswith(
                             '.py') and not mod_file.startswith('__init__'):
                         # module
                         name = mod_file[:-3]
                         fullname = self._module.__name__ + '.' + name
-                        module = safe_import(fullname)
-                        if module is not None:
-                            self._children[name] = Module(self, name, module)
+                        self._children[name] = _ModulePlaceholder(
+                            name, 'module', fullname, path)
 
                     elif mod_file.endswith('.zcml'):
                         self._children[mod_file] = ZCMLFile(path, self._module,
@@ -135,8 +157,9 @@ class Module(ReadContainerBase):
                         self._children[mod_file] = TextFile(
                             path, mod_file, self)
 
-    def __setup_classes_and_functions(self):
-        # List the classes and functions in module, if any are available.
+    def __setup_classes_and_functions(self, only=None):
+        # List the classes and functions in module, if any are available;
+        # only the one named only, if given.
         module_decl = self.getDeclaration()
         ifaces = list(module_decl)
         if ifaces:
@@ -164,6 +187,8 @@ class Module(ReadContainerBase):
         # If there is something the same name beneath, then module should
         # have priority.
         names = set(names) - set(self._children)
+        if only is not None:
+            names &= {only}
 
         for name in names:
             attr = getattr(self._module, name, None)
@@ -189,13 +214,58 @@ class Module(ReadContainerBase):
     def __setup(self):
         """Setup the module sub-tree."""
         self.__setup_package()
+        self._setupMembers()
 
+    def _setupMembers(self, only=None):
+        # Set up the classes, interfaces and functions of the module.
         zope.deprecation.__show__.off()
         try:
-            self.__setup_classes_and_functions()
+            self.__setup_classes_and_functions(only)
         finally:
             zope.deprecation.__show__.on()
 
+    def _getChild(self, name):
+        # Return the child, setting up the submodule it stands for if it is
+        # a placeholder; None if there is nothing by that name.
+        child = self._children.get(name)
+        if isinstance(child, _ModulePlaceholder):
+            with _treeLock:
+                # Another thread may have set it up in the meantime.
+                child = self._children.get(name)
+                if isinstance(child, _ModulePlaceholder):
+                    child = self._setupChild(name, child)
+        return child
+
+    def _setupChild(self, name, placeholder):
+        module = safe_import(placeholder.path)
+        if module is None:
+            # Document what the module has by that name instead, if
+            # anything.
+            del self._children[name]
+            self._setupMembers(only=name)
+            return self._children.get(name)
+        child = self._children[name] = Module(self, name, module)
+        return child
+
+    def setupTree(self):
+        """Set up the whole module sub-tree.
+
+        Submodules are only imported and set up when they are first
+        needed. This sets them all up, so that the class registry knows
+        all their classes. It is done only once.
+        """
+        if self._isTreeSetup:
+            return
+        with _treeLock:
+            if self._isTreeSetup:
+                return
+            for name in list(self._children):
+                child = self._getChild(name)
+                if isinstance(child, Module):
+                    child.setupTree()
+            self._isTreeSetup = True
+
+    @cachedLocatedCopy
     def withParentAndName(self, parent, name):
         located = _LazyModule(self, parent, name, self._module)
         # Our module tree can be very large, but typically during any one
@@ -230,6 +300,10 @@ class Module(ReadContainerBase):
     def get(self, key, default=None):
         """See zope.container.interfaces.IReadContainer."""
         obj = self._children.get(key, default)
+        if isinstance(obj, _ModulePlaceholder):
+            obj = self._getChild(key)
+            if obj is None:
+                obj = default
         if obj is not default:
             return obj
 
@@ -249,7 +323,9 @@ class Module(ReadContainerBase):
             obj = safe_import(path)
 
             if obj is not None:
-                self._children[key] = child = Module(self, key, obj)
+                with _treeLock:
+                    child = self._children.setdefault(
+                        key, Module(self, key, obj))
                 # Caching this in _children may be pointless, we were
                 # most likely a copy using withParentAndName in the
                 # first place.
@@ -266,9 +342,13 @@ class Module(ReadContainerBase):
         """See zope.container.interfaces.IReadContainer."""
         # Only publicize public objects, even though we do keep track of
         # private ones
-        return [(name, value)
-                for name, value in self._children.items()
-                if not name.startswith('_')]
+        items = []
+        for name in list(self._children):
+            if not name.startswith('_'):
+                value = self._getChild(name)
+                if value is not None:
+                    items.append((name, value))
+        return items
 
     def __repr__(self):
         return '<Module {!r} name {!r} parent {!r} at 0x{:x}>'.format(
@@ -276,6 +356,38 @@ class Module(ReadContainerBase):
         )
 
 
+class _UnimportedModule(Module):
+    # The base of the modules that are described without importing them,
+    # from a snapshot or their source. They have a _path, their submodules
+    # in _modules, and their classes in the class registry already; the
+    # module is imported only once it is needed.
+
+    @Lazy
+    def _module(self):
+        module = safe_import(self._path)
+        if module is None:
+            # It cannot be imported (anymore).
+            module = types.ModuleType(self._path)
+        return module
+
+    def setupTree(self):
+        """See :meth:`Module.setupTree`.
+
+        The classes of this module are in the class registry already, so
+        it is not imported.
+        """
+        if self._isTreeSetup:
+            return
+        with _treeLock:
+            for module in self._modules.values():
+                module.setupTree()
+            self._isTreeSetup = True
+
+    def getPath(self):
+        """See IModuleDocumentation."""
+        return self._path
+
+
 class _LazyModule(Module):
 
     copy_from = None
@@ -283,20 +395,47 @@ class _LazyModule(Module):
     def __init__(self, copy_from, parent, name, module):
         Module.__init__(self, parent, name, module, False)
         del self._children  # get our @Lazy back
+        if module is None:
+            del self._module  # wait for the copied module to import it
         self._copy_from = copy_from
 
+    @Lazy
+    def _module(self):
+        return self._copy_from._module
+
     @Lazy
     def _children(self):
-        new_children = {}
-        for x in self._copy_from._children.values():
-            try:
-                new_child = x.withParentAndName(self, x.__name__)
-            except AttributeError:
-                if isinstance(x, LocationProxy):
-                    new_child = LocationProxy(
-                        getProxiedObject(x), self, x.__name__)
-                else:
-                    new_child = LocationProxy(x, self, x.__name__)
-
-            new_children[x.__name__] = new_child
-        return new_children
+        # The submodules that are not set up yet are copied only when they
+        # are needed, see _getChild().
+        return {name: (x if isinstance(x, _ModulePlaceholder)
+                       else self._copyChild(x))
+                for name, x in self._copy_from._children.items()}
+
+    def _copyChild(self, x):
+        try:
+            return x.withParentAndName(self, x.__name__)
+        except AttributeError:
+            if isinstance(x, LocationProxy):
+                return LocationProxy(getProxiedObject(x), self, x.__name__)
+            return LocationProxy(x, self, x.__name__)
+
+    def _getChild(self, name):
+        child = self._children.get(name)
+        if isinstance(child, _ModulePlaceholder):
+            with _treeLock:
+                child = self._children.get(name)
+                if isinstance(child, _ModulePlaceholder):
+                    original = self._copy_from._getChild(name)
+                    if original is None:
+                        del self._children[name]
+                        return None
+                    child = self._children[name] = self._copyChild(original)
+        return child
+
+    def setupTree(self):
+        """See :meth:`Module.setupTree`.
+
+        Setting up the module we copy registers the classes; there is no
+        need to copy its tree.
+        """
+        self._copy_from.setupTree()
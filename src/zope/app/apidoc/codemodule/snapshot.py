@@ -0,0 +1,284 @@
+##############################################################################
+#
+# Copyright (c) 2005 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Snapshots of the module tree of the code browser
+
+Setting up the code browser imports every module below the root modules,
+to find their classes for the class registry. A snapshot keeps what was
+found in a JSON file: the submodules, files and classes of every module,
+and the modification times of the module file and directories, and of the
+files of the modules its classes take their bases and interfaces from.
+When the code browser is set up again, the modules that did not change
+are built from the snapshot and their classes are registered without
+importing them; a module is only imported once its contents or one of its
+classes are needed. A snapshot is not used at all once one of the ZCML
+files loaded changed, since these may declare interfaces for classes.
+"""
+__docformat__ = 'restructuredtext'
+
+import json
+import os
+import sys
+
+from zope.app.appsetup import appsetup
+from zope.cachedescriptors.property import Lazy
+from zope.interface import implementedBy
+from zope.testing.cleanup import addCleanUp
+
+from zope.app.apidoc import classregistry
+from zope.app.apidoc.classregistry import classRegistry
+from zope.app.apidoc.classregistry import describeClass
+from zope.app.apidoc.classregistry import safe_import
+from zope.app.apidoc.codemodule.class_ import Class
+from zope.app.apidoc.codemodule.module import Module
+from zope.app.apidoc.codemodule.module import _LazyModule
+from zope.app.apidoc.codemodule.module import _UnimportedModule
+from zope.app.apidoc.codemodule.text import TextFile
+from zope.app.apidoc.codemodule.zcml import ZCMLFile
+from zope.app.apidoc.utilities import cachedLocatedCopy
+
+
+#: The file the snapshot of the code browser is kept in, if any. Set by the
+#: ``apidoc:codeSnapshot`` directive.
+snapshotFile = None
+
+#: The version of the snapshot format.
+VERSION = 2
+
+
+def _mtime(path):
+    if path is None:
+        return None
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _configFiles():
+    # The ZCML files loaded, and their modification times.
+    context = appsetup.getConfigContext()
+    return {path: _mtime(path)
+            for path in getattr(context, '_seen_files', ())}
+
+
+def _dependencies(klass, modname):
+    # The files of the other modules that the description of klass comes
+    # from: those of its base classes and interfaces.
+    names = {getattr(base, '__module__', None)
+             for base in klass.__mro__[1:]}
+    try:
+        names.update(iface.__module__
+                     for iface in implementedBy(klass).flattened())
+    except TypeError:
+        pass
+    names.discard(modname)
+    files = (getattr(sys.modules.get(name), '__file__', None)
+             for name in names if name)
+    return {filename: _mtime(filename) for filename in files if filename}
+
+
+def _importable(path):
+    # Whether safe_import() may find the module without a failed import.
+    return path in sys.modules or classregistry.__import_unknown_modules__
+
+
+def _dirs(module):
+    return sorted(dir for dir in getattr(module, '__path__', None) or ()
+                  if os.path.isdir(dir))
+
+
+def _isCurrent(path, entry):
+    if _mtime(entry['file']) != entry['mtime']:
+        return False
+    if any(_mtime(filename) != mtime
+           for filename, mtime in entry['dependencies'].items()):
+        # The classes may have other bases or interfaces now.
+        return False
+    module = sys.modules.get(path)
+    if module is not None and entry['package']:
+        # A namespace package may have gained a directory.
+        if _dirs(module) != sorted(entry['dirs']):
+            return False
+    return all(_mtime(dir) == mtime for dir, mtime in entry['dirs'].items())
+
+
+def describeModule(module):
+    """Describe a set up :class:`~.Module` for a snapshot."""
+    mod = module._module
+    filename = getattr(mod, '__file__', None)
+    package = bool(module.isPackage())
+    dirs = _dirs(mod) if package else ()
+    entry = {
+        'file': filename,
+        'mtime': _mtime(filename),
+        'dirs': {dir: _mtime(dir) for dir in dirs},
+        'package': package,
+        'dependencies': {},
+        'modules': [],
+        'files': [],
+        'classes': {},
+    }
+    for name, child in sorted(module._children.items()):
+        if isinstance(child, Module):
+            entry['modules'].append(name)
+        elif isinstance(child, ZCMLFile):
+            entry['files'].append([name, 'zcml', child.filename])
+        elif isinstance(child, TextFile):
+            entry['files'].append([name, 'text', child.path])
+        elif isinstance(child, Class):
+            klass = getattr(mod, name, None)
+            if isinstance(klass, type):
+                entry['classes'][name] = describeClass(klass)
+                entry['dependencies'].update(
+                    _dependencies(klass, mod.__name__))
+    return entry
+
+
+class SnapshotModule(_UnimportedModule):
+    """A module built from a snapshot.
+
+    Its submodules are built right away and its classes are put in the
+    class registry, but the module is not imported until it is needed. Its
+    files, classes and functions are set up then.
+    """
+
+    def __init__(self, parent, name, path, entry, snapshot):
+        self.__parent__ = parent
+        self.__name__ = name
+        self._path = path
+        self._entry = entry
+        self._package = entry['package']
+        self._modules = {}
+        for child_name in entry['modules']:
+            child = snapshot.getModule(self, child_name,
+                                       path + '.' + child_name)
+            if child is not None:
+                self._modules[child_name] = child
+        for class_name, info in entry['classes'].items():
+            classRegistry.defer(path + '.' + class_name, info)
+
+    @Lazy
+    def _children(self):
+        self._children = children = dict(self._modules)
+        for name, kind, path in self._entry['files']:
+            if kind == 'zcml':
+                children[name] = ZCMLFile(path, self._module, self, name)
+            else:
+                children[name] = TextFile(path, name, self)
+        self._setupMembers()
+        return children
+
+    @cachedLocatedCopy
+    def withParentAndName(self, parent, name):
+        return _LazyModule(self, parent, name, None)
+
+    def getFileName(self):
+        """See IModuleDocumentation."""
+        return self._entry['file']
+
+    def __repr__(self):
+        return '<SnapshotModule {!r} name {!r} parent {!r} at 0x{:x}>'.format(
+            self._path, self.__name__, self.__parent__, id(self)
+        )
+
+
+class Snapshot:
+    """The snapshot of the module tree kept in a file.
+
+    A snapshot taken with other settings of the class registry, another
+    Python version or other ZCML files is not used.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        #: Maps the module paths to their entries.
+        self.modules = self._load()
+
+    def _header(self):
+        return {
+            'version': VERSION,
+            'python': sys.version,
+            'importUnknownModules': bool(
+                classregistry.__import_unknown_modules__),
+            'ignoreModules': sorted(classregistry.IGNORE_MODULES),
+            'configuration': _configFiles(),
+        }
+
+    def _load(self):
+        try:
+            with open(self.filename) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get('header') != self._header():
+            return {}
+        return data.get('modules', {})
+
+    def getModule(self, parent, name, path):
+        """Get the documentation of the module path.
+
+        The module is built from the snapshot if neither its file nor its
+        directories changed since the snapshot was taken, and is imported
+        and set up otherwise. None is returned for modules that cannot be
+        imported.
+        """
+        entry = self.modules.get(path)
+        if (entry is not None and _importable(path)
+                and _isCurrent(path, entry)):
+            return SnapshotModule(parent, name, path, entry, self)
+        module = safe_import(path)
+        if module is None:
+            return None
+        return Module(parent, name, module)
+
+    def save(self, root):
+        """Take a snapshot of the module tree below root.
+
+        The file is only written if the snapshot changed. It is a cache, so
+        failing to write it is not an error.
+        """
+        modules = {}
+
+        def record(module):
+            if isinstance(module, SnapshotModule):
+                entry = module._entry
+                children = module._modules.values()
+            else:
+                entry = describeModule(module)
+                children = module._children.values()
+            modules[module.getPath()] = entry
+            for child in children:
+                if isinstance(child, Module):
+                    record(child)
+
+        for module in root._children.values():
+            record(module)
+        if modules == self.modules:
+            return
+        self.modules = modules
+        tmp = self.filename + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump({'header': self._header(), 'modules': modules}, f)
+            os.replace(tmp, self.filename)
+        except OSError:
+            pass
+
+
+def cleanUp():
+    global snapshotFile
+    snapshotFile = None
+
+
+addCleanUp(cleanUp)
@@ -0,0 +1,723 @@
+##############################################################################
+#
+# Copyright (c) 2005 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""Documentation of modules from their source code
+
+With source analysis, the code browser does not import the modules below
+the root modules to document them. It parses their source files instead,
+and takes the docstrings, function signatures, base classes, ``implementer``
+declarations and ``__all__`` of the modules from there. A module is only
+imported when its documentation needs something that cannot be found in
+the source, like the attributes of a class or the interfaces a module
+provides.
+
+Source analysis is turned on with the ``apidoc:sourceAnalysis``
+directive.
+"""
+__docformat__ = 'restructuredtext'
+
+import ast
+import builtins
+import concurrent.futures
+import importlib.util
+import logging
+import multiprocessing
+import os
+import re
+import sys
+
+from zope.cachedescriptors.property import Lazy
+from zope.hookable import hookable
+from zope.interface import Declaration
+from zope.interface import implementer
+from zope.interface import providedBy
+from zope.interface.interface import InterfaceClass
+from zope.location import LocationProxy
+from zope.location.interfaces import ILocation
+from zope.testing.cleanup import addCleanUp
+
+from zope.app.apidoc.classregistry import classRegistry
+from zope.app.apidoc.classregistry import safe_import
+from zope.app.apidoc.codemodule.class_ import Class
+from zope.app.apidoc.codemodule.interfaces import IClassDocumentation
+from zope.app.apidoc.codemodule.interfaces import IFunctionDocumentation
+from zope.app.apidoc.codemodule.interfaces import ISourceInterface
+from zope.app.apidoc.codemodule.module import IGNORE_FILES
+from zope.app.apidoc.codemodule.module import Module
+from zope.app.apidoc.codemodule.module import _LazyModule
+from zope.app.apidoc.codemodule.module import _UnimportedModule
+from zope.app.apidoc.codemodule.text import TextFile
+from zope.app.apidoc.codemodule.zcml import ZCMLFile
+from zope.app.apidoc.utilities import cachedLocatedCopy
+
+
+#: Whether the code browser documents the modules from their source code.
+#: Set by the ``apidoc:sourceAnalysis`` directive.
+sourceAnalysis = False
+
+#: The number of processes parsing the source files. Set by the
+#: ``apidoc:sourceAnalysis`` directive.
+sourceWorkers = 0
+
+logger = logging.getLogger(__name__)
+
+_INTERFACE = 'zope.interface.Interface'
+_INTERFACE_NAME = re.compile('I[A-Z]')
+_DECLARATIONS = ('implementer', 'implementer_only')
+_MODULE_DECLARATIONS = ('moduleProvides', 'directlyProvides', 'alsoProvides')
+
+_unparse = getattr(ast, 'unparse', None)
+
+
+def _expression(source, node):
+    if _unparse is not None:
+        return _unparse(node)
+    segment = None
+    if hasattr(ast, 'get_source_segment'):
+        segment = ast.get_source_segment(source, node)
+    return segment or '...'
+
+
+def _statements(body):
+    # The statements of body, including those in if and try blocks.
+    for node in body:
+        yield node
+        blocks = []
+        if isinstance(node, ast.If):
+            blocks = [node.body, node.orelse]
+        elif isinstance(node, ast.Try):
+            blocks = [node.body, node.orelse, node.finalbody]
+            blocks.extend(handler.body for handler in node.handlers)
+        for block in blocks:
+            yield from _statements(block)
+
+
+class _Names:
+    # Resolves the names used in a module to dotted names.
+
+    def __init__(self, modname, package):
+        self.modname = modname
+        self.package = package
+        self.names = {}
+        self.imported = set()
+
+    def addImport(self, node):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname:
+                    self.names[alias.asname] = alias.name
+                else:
+                    first = alias.name.split('.', 1)[0]
+                    self.names[first] = first
+                self.imported.add(alias.asname or alias.name.split('.')[0])
+            return
+        base = node.module or ''
+        if node.level:
+            parts = self.package.split('.')
+            if node.level > 1:
+                parts = parts[:1 - node.level]
+            base = '.'.join(parts + ([base] if base else []))
+        for alias in node.names:
+            if alias.name == '*':
+                continue
+            name = alias.asname or alias.name
+            self.names[name] = base + '.' + alias.name
+            self.imported.add(name)
+
+    def resolve(self, node):
+        if isinstance(node, ast.Name):
+            if node.id in self.names:
+                return self.names[node.id]
+            if hasattr(builtins, node.id):
+                return 'builtins.' + node.id
+            return self.modname + '.' + node.id
+        if isinstance(node, ast.Attribute):
+            value = self.resolve(node.value)
+            if value is not None:
+                return value + '.' + node.attr
+        if isinstance(node, ast.Subscript):
+            return self.resolve(node.value)
+        if isinstance(node, ast.Call):
+            return self.resolve(node.func)
+        return None
+
+
+def _signature(source, args, returns):
+    # Format the arguments like str(inspect.signature()) does.
+    def argument(arg, default=None):
+        text = arg.arg
+        if arg.annotation is not None:
+            text += ': ' + _expression(source, arg.annotation)
+            if default is not None:
+                return text + ' = ' + _expression(source, default)
+        elif default is not None:
+            text += '=' + _expression(source, default)
+        return text
+
+    positional = list(getattr(args, 'posonlyargs', ())) + list(args.args)
+    defaults = [None] * (len(positional) - len(args.defaults))
+    defaults += args.defaults
+    parts = []
+    for i, (arg, default) in enumerate(zip(positional, defaults)):
+        parts.append(argument(arg, default))
+        if i + 1 == len(getattr(args, 'posonlyargs', ())):
+            parts.append('/')
+    if args.vararg is not None:
+        parts.append('*' + argument(args.vararg))
+    elif args.kwonlyargs:
+        parts.append('*')
+    for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+        parts.append(argument(arg, default))
+    if args.kwarg is not None:
+        parts.append('**' + argument(args.kwarg))
+    result = '(%s)' % ', '.join(parts)
+    if returns is not None:
+        result += ' -> ' + _expression(source, returns)
+    return result
+
+
+def parseModule(filename, modname, package=False):
+    """Parse the source file of a module.
+
+    Return a dictionary with the docstring of the module (``doc``), its
+    ``classes``, ``interfaces`` and ``functions``, and whether it must be
+    imported to find them (``live``). This is the case if it provides
+    interfaces, computes its ``__all__``, or exports names it imports. The
+    classes, interfaces and functions map names to dictionaries with their
+    ``doc``. Classes and interfaces also have their ``bases`` and the
+    ``interfaces`` they implement, as dotted names; functions have their
+    ``signature``.
+
+    Modules that cannot be read or parsed are ``live``.
+    """
+    result = {'doc': None, 'live': False,
+              'classes': {}, 'interfaces': {}, 'functions': {}}
+    try:
+        with open(filename, 'rb') as f:
+            data = f.read()
+        source = data.decode('utf-8')
+        tree = ast.parse(data, filename)
+    except (OSError, SyntaxError, ValueError):
+        result['live'] = True
+        return result
+    result['doc'] = ast.get_docstring(tree, clean=False)
+    names = _Names(modname,
+                   modname if package else modname.rpartition('.')[0])
+    statements = list(_statements(tree.body))
+    defined = {}
+    for node in statements:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.addImport(node)
+        elif isinstance(node, (ast.ClassDef, ast.FunctionDef,
+                               ast.AsyncFunctionDef)):
+            defined[node.name] = node
+            names.names[node.name] = modname + '.' + node.name
+            names.imported.discard(node.name)
+
+    exported = None
+    for node in statements:
+        if isinstance(node, ast.Expr) and isinstance(node.value, ast.Call):
+            called = names.resolve(node.value.func) or ''
+            if called.rsplit('.', 1)[-1] in _MODULE_DECLARATIONS:
+                result['live'] = True
+        elif isinstance(node, ast.AugAssign) and isinstance(
+                node.target, ast.Name) and node.target.id == '__all__':
+            result['live'] = True
+        elif isinstance(node, ast.Assign) and any(
+                isinstance(target, ast.Name) and target.id == '__all__'
+                for target in node.targets):
+            try:
+                exported = list(ast.literal_eval(node.value))
+            except (TypeError, ValueError):
+                result['live'] = True
+    if exported is not None:
+        if any(name not in defined and name in names.imported
+               for name in exported):
+            result['live'] = True
+        members = [name for name in exported if name in defined]
+    else:
+        members = list(defined)
+    if result['live']:
+        return result
+
+    interfaces = set()
+    for name in members:
+        node = defined[name]
+        info = {'doc': ast.get_docstring(node, clean=False)}
+        if isinstance(node, ast.ClassDef):
+            bases = [names.resolve(base) for base in node.bases]
+            info['bases'] = [base for base in bases if base]
+            info['interfaces'] = [
+                names.resolve(arg)
+                for decorator in node.decorator_list
+                if isinstance(decorator, ast.Call)
+                and (names.resolve(decorator.func) or '').rsplit(
+                    '.', 1)[-1] in _DECLARATIONS
+                for arg in decorator.args if names.resolve(arg)]
+            if any(base == _INTERFACE or base in interfaces
+                   or (_INTERFACE_NAME.match(base.rsplit('.', 1)[-1])
+                       and 'interface' in base)
+                   for base in info['bases']):
+                interfaces.add(modname + '.' + name)
+                result['interfaces'][name] = info
+            else:
+                result['classes'][name] = info
+        else:
+            info['signature'] = _signature(source, node.args, node.returns)
+            result['functions'][name] = info
+    return result
+
+
+@implementer(ILocation, IClassDocumentation)
+class SourceClass:
+    """A class documented from its source code.
+
+    Only the docstring comes from the source; everything else needs the
+    class, which is imported when first asked for.
+    """
+
+    def __init__(self, module, name, info):
+        self.__parent__ = module
+        self.__name__ = name
+        self._info = info
+
+    @Lazy
+    def _class(self):
+        klass = getattr(self.__parent__._module, self.__name__, None)
+        if not isinstance(klass, type):
+            return None
+        return Class(self.__parent__, self.__name__, klass)
+
+    def _fromClass(name, default):
+        def method(self):
+            if self._class is None:
+                return default
+            return getattr(self._class, name)()
+        method.__name__ = name
+        method.__doc__ = (
+            "See :class:`~zope.app.apidoc.codemodule.interfaces."
+            "IClassDocumentation`.")
+        return method
+
+    def getPath(self):
+        """See :class:`~zope.app.apidoc.codemodule.interfaces.IClassDocumentation`."""  # noqa: E501 line too long
+        return self.__parent__.getPath() + '.' + self.__name__
+
+    def getDocString(self):
+        """See :class:`~zope.app.apidoc.codemodule.interfaces.IClassDocumentation`."""  # noqa: E501 line too long
+        return self._info['doc']
+
+    getBases = _fromClass('getBases', ())
+    getKnownSubclasses = _fromClass('getKnownSubclasses', ())
+    getInterfaces = _fromClass('getInterfaces', ())
+    getAttributes = _fromClass('getAttributes', ())
+    getMethods = _fromClass('getMethods', ())
+    getMethodDescriptors = _fromClass('getMethodDescriptors', ())
+    getAttributeTable = _fromClass('getAttributeTable', ())
+    getSecurityChecker = _fromClass('getSecurityChecker', None)
+    getConstructor = _fromClass('getConstructor', None)
+
+    del _fromClass
+
+
+@implementer(ILocation, IFunctionDocumentation)
+class SourceFunction:
+    """A function documented from its source code.
+
+    Only its attributes need the function, which is imported then.
+    """
+
+    def __init__(self, module, name, info):
+        self.__parent__ = module
+        self.__name__ = name
+        self._info = info
+
+    def getPath(self):
+        """See :class:`~zope.app.apidoc.codemodule.interfaces.IFunctionDocumentation`."""  # noqa: E501 line too long
+        return self.__parent__.getPath() + '.' + self.__name__
+
+    def getDocString(self):
+        """See :class:`~zope.app.apidoc.codemodule.interfaces.IFunctionDocumentation`."""  # noqa: E501 line too long
+        return self._info['doc']
+
+    def getSignature(self):
+        """See :class:`~zope.app.apidoc.codemodule.interfaces.IFunctionDocumentation`."""  # noqa: E501 line too long
+        return self._info['signature']
+
+    def getAttributes(self):
+        """See :class:`~zope.app.apidoc.codemodule.interfaces.IFunctionDocumentation`."""  # noqa: E501 line too long
+        func = getattr(self.__parent__._module, self.__name__, None)
+        if isinstance(func, hookable):
+            func = func.implementation
+        return list(getattr(func, '__dict__', {}).items())
+
+
+@implementer(ILocation, ISourceInterface)
+class SourceInterface:
+    """An interface documented from its source code."""
+
+    def __init__(self, module, name, info):
+        self.__parent__ = module
+        self.__name__ = self.__qualname__ = name
+        self.__module__ = module.getPath()
+        self.__doc__ = info['doc']
+
+    def withParentAndName(self, parent, name):
+        return type(self)(parent, name, {'doc': self.__doc__})
+
+
+class _SourceZCMLFile(ZCMLFile):
+    # A ZCML file whose package is imported when the file is parsed.
+
+    def __init__(self, filename, module, parent, name):
+        super().__init__(filename, None, parent, name)
+        del self.package
+        self._packageModule = module
+
+    @Lazy
+    def package(self):
+        return self._packageModule._module
+
+    def withParentAndName(self, parent, name):
+        return type(self)(self.filename, self._packageModule, parent, name)
+
+
+def _listPackage(path, dirs):
+    # The modules and files in the directories of the package path, as
+    # (kind, name, path, file name, directories) tuples.
+    seen = set()
+    for mod_dir in dirs:
+        for mod_file in sorted(os.listdir(mod_dir)):
+            if mod_file in IGNORE_FILES:
+                continue
+            filepath = os.path.join(mod_dir, mod_file)
+            child_path = path + '.' + mod_file
+            if os.path.isdir(filepath):
+                init = os.path.join(filepath, '__init__.py')
+                if os.path.isfile(init):
+                    entry = ('module', mod_file, child_path, init, [filepath])
+                else:
+                    continue
+            elif mod_file.endswith('.py'):
+                if mod_file.startswith('__init__'):
+                    continue
+                entry = ('module', mod_file[:-3], child_path[:-3], filepath,
+                         [])
+            elif mod_file.endswith('.zcml'):
+                entry = ('zcml', mod_file, None, filepath, None)
+            elif mod_file.endswith(('.txt', '.rst')):
+                entry = ('text', mod_file, None, filepath, None)
+            else:
+                continue
+            if entry[1] not in seen:
+                seen.add(entry[1])
+                yield entry
+
+
+def _parse(job):
+    # Parse a module in a worker process.
+    return parseModule(*job)
+
+
+class SourceModule(_UnimportedModule):
+    """A module documented from its source code.
+
+    Its submodules are built, and the module parsed, right away. Its
+    children are set up when first needed, from the source, or from the
+    imported module if the source is not enough.
+    """
+
+    def __init__(self, parent, name, path, filename, dirs, analysis):
+        self.__parent__ = parent
+        self.__name__ = name
+        self._path = path
+        self._filename = filename
+        self._dirs = dirs
+        self._package = bool(dirs)
+        self._info = {'doc': None, 'live': True}
+        if filename and filename.endswith('.py'):
+            self._info = analysis.parse(filename, path, self._package)
+        self._modules = {}
+        self._files = {}
+        for kind, key, child_path, filepath, child_dirs in (
+                analysis.listPackage(path, dirs)):
+            if kind == 'module':
+                self._modules[key] = analysis.getSourceModule(
+                    self, key, child_path, filepath, child_dirs)
+            elif kind == 'zcml':
+                self._files[key] = _SourceZCMLFile(filepath, self, self, key)
+            else:
+                self._files[key] = TextFile(filepath, key, self)
+
+    @Lazy
+    def _children(self):
+        self._children = children = dict(self._modules)
+        children.update(self._files)
+        if self._info['live']:
+            self._setupMembers()
+            return children
+        for kind, factory in (('classes', SourceClass),
+                              ('interfaces', SourceInterface),
+                              ('functions', SourceFunction)):
+            for name, info in self._info[kind].items():
+                if name not in children:
+                    children[name] = factory(self, name, info)
+        return children
+
+    @cachedLocatedCopy
+    def withParentAndName(self, parent, name):
+        return _LocatedSourceModule(self, parent, name, None)
+
+    def getDocString(self):
+        """See IModuleDocumentation."""
+        if self._info['live']:
+            return self._module.__doc__
+        return self._info['doc']
+
+    def getFileName(self):
+        """See IModuleDocumentation."""
+        return self._filename
+
+    def getDeclaration(self):
+        """See IModuleDocumentation."""
+        if self._info['live']:
+            return providedBy(self._module)
+        return Declaration()
+
+    def get(self, key, default=None):
+        """See zope.container.interfaces.IReadContainer."""
+        return _getInterface(self, super().get(key, default))
+
+    def __repr__(self):
+        return '<SourceModule {!r} name {!r} parent {!r} at 0x{:x}>'.format(
+            self._path, self.__name__, self.__parent__, id(self)
+        )
+
+
+def _getInterface(module, obj):
+    # Interfaces are shown from the source in listings, but traversing to
+    # one needs the interface.
+    if not ISourceInterface.providedBy(obj):
+        return obj
+    iface = getattr(module._module, obj.__name__, None)
+    if iface is None:
+        return obj
+    return LocationProxy(iface, module, obj.__name__)
+
+
+class _LocatedSourceModule(_LazyModule):
+
+    def getDocString(self):
+        return self._copy_from.getDocString()
+
+    def getFileName(self):
+        return self._copy_from.getFileName()
+
+    def getPath(self):
+        return self._copy_from.getPath()
+
+    def isPackage(self):
+        return self._copy_from.isPackage()
+
+    def getDeclaration(self):
+        return self._copy_from.getDeclaration()
+
+    def get(self, key, default=None):
+        return _getInterface(self, super().get(key, default))
+
+
+class Analysis:
+    """Builds the module tree of the code browser from the source files.
+
+    The classes found in the source files are added to the class registry
+    by :meth:`register`, without importing them. Their indexed base
+    classes are those found in the analyzed modules, and their interfaces
+    those declared with ``implementer`` and the interfaces these extend.
+    The interfaces declared in other ways are found by the class registry
+    once the module of the class is imported.
+    """
+
+    def __init__(self, workers=0):
+        #: The number of processes parsing the source files. With less
+        #: than two, they are parsed in this process.
+        self.workers = workers
+        #: Maps the paths of the classes found to their descriptions.
+        self.classes = {}
+        #: Maps the paths of the interfaces found to their descriptions.
+        self.interfaces = {}
+        # Maps interface names to the identifiers of the interfaces they
+        # extend, themselves included.
+        self._extended = {}
+        #: The number of source files parsed by the worker processes.
+        self.parsedInWorkers = 0
+        # The parsed modules and listed packages that were not built yet.
+        self._parsed = {}
+        self._listings = {}
+        # The pool of worker processes, once started; None if it cannot be.
+        self._executor = None
+
+    def listPackage(self, path, dirs):
+        listing = self._listings.pop(path, None)
+        if listing is None:
+            listing = list(_listPackage(path, dirs))
+        return listing
+
+    def _findSources(self, path, filename, dirs):
+        if filename and filename.endswith('.py'):
+            yield (filename, path, bool(dirs))
+        listing = self._listings[path] = list(_listPackage(path, dirs))
+        for kind, _, child_path, child_file, child_dirs in listing:
+            if kind == 'module':
+                yield from self._findSources(child_path, child_file,
+                                             child_dirs)
+
+    def _getExecutor(self):
+        if self._executor is None:
+            # The workers do not fork this process, with its threads and
+            # its configuration; they only need to import this module.
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context(
+                'forkserver' if 'forkserver' in methods else 'spawn')
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                self.workers, mp_context=context)
+        return self._executor
+
+    def _parseAll(self, path, filename, dirs):
+        # Parse the modules below path in the pool of processes, which is
+        # shared by the root modules; the parent only lists the directories
+        # and builds the tree.
+        jobs = list(self._findSources(path, filename, dirs))
+        if self.workers < 2 or len(jobs) < 2 or self._executor is False:
+            return
+        chunksize = max(1, len(jobs) // (4 * self.workers))
+        try:
+            for job, info in zip(jobs, self._getExecutor().map(
+                    _parse, jobs, chunksize=chunksize)):
+                self._parsed[job[0]] = info
+                self.parsedInWorkers += 1
+        except (OSError, concurrent.futures.BrokenExecutor):
+            logger.warning(
+                'Cannot parse the source files in worker processes; parsing'
+                ' them in this process instead.', exc_info=True)
+            self.close()
+            # Do not try again for the next root module.
+            self._executor = False
+
+    def close(self):
+        """Stop the worker processes, if any."""
+        if self._executor:
+            self._executor.shutdown()
+        self._executor = None
+
+    def parse(self, filename, modname, package):
+        info = self._parsed.pop(filename, None)
+        if info is None:
+            info = parseModule(filename, modname, package)
+        for name, klass in info.get('classes', {}).items():
+            self.classes[modname + '.' + name] = klass
+        for name, iface in info.get('interfaces', {}).items():
+            self.interfaces[modname + '.' + name] = iface
+        return info
+
+    def getSourceModule(self, parent, name, path, filename, dirs):
+        return SourceModule(parent, name, path, filename, dirs, self)
+
+    def getModule(self, parent, name, path):
+        """Get the documentation of the module path.
+
+        Modules without source files, like ``builtins``, are imported.
+        None is returned for modules that cannot be found.
+        """
+        module = sys.modules.get(path)
+        if module is not None:
+            filename = getattr(module, '__file__', None)
+            dirs = list(getattr(module, '__path__', None) or ())
+        else:
+            try:
+                spec = importlib.util.find_spec(path)
+            except (ImportError, ValueError):
+                spec = None
+            if spec is None:
+                return None
+            filename = spec.origin if spec.has_location else None
+            dirs = list(spec.submodule_search_locations or ())
+        if not dirs and not (filename or '').endswith('.py'):
+            module = safe_import(path)
+            if module is None:
+                return None
+            return Module(parent, name, module)
+        dirs = [mod_dir for mod_dir in dirs if os.path.isdir(mod_dir)]
+        if self.workers > 1:
+            self._parseAll(path, filename, dirs)
+        return self.getSourceModule(parent, name, path, filename, dirs)
+
+    def _bases(self, path, seen):
+        bases = []
+        for base in self.classes[path]['bases']:
+            if base in seen:
+                continue
+            seen.add(base)
+            bases.append(base)
+            if base in self.classes:
+                bases.extend(self._bases(base, seen))
+        return bases
+
+    def _extends(self, name):
+        # The identifiers of the interface name and the interfaces it
+        # extends. An interface that is imported already knows them, under
+        # its real identifier, which differs from name if it is imported
+        # from elsewhere; otherwise we follow its bases in the source.
+        extended = self._extended.get(name)
+        if extended is not None:
+            return extended
+        self._extended[name] = extended = {name}
+        module_path, _, attr = name.rpartition('.')
+        iface = getattr(safe_import(module_path), attr, None)
+        if isinstance(iface, InterfaceClass):
+            extended.update(base.__identifier__ for base in iface.__iro__)
+        elif name in self.interfaces:
+            for base in self.interfaces[name]['bases']:
+                extended.update(self._extends(base))
+        return extended
+
+    def register(self):
+        """Add the classes found to the class registry.
+
+        This ends the analysis; the worker processes are stopped.
+        """
+        self.close()
+        for path, klass in self.classes.items():
+            bases = self._bases(path, {path})
+            if 'builtins.object' not in bases:
+                bases.append('builtins.object')
+            declared = set(klass['interfaces'])
+            for base in bases:
+                if base in self.classes:
+                    declared.update(self.classes[base]['interfaces'])
+            interfaces = set()
+            for name in declared:
+                interfaces.update(self._extends(name))
+            classRegistry.defer(path, {
+                'interfaces': sorted(interfaces),
+                'bases': bases,
+                'directBases': klass['bases'] or ['builtins.object'],
+            })
+
+
+def cleanUp():
+    global sourceAnalysis, sourceWorkers
+    sourceAnalysis = False
+    sourceWorkers = 0
+
+
+addCleanUp(cleanUp)
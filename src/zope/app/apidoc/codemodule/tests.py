@@ -15,11 +15,19 @@
 
 """
 import doctest
+import json
 import os.path
+import shutil
+import sys
+import tempfile
+import textwrap
 import unittest
 
 from zope.component import testing
+from zope.proxy import removeAllProxies
+from zope.publisher.browser import TestRequest
 
+import zope.app.apidoc.bookmodule
 import zope.app.apidoc.codemodule
 from zope.app.apidoc.codemodule.module import Module
 from zope.app.apidoc.codemodule.text import TextFile
@@ -74,6 +82,61 @@ class TestModule(unittest.TestCase):
         mod._Module__setup()
         self.assertEqual(len(mod), before)
 
+    def test_lazy_submodules(self):
+        from zope.app.apidoc.codemodule.module import _ModulePlaceholder
+        mod = Module(None, 'codemodule', zope.app.apidoc.codemodule)
+        placeholder = mod._children['browser']
+        self.assertIsInstance(placeholder, _ModulePlaceholder)
+        self.assertEqual(placeholder.kind, 'package')
+        self.assertEqual(placeholder.path,
+                         'zope.app.apidoc.codemodule.browser')
+        browser = mod['browser']
+        self.assertIsInstance(browser, Module)
+        self.assertIs(mod._children['browser'], browser)
+        self.assertIsInstance(browser._children['menu'], _ModulePlaceholder)
+
+        mod._children['missing'] = _ModulePlaceholder(
+            'missing', 'module', 'zope.app.apidoc.codemodule.missing', None)
+        self.assertNotIn('missing', dict(mod.items()))
+        self.assertNotIn('missing', mod._children)
+
+        mod.setupTree()
+        self.assertIsInstance(browser._children['menu'], Module)
+
+    def test_placeholder_falls_back_to_attribute(self):
+        from zope.app.apidoc.codemodule.function import Function
+        from zope.app.apidoc.codemodule.module import _ModulePlaceholder
+
+        def missing():
+            "Not a submodule."
+        missing.__module__ = 'zope.app.apidoc.codemodule'
+        zope.app.apidoc.codemodule.missing = missing
+        self.addCleanup(delattr, zope.app.apidoc.codemodule, 'missing')
+        mod = Module(None, 'codemodule', zope.app.apidoc.codemodule)
+        self.assertIsInstance(mod._children['missing'], Function)
+        # A submodule by the same name has priority, if it can be imported.
+        mod._children['missing'] = _ModulePlaceholder(
+            'missing', 'module', 'zope.app.apidoc.codemodule.missing', None)
+        located = mod.withParentAndName(None, 'codemodule')
+        function = located['missing']
+        self.assertIsInstance(function, Function)
+        self.assertIs(located, function.__parent__)
+        self.assertIsInstance(mod._children['missing'], Function)
+
+    def test_located_submodules_are_lazy(self):
+        from zope.app.apidoc.codemodule.module import _ModulePlaceholder
+        mod = Module(None, 'codemodule', zope.app.apidoc.codemodule)
+        located = mod.withParentAndName(None, 'codemodule')
+        browser = located['browser']
+        self.assertEqual('zope.app.apidoc.codemodule.browser',
+                         browser.getPath())
+        self.assertIs(located, browser.__parent__)
+        # The other submodules are neither set up nor copied.
+        self.assertIsInstance(mod._children['zcml'], _ModulePlaceholder)
+        self.assertIsInstance(located._children['zcml'], _ModulePlaceholder)
+        self.assertIsInstance(located['zcml'], Module)
+        self.assertIsInstance(mod._children['zcml'], Module)
+
     def test__all_invalid(self):
         assert not hasattr(zope.app.apidoc.codemodule, '__all__')
         zope.app.apidoc.codemodule.__all__ = ('missingname',)
@@ -140,6 +203,487 @@ class TestCodeModule(unittest.TestCase):
         cm = zope.app.apidoc.codemodule.codemodule.CodeModule()
         self.assertIsNone(cm.get('logging'))
 
+    def test_located_copies_are_reused(self):
+        import zope.app.apidoc.codemodule.codemodule
+        from zope.app.apidoc.apidoc import APIDocumentation
+        cm = zope.app.apidoc.codemodule.codemodule.CodeModule()
+        root = APIDocumentation(None, '++apidoc++')
+        located = cm.withParentAndName(root, 'Code')
+        self.assertIs(located.__parent__, root)
+        self.assertIs(cm.withParentAndName(root, 'Code'), located)
+        self.assertIsNot(cm.withParentAndName(root, 'Other'), located)
+        builtins = located['builtins']
+        self.assertIs(builtins.__parent__, located)
+        self.assertIs(
+            cm['builtins'].withParentAndName(located, 'builtins'), builtins)
+
+        other = cm.withParentAndName(APIDocumentation(None, 'other'), 'Code')
+        self.assertIsNot(other, located)
+        self.assertIsNot(other['builtins'], builtins)
+
+    def test_located_copies_are_reused_across_traversals(self):
+        from zope.component import provideUtility
+        from zope.security.checker import ProxyFactory
+        from zope.site.folder import rootFolder
+
+        from zope.app.apidoc.apidoc import handleNamespace
+        from zope.app.apidoc.codemodule.codemodule import CodeModule
+        from zope.app.apidoc.interfaces import IDocumentationModule
+        testing.setUp()
+        self.addCleanup(testing.tearDown)
+        cm = CodeModule()
+        provideUtility(cm, IDocumentationModule, 'Code')
+        root = rootFolder()
+
+        # Every request proxies the root again.
+        apidoc = handleNamespace(ProxyFactory(root), '')
+        code = apidoc['Code']
+        self.assertIs(handleNamespace(ProxyFactory(root), '')['Code'], code)
+        self.assertIsNot(handleNamespace(root, 'other')['Code'], code)
+        self.assertIsNot(handleNamespace(rootFolder(), '')['Code'], code)
+        # The documentation does not keep the proxy of the first request.
+        self.assertIs(apidoc.__parent__, root)
+
+        # Setting up the code module again makes new copies.
+        builtins = code['builtins']
+        cm.__init__()
+        again = handleNamespace(ProxyFactory(root), '')['Code']
+        self.assertIsNot(again, code)
+        self.assertIsNot(again['builtins'], builtins)
+        self.assertIs(again['builtins'].__parent__, again)
+        self.assertIs(handleNamespace(root, '')['Code'], again)
+
+
+class TestClassRegistry(unittest.TestCase):
+    # The classes of a fresh tree are registered when it is asked about.
+
+    def setUp(self):
+        from zope.component import provideUtility
+
+        from zope.app.apidoc.codemodule.codemodule import CodeModule
+        from zope.app.apidoc.codemodule.interfaces import IAPIDocRootModule
+        from zope.app.apidoc.codemodule.metaconfigure import RootModule
+        from zope.app.apidoc.interfaces import IDocumentationModule
+        testing.setUp()
+        provideUtility(RootModule('zope.app.apidoc'),
+                       IAPIDocRootModule, 'zope.app.apidoc')
+        provideUtility(CodeModule(), IDocumentationModule, 'Code')
+
+    def tearDown(self):
+        testing.tearDown()
+
+    def test_known_subclasses(self):
+        from zope.component import getUtility
+
+        from zope.app.apidoc.codemodule.module import _ModulePlaceholder
+        from zope.app.apidoc.interfaces import IDocumentationModule
+        mod = getUtility(IDocumentationModule, 'Code')['zope.app.apidoc']
+        klass = mod['utilities']['ReadContainerBase']
+        self.assertIsInstance(mod._children['codemodule'],
+                              _ModulePlaceholder)
+        # Only asking the registry for all subclasses sets up the rest.
+        self.assertIn(Module, klass.getKnownSubclasses())
+        self.assertIsInstance(mod._children['codemodule'], Module)
+
+    def test_implemented_by(self):
+        from zope.app.apidoc.codemodule.interfaces import IModuleDocumentation
+        from zope.app.apidoc.component import getClasses
+        paths = [path for path, _ in getClasses(IModuleDocumentation)]
+        self.assertIn('zope.app.apidoc.codemodule.module.Module', paths)
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        from zope.component import provideUtility
+
+        from zope.app.apidoc.codemodule.interfaces import IAPIDocRootModule
+        from zope.app.apidoc.codemodule.metaconfigure import RootModule
+        from zope.app.apidoc.codemodule.metaconfigure import setSnapshotFile
+        testing.setUp()
+        provideUtility(RootModule('zope.app.apidoc.codemodule'),
+                       IAPIDocRootModule, 'zope.app.apidoc.codemodule')
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'snapshot.json')
+        setSnapshotFile(self.filename)
+
+    def tearDown(self):
+        testing.tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def _setup(self):
+        from zope.app.apidoc.classregistry import classRegistry
+        from zope.app.apidoc.codemodule.codemodule import CodeModule
+        classRegistry.clear()
+        code = CodeModule()
+        code.setup()
+        return code
+
+    def test_setup_from_snapshot(self):
+        from zope.app.apidoc.classregistry import classRegistry
+        from zope.app.apidoc.codemodule.snapshot import SnapshotModule
+        name = 'zope.app.apidoc.codemodule'
+        path = 'zope.app.apidoc.codemodule.module.Module'
+        live = self._setup()[name]
+        self.assertNotIsInstance(live, SnapshotModule)
+        with open(self.filename) as f:
+            modules = json.load(f)['modules']
+        self.assertIn('Module', modules[name + '.module']['classes'])
+
+        mod = self._setup()[name]
+        self.assertIsInstance(mod, SnapshotModule)
+        self.assertNotIn('_children', mod.__dict__)
+        self.assertIn(path, classRegistry._deferred)
+        self.assertIn(path, classRegistry.findPaths('module.Module'))
+        self.assertEqual(sorted(dict(mod.items())), sorted(dict(live.items())))
+        self.assertEqual(sorted(dict(mod['module'].items())),
+                         sorted(dict(live['module'].items())))
+        self.assertIs(classRegistry[path], Module)
+        self.assertEqual(mod.getFileName(), live.getFileName())
+        self.assertEqual(mod.getDocString(), live.getDocString())
+
+        located = mod.withParentAndName(None, name)
+        self.assertEqual(located['module'].getPath(), name + '.module')
+
+    def test_changed_module(self):
+        from zope.app.apidoc.codemodule.snapshot import SnapshotModule
+        self._setup()
+        with open(self.filename) as f:
+            data = json.load(f)
+        data['modules']['zope.app.apidoc.codemodule.text']['mtime'] = 0
+        with open(self.filename, 'w') as f:
+            json.dump(data, f)
+
+        mod = self._setup()['zope.app.apidoc.codemodule']
+        self.assertIsInstance(mod, SnapshotModule)
+        self.assertNotIsInstance(mod['text'], SnapshotModule)
+        self.assertIsInstance(mod['module'], SnapshotModule)
+        with open(self.filename) as f:
+            modules = json.load(f)['modules']
+        self.assertNotEqual(modules['zope.app.apidoc.codemodule.text'],
+                            data['modules']['zope.app.apidoc.codemodule.text'])
+
+    def test_other_settings(self):
+        from zope.app.apidoc import classregistry
+        from zope.app.apidoc.codemodule.snapshot import SnapshotModule
+        self._setup()
+        old = classregistry.setIgnoreModules(
+            ['twisted', 'zope.app.apidoc.book'])
+        try:
+            mod = self._setup()['zope.app.apidoc.codemodule']
+        finally:
+            classregistry.setIgnoreModules(old)
+        self.assertNotIsInstance(mod, SnapshotModule)
+
+    def test_changed_dependency(self):
+        from zope.app.apidoc.codemodule import interfaces
+        from zope.app.apidoc.codemodule.snapshot import SnapshotModule
+        self._setup()
+        with open(self.filename) as f:
+            data = json.load(f)
+        entry = data['modules']['zope.app.apidoc.codemodule.module']
+        self.assertIn(interfaces.__file__, entry['dependencies'])
+        self.assertNotIn('doc', entry)
+        entry['dependencies'][interfaces.__file__] = 0
+        with open(self.filename, 'w') as f:
+            json.dump(data, f)
+
+        mod = self._setup()['zope.app.apidoc.codemodule']
+        self.assertIsInstance(mod, SnapshotModule)
+        self.assertNotIsInstance(mod['module'], SnapshotModule)
+        self.assertIsInstance(mod['text'], SnapshotModule)
+
+    def test_changed_configuration(self):
+        from zope.app.appsetup import appsetup
+
+        from zope.app.apidoc.codemodule.snapshot import SnapshotModule
+
+        class Context:
+            _seen_files = {os.path.join(self.tmpdir, 'site.zcml')}
+
+        zcml, = Context._seen_files
+        with open(zcml, 'w') as f:
+            f.write('<configure />')
+        old = appsetup.getConfigContext()
+        setattr(appsetup, '__config_context', Context())
+        try:
+            self._setup()
+            self.assertIsInstance(self._setup()['zope.app.apidoc.codemodule'],
+                                  SnapshotModule)
+            os.utime(zcml, ns=(0, 0))
+            mod = self._setup()['zope.app.apidoc.codemodule']
+        finally:
+            setattr(appsetup, '__config_context', old)
+        self.assertNotIsInstance(mod, SnapshotModule)
+
+
+class TestSource(unittest.TestCase):
+
+    source = textwrap.dedent('''
+        """The module."""
+        from zope.interface import Interface
+        from zope.interface import implementer
+
+        from .interfaces import IModuleDocumentation as IModule
+
+        class IThing(Interface):
+            """A thing."""
+
+        class ISpecialThing(IThing):
+            pass
+
+        @implementer(IThing, IModule)
+        class Thing(dict):
+            """The thing."""
+
+        class SpecialThing(Thing):
+            pass
+
+        def function(a, b: int = 1, *args, c, d=None, **kw) -> str:
+            """A function."""
+
+        def _private(a, /, b):
+            pass
+
+        CONSTANT = 1
+        ''')
+
+    def setUp(self):
+        testing.setUp()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        testing.tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def _parse(self, source):
+        from zope.app.apidoc.codemodule.source import parseModule
+        filename = os.path.join(self.tmpdir, 'module.py')
+        with open(filename, 'w') as f:
+            f.write(source)
+        return parseModule(filename, 'zope.app.apidoc.codemodule.module')
+
+    def test_parseModule(self):
+        info = self._parse(self.source)
+        self.assertFalse(info['live'])
+        self.assertEqual(info['doc'], 'The module.')
+        self.assertEqual(sorted(info['interfaces']),
+                         ['ISpecialThing', 'IThing'])
+        self.assertEqual(sorted(info['classes']), ['SpecialThing', 'Thing'])
+        thing = info['classes']['Thing']
+        self.assertEqual(thing['doc'], 'The thing.')
+        self.assertEqual(thing['bases'], ['builtins.dict'])
+        self.assertEqual(thing['interfaces'], [
+            'zope.app.apidoc.codemodule.module.IThing',
+            'zope.app.apidoc.codemodule.interfaces.IModuleDocumentation'])
+        self.assertEqual(info['classes']['SpecialThing']['bases'],
+                         ['zope.app.apidoc.codemodule.module.Thing'])
+        self.assertEqual(sorted(info['functions']), ['_private', 'function'])
+        self.assertEqual(info['functions']['function']['signature'],
+                         '(a, b: int = 1, *args, c, d=None, **kw) -> str')
+        self.assertEqual(info['functions']['_private']['signature'],
+                         '(a, /, b)')
+
+    def test_parseModule_all(self):
+        info = self._parse(self.source + '__all__ = ["Thing", "CONSTANT"]\n')
+        self.assertFalse(info['live'])
+        self.assertEqual(sorted(info['classes']), ['Thing'])
+        self.assertEqual(info['functions'], {})
+
+    def test_parseModule_live(self):
+        for source in (self.source + '__all__ = ["Interface"]\n',
+                       self.source + '__all__ = list(globals())\n',
+                       self.source + 'moduleProvides(IThing)\n',
+                       'def (:\n'):
+            self.assertTrue(self._parse(source)['live'], source)
+
+    def test_analysis(self):
+        from zope.component import provideAdapter
+        from zope.traversing.browser.interfaces import IAbsoluteURL
+
+        from zope.app.apidoc.classregistry import classRegistry
+        from zope.app.apidoc.codemodule.browser.module import ModuleDetails
+        from zope.app.apidoc.codemodule.class_ import Class
+        from zope.app.apidoc.codemodule.interfaces import IModuleDocumentation
+        from zope.app.apidoc.codemodule.source import Analysis
+        from zope.app.apidoc.codemodule.source import SourceClass
+        from zope.app.apidoc.codemodule.source import SourceInterface
+        from zope.app.apidoc.codemodule.source import SourceModule
+        name = 'zope.app.apidoc.codemodule'
+        analysis = Analysis()
+        mod = analysis.getModule(None, name, name)
+        analysis.register()
+        path = name + '.module.Module'
+        self.assertIn(path, classRegistry._deferred)
+        self.assertIn(path, dict(classRegistry.getClassesThatImplement(
+            IModuleDocumentation)))
+
+        self.assertIsInstance(mod, SourceModule)
+        self.assertTrue(mod.isPackage())
+        self.assertEqual(mod.getDocString(),
+                         zope.app.apidoc.codemodule.__doc__)
+        self.assertIsInstance(mod['module'], SourceModule)
+
+        klass = mod['module']['Module']
+        self.assertIsInstance(klass, SourceClass)
+        self.assertEqual(klass.getDocString(), Module.__doc__)
+        self.assertEqual(klass.getBases(), Module.__bases__)
+        self.assertIsInstance(klass._class, Class)
+
+        interfaces = mod['interfaces']
+        self.assertIsInstance(interfaces._children['IModuleDocumentation'],
+                              SourceInterface)
+        self.assertIs(removeAllProxies(interfaces['IModuleDocumentation']),
+                      IModuleDocumentation)
+        located = interfaces.withParentAndName(None, 'interfaces')
+        self.assertIs(removeAllProxies(located['IModuleDocumentation']),
+                      IModuleDocumentation)
+
+        provideAdapter(lambda ob, request: lambda: ob.__name__,
+                       (None, None), IAbsoluteURL)
+        view = ModuleDetails(located, TestRequest())
+        self.assertIn('zope.app.apidoc.codemodule.interfaces.IZCMLFile',
+                      [entry['path'] for entry in view.getInterfaces()])
+
+    def test_analysis_interfaces(self):
+        import importlib
+
+        from zope.container.interfaces import IReadContainer
+        from zope.interface import Interface
+        from zope.interface import classImplements
+
+        from zope.app.apidoc.classregistry import classRegistry
+        from zope.app.apidoc.codemodule.source import Analysis
+
+        # A package that is not imported.
+        package = os.path.join(self.tmpdir, 'apidocsourcepkg')
+        os.mkdir(package)
+        with open(os.path.join(package, '__init__.py'), 'w') as f:
+            f.write(textwrap.dedent('''
+                from zope.interface import Interface
+                from zope.interface import implementer
+
+                class IBase(Interface):
+                    pass
+
+                class IThing(IBase):
+                    pass
+
+                @implementer(IThing)
+                class Thing:
+                    pass
+                '''))
+        sys.path.insert(0, self.tmpdir)
+        self.addCleanup(sys.path.remove, self.tmpdir)
+        self.addCleanup(sys.modules.pop, 'apidocsourcepkg', None)
+        name = 'zope.app.apidoc.codemodule'
+        analysis = Analysis()
+        analysis.getModule(None, name, name)
+        analysis.getModule(None, 'apidocsourcepkg', 'apidocsourcepkg')
+        analysis.register()
+
+        # The interfaces that the declared ones extend are indexed too; the
+        # imported ones by their own identifiers, the others from the
+        # source.
+        path = name + '.module.Module'
+        self.assertIn(path, classRegistry._deferred)
+        self.assertIn(path, classRegistry._implementers[
+            IReadContainer.__identifier__])
+        for identifier in ('apidocsourcepkg.IThing', 'apidocsourcepkg.IBase',
+                           'zope.interface.Interface'):
+            self.assertIn('apidocsourcepkg.Thing',
+                          classRegistry._implementers[identifier])
+        self.assertNotIn('apidocsourcepkg', sys.modules)
+
+        # Interfaces declared after the description, like in ZCML, are
+        # found once the module is imported.
+        class IDeclaredLater(Interface):
+            pass
+        self.assertEqual(
+            [], classRegistry.getClassesThatImplement(IDeclaredLater))
+        module = importlib.import_module('apidocsourcepkg')
+        classImplements(module.Thing, IDeclaredLater)
+        self.assertEqual(
+            [('apidocsourcepkg.Thing', module.Thing)],
+            classRegistry.getClassesThatImplement(IDeclaredLater))
+        self.assertIn(path, dict(classRegistry.getClassesThatImplement(
+            IReadContainer)))
+
+    def test_workers(self):
+        from zope.app.apidoc.codemodule.source import Analysis
+        name = 'zope.app.apidoc.codemodule'
+        analysis = Analysis(workers=2)
+        self.addCleanup(analysis.close)
+        mod = analysis.getModule(None, name, name)
+        # One pool parses the source files of all root modules.
+        executor = analysis._executor
+        analysis.getModule(None, 'zope.app.apidoc.bookmodule',
+                           'zope.app.apidoc.bookmodule')
+        self.assertIs(analysis._executor, executor)
+        self.assertEqual(analysis._parsed, {})
+        self.assertEqual(analysis._listings, {})
+        sequential = Analysis()
+        sequential.getModule(None, name, name)
+        sequential.getModule(None, 'zope.app.apidoc.bookmodule',
+                             'zope.app.apidoc.bookmodule')
+        self.assertEqual(analysis.classes, sequential.classes)
+        self.assertEqual(mod['module']._info['classes'],
+                         sequential.parse(mod['module'].getFileName(),
+                                          name + '.module', False)['classes'])
+        # Every source file was parsed by the workers.
+        self.assertEqual(0, sequential.parsedInWorkers)
+        sources = 0
+        for package in (zope.app.apidoc.codemodule,
+                        zope.app.apidoc.bookmodule):
+            sources += len(list(Analysis()._findSources(
+                package.__name__, package.__file__, package.__path__)))
+        self.assertGreater(sources, 10)
+        self.assertEqual(sources, analysis.parsedInWorkers)
+        analysis.register()
+        self.assertIsNone(analysis._executor)
+
+    def test_workers_unavailable(self):
+        import concurrent.futures
+
+        from zope.app.apidoc.codemodule import source
+        name = 'zope.app.apidoc.codemodule'
+
+        def unavailable(*args, **kwargs):
+            raise OSError('No processes here.')
+
+        analysis = source.Analysis(workers=2)
+        old = concurrent.futures.ProcessPoolExecutor
+        concurrent.futures.ProcessPoolExecutor = unavailable
+        try:
+            with self.assertLogs(source.logger) as logs:
+                mod = analysis.getModule(None, name, name)
+        finally:
+            concurrent.futures.ProcessPoolExecutor = old
+        self.assertIn('Cannot parse the source files in worker processes',
+                      logs.output[0])
+        # The files are parsed in this process instead.
+        self.assertEqual(0, analysis.parsedInWorkers)
+        self.assertIn('Module', mod['module']._info['classes'])
+        self.assertIn(name + '.module.Module', analysis.classes)
+
+    def test_setup(self):
+        from zope.component import provideUtility
+
+        from zope.app.apidoc.codemodule.codemodule import CodeModule
+        from zope.app.apidoc.codemodule.interfaces import IAPIDocRootModule
+        from zope.app.apidoc.codemodule.metaconfigure import RootModule
+        from zope.app.apidoc.codemodule.metaconfigure import setSourceAnalysis
+        from zope.app.apidoc.codemodule.source import SourceModule
+        name = 'zope.app.apidoc.codemodule'
+        provideUtility(RootModule(name), IAPIDocRootModule, name)
+        setSourceAnalysis(True)
+        try:
+            code = CodeModule()
+            self.assertIsInstance(code[name], SourceModule)
+            self.assertNotIsInstance(code['builtins'], SourceModule)
+        finally:
+            setSourceAnalysis(False)
+
 
 class TestZCML(unittest.TestCase):
 
@@ -31,7 +31,6 @@ from zope.traversing.api import getName
 from zope.traversing.api import traverse
 from zope.traversing.browser import absoluteURL
 
-from zope.app.apidoc import classregistry
 from zope.app.apidoc import component
 from zope.app.apidoc import interface
 from zope.app.apidoc import presentation
@@ -205,7 +204,7 @@ class InterfaceDetails(BrowserView):
         # Must remove security and location proxies, so that we have access to
         # the API methods and class representation.
         iface = removeAllProxies(self.context)
-        classes = classregistry.classRegistry.getClassesThatImplement(iface)
+        classes = component.getClasses(iface)
         return [{'path': path, 'url': path.replace('.', '/')}
                 for path, klass in classes]
 
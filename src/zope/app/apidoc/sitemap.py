@@ -0,0 +1,117 @@
+##############################################################################
+#
+# Copyright (c) 2005 Zope Foundation and Contributors.
+# All Rights Reserved.
+#
+# This software is subject to the provisions of the Zope Public License,
+# Version 2.1 (ZPL).  A copy of the ZPL should accompany this distribution.
+# THIS SOFTWARE IS PROVIDED "AS IS" AND ANY AND ALL EXPRESS OR IMPLIED
+# WARRANTIES ARE DISCLAIMED, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF TITLE, MERCHANTABILITY, AGAINST INFRINGEMENT, AND FITNESS
+# FOR A PARTICULAR PURPOSE.
+#
+##############################################################################
+"""The pages of the API documentation.
+
+The static export finds the pages by following the links of the pages it
+already has. The functions here instead walk the documentation modules and
+list their pages up front, using the same URLs as the menus of the
+modules.
+"""
+__docformat__ = 'restructuredtext'
+
+from urllib.parse import quote_from_bytes
+
+from zope.app.onlinehelp.interfaces import IOnlineHelpTopic
+
+from zope.app.apidoc.apidoc import APIDocumentation
+from zope.app.apidoc.bookmodule.book import BookModule
+from zope.app.apidoc.bookmodule.metaconfigure import EMPTYPATH
+from zope.app.apidoc.codemodule.codemodule import CodeModule
+from zope.app.apidoc.codemodule.interfaces import IModuleDocumentation
+from zope.app.apidoc.ifacemodule.ifacemodule import InterfaceModule
+from zope.app.apidoc.typemodule.type import TypeModule
+from zope.app.apidoc.utilitymodule.utilitymodule import UtilityModule
+from zope.app.apidoc.zcmlmodule import ZCMLModule
+
+
+def _quote(name):
+    # Quote a name the way `zope.traversing` does in URLs.
+    return quote_from_bytes(name.encode('utf-8'), '@+')
+
+
+def _interfacePage(name):
+    return 'Interface/%s/index.html' % _quote(name)
+
+
+def _codePages(module, path):
+    for name, obj in module.items():
+        child = path + '/' + _quote(name)
+        yield child + '/index.html'
+        if IModuleDocumentation.providedBy(obj):
+            yield from _codePages(obj, child)
+
+
+def _interfacePages(module, path):
+    for name, _ in module.items():
+        yield '{}/{}/index.html'.format(path, _quote(name))
+
+
+def _utilityPages(module, path):
+    for iface_name, iface in module.items():
+        yield _interfacePage(iface_name)
+        for name, _ in iface.items():
+            yield '{}/{}/{}/index.html'.format(
+                path, _quote(iface_name), _quote(name))
+
+
+def _zcmlPages(module, path):
+    for ns_name, namespace in module.items():
+        for name, _ in namespace.items():
+            yield '{}/{}/{}/index.html'.format(
+                path, _quote(ns_name), _quote(name))
+
+
+def _typePages(module, path):
+    for type_name, type_iface in module.items():
+        yield _interfacePage(type_name)
+        for name, _ in type_iface.items():
+            yield _interfacePage(name)
+
+
+def _bookPages(topic, path):
+    for _, subtopic in topic.items():
+        if not IOnlineHelpTopic.providedBy(subtopic):
+            continue
+        if subtopic.path != EMPTYPATH:
+            yield '{}/{}/show.html'.format(path, subtopic.getTopicPath())
+        yield from _bookPages(subtopic, path)
+
+
+#: The functions that list the pages of the documentation modules. They are
+#: called with the module and its path below the API documentation root.
+PAGE_LISTERS = [
+    (CodeModule, _codePages),
+    (InterfaceModule, _interfacePages),
+    (UtilityModule, _utilityPages),
+    (ZCMLModule, _zcmlPages),
+    (TypeModule, _typePages),
+    (BookModule, _bookPages),
+]
+
+
+def iterPages(apidoc=None):
+    """Iterate the paths of the documentation pages.
+
+    The paths are relative to the API documentation root, *apidoc*, which
+    is a new :class:`~.APIDocumentation` by default. A page may be listed
+    more than once. Modules without a function in `PAGE_LISTERS` are
+    skipped.
+    """
+    if apidoc is None:
+        apidoc = APIDocumentation(None, '++apidoc++')
+    for name, module in apidoc.items():
+        for module_class, lister in PAGE_LISTERS:
+            if isinstance(module, module_class):
+                yield from lister(module, _quote(name))
+                break
@@ -18,12 +18,27 @@
 __docformat__ = "reStructuredText"
 
 import argparse
+import asyncio
 import base64
+import collections
+import gzip
+import hashlib
+import html
+import http.client
+import io
+import json
+import math
+import multiprocessing
 import os
 import os.path
+import queue
+import re
 import sys
+import tarfile
+import threading
 import time
 import warnings
+import zipfile
 from urllib import error as urllib2
 from urllib import parse as urlparse
 
@@ -35,6 +50,14 @@ from zope.app.apidoc import classregistry
 
 VERBOSITY_MAP = {1: 'ERROR', 2: 'WARNING', 3: 'INFO'}
 
+#: The name of the file, in the target directory, that records what an
+#: ``--incremental`` export was built from.
+MANIFEST_NAME = '.apidoc-manifest.json'
+
+#: The name of the file, in the target directory, that records the state of
+#: an unfinished export, so that it can be continued with ``--resume``.
+CHECKPOINT_NAME = '.apidoc-checkpoint.json'
+
 # A mapping of HTML elements that can contain links to the attribute that
 # actually contains the link, with the exception of standard <a> tags.
 urltags = {
@@ -47,6 +70,90 @@ urltags = {
     "script": "src",
 }
 
+# The start tags of the elements that can contain links, and the comments
+# and script bodies in which we must not look for them.
+_linktag_re = re.compile(
+    r'<!--.*?-->'
+    r'|<(a|area|base|frame|iframe|link|img|script)\b'
+    r'((?:"[^"]*"|\'[^\']*\'|[^\'">])*)>',
+    re.I | re.S)
+_endscript_re = re.compile(r'</script\s*>', re.I)
+# One attribute of a start tag, with its optional value.
+_attr_re = re.compile(
+    r'([^\s"\'>/=]+)(?:\s*=\s*("[^"]*"|\'[^\']*\'|[^\s"\'>]+))?')
+
+
+def findLinkAttributes(contents):
+    """Find the links in the HTML *contents*.
+
+    Yields a ``(start, end, url)`` tuple for every attribute that contains
+    a link, where *start* and *end* are the offsets of the attribute value,
+    without quotes, and *url* is the unescaped value.
+    """
+    for _tagname, start, end, url in _iterLinkAttributes(contents):
+        yield start, end, url
+
+
+def _iterLinkAttributes(contents):
+    pos = 0
+    while True:
+        match = _linktag_re.search(contents, pos)
+        if match is None:
+            return
+        pos = match.end()
+        tagname = match.group(1)
+        if tagname is None:
+            # A comment.
+            continue
+        tagname = tagname.lower()
+        attrname = urltags.get(tagname, 'href')
+        offset = match.start(2)
+        for attr in _attr_re.finditer(match.group(2)):
+            value = attr.group(2)
+            if value is None or attr.group(1).lower() != attrname:
+                continue
+            start, end = offset + attr.start(2), offset + attr.end(2)
+            if value[0] in '"\'':
+                start, end, value = start + 1, end - 1, value[1:-1]
+            yield tagname, start, end, html.unescape(value)
+            break
+        if tagname == 'script' and not match.group(2).rstrip().endswith('/'):
+            end_match = _endscript_re.search(contents, pos)
+            pos = end_match.end() if end_match is not None else len(contents)
+
+
+def getBaseURL(contents, url):
+    """Return the URL that the links in the HTML *contents* are relative to.
+
+    That is the ``<base href>`` of the page, if any, or its own *url*.
+    """
+    if '<base' not in contents.lower():
+        return url
+    for tagname, _start, _end, href in _iterLinkAttributes(contents):
+        if tagname == 'base':
+            return urlparse.urljoin(url, href)
+    return url
+
+
+def rewriteLinks(contents, rewrite):
+    """Rewrite the links in the HTML *contents* in a single pass.
+
+    *rewrite* is called with the unescaped value of every link found by
+    `findLinkAttributes` and returns the new value, or `None` to keep the
+    link as it is.
+    """
+    parts = []
+    last = 0
+    for start, end, url in findLinkAttributes(contents):
+        new_url = rewrite(url)
+        if new_url is None:
+            continue
+        parts.append(contents[last:start])
+        parts.append(html.escape(new_url))
+        last = end
+    parts.append(contents[last:])
+    return ''.join(parts)
+
 
 def getMaxWidth():
     try:
@@ -124,6 +231,544 @@ class Link:
         return self.absoluteURL.startswith(allowed_prefixes)
 
 
+def _statFiles(paths, cache=None):
+    """Map the existing files among *paths* to their mtime and size."""
+    stats = {}
+    for path in paths:
+        if cache is not None and path in cache:
+            stat = cache[path]
+        else:
+            try:
+                st = os.stat(path)
+            except OSError:
+                stat = None
+            else:
+                stat = [st.st_mtime_ns, st.st_size]
+            if cache is not None:
+                cache[path] = stat
+        if stat is not None:
+            stats[path] = stat
+    return stats
+
+
+def _codePathForURL(url):
+    """Return the dotted path of the object a Code browser page is about.
+
+    For pages outside the Code browser, and for the pages of the Code
+    module itself, `None` is returned.
+    """
+    marker = '/++apidoc++/Code/'
+    if marker not in url:
+        return None
+    segments = urlparse.urlsplit(url).path.split(marker, 1)[1].split('/')
+    return '.'.join(segments[:-1]) or None
+
+
+def isResourceURL(url):
+    """Whether *url* refers to a resource rather than a page."""
+    path = urlparse.urlsplit(url).path
+    return '/@@/' in path or '/++resource++' in path
+
+
+def _isNavigationURL(url):
+    """Whether *url* is one of the pages that navigate the documentation.
+
+    These are the pages of the API documentation root, like the frames of
+    ``static.html``, and the menus of its modules.
+    """
+    path = urlparse.urlsplit(url).path
+    marker = '/++apidoc++/'
+    if marker not in path:
+        return False
+    rest = path.split(marker, 1)[1].split('/')
+    return len(rest) == 1 or rest[-1] in ('staticmenu.html',
+                                          '@@staticmenu.html')
+
+
+def _moduleForURL(url):
+    """Return the module of a page of the Code browser.
+
+    The module is returned with the remaining path segments of the page,
+    without the file name. Only the modules that are already imported are
+    considered; if there is none, ``(None, [])`` is returned.
+    """
+    marker = '/++apidoc++/Code/'
+    if marker not in url:
+        return None, []
+    segments = url.split(marker, 1)[1].split('/')[:-1]
+
+    for i in range(len(segments), 0, -1):
+        module = sys.modules.get('.'.join(segments[:i]))
+        if module is not None:
+            return module, segments[i:]
+    return None, []
+
+
+def _packageForURL(url):
+    """Return the dotted name of the package a Code browser page is in.
+
+    The name is derived from the URL alone, since the pages of a Web server
+    are not documenting our modules: a file belongs to the package it is
+    in, a class (a name starting with a capital letter) to the package of
+    its module, and a module or package to its parent package.
+    """
+    if _codePathForURL(url) is None:
+        return None
+    marker = '/++apidoc++/Code/'
+    segments = urlparse.urlsplit(url).path.split(marker, 1)[1].split('/')
+    segments = segments[:-1]
+    if '.' in segments[-1]:
+        return '.'.join(segments[:-1]) or None
+    if len(segments) > 1 and segments[-1][:1].isupper():
+        segments.pop()
+    return '.'.join(segments[:-1]) or segments[0]
+
+
+def _sourcesForURL(url):
+    """Return the source files a page of the Code browser is built from.
+
+    Only the modules that are already imported are considered. For pages
+    outside the Code browser, or if the sources cannot be determined,
+    an empty list is returned.
+    """
+    module, rest = _moduleForURL(url)
+    if module is None:
+        return []
+
+    module_file = getattr(module, '__file__', None)
+    if not module_file:
+        return []
+    sources = [module_file]
+
+    if not rest:
+        # A package lists its modules and files; adding or removing one
+        # changes the modification time of its directories.
+        sources.extend(getattr(module, '__path__', ()))
+    elif rest[0].endswith(('.zcml', '.txt', '.rst')):
+        sources.append(os.path.join(os.path.dirname(module_file), rest[0]))
+    else:
+        # Classes also document what they inherit.
+        klass = getattr(module, rest[0], None)
+        for base in getattr(klass, '__mro__', ())[1:]:
+            base_module = sys.modules.get(getattr(base, '__module__', None))
+            base_file = getattr(base_module, '__file__', None)
+            if base_file and base_file not in sources:
+                sources.append(base_file)
+    return sources
+
+
+def _dependsOnRegistry(url):
+    """Whether a page of the Code browser shows what the class registry
+    knows, like the known subclasses of a class.
+
+    Such a page also depends on the other modules, not only on its sources.
+    """
+    module, rest = _moduleForURL(url)
+    if module is None or not rest:
+        return False
+    return isinstance(getattr(module, rest[0], None), type)
+
+
+def _percentile(values, percent):
+    # The nearest-rank percentile of the sorted *values*.
+    if not values:
+        return 0
+    rank = max(int(math.ceil(percent / 100.0 * len(values))), 1)
+    return values[rank - 1]
+
+
+def makeReport(stats, top=20):
+    """Summarize the statistics of the retrieved pages.
+
+    *stats* maps the URLs to dictionaries with the ``render`` and ``parse``
+    times in seconds, the ``bytes`` written, the number of ``links`` and
+    the ``package`` of the page, if any. The report has the totals and
+    percentiles of these, and the *top* slowest pages and packages.
+    """
+    measures = ('render', 'parse', 'bytes', 'links')
+    totals = {measure: sum(entry[measure] for entry in stats.values())
+              for measure in measures}
+    percentiles = {}
+    for measure in measures:
+        values = sorted(entry[measure] for entry in stats.values())
+        percentiles[measure] = {
+            'p%i' % percent: _percentile(values, percent)
+            for percent in (50, 90, 95, 99, 100)}
+
+    def cost(entry):
+        return entry['render'] + entry['parse']
+
+    slowest = sorted(stats.items(), key=lambda item: cost(item[1]),
+                     reverse=True)[:top]
+
+    packages = {}
+    for entry in stats.values():
+        if entry['package'] is None:
+            continue
+        package = packages.setdefault(entry['package'], dict.fromkeys(
+            ('pages', 'render', 'parse', 'bytes', 'links'), 0))
+        package['pages'] += 1
+        for measure in measures:
+            package[measure] += entry[measure]
+
+    return {
+        'version': 1,
+        'pages': len(stats),
+        'totals': totals,
+        'percentiles': percentiles,
+        'slowest_pages': [dict(entry, url=url) for url, entry in slowest],
+        'slowest_packages': [
+            dict(entry, package=name) for name, entry in sorted(
+                packages.items(), key=lambda item: cost(item[1]),
+                reverse=True)[:top]],
+        'urls': stats,
+    }
+
+
+#: The extensions of the resources that ``--hash-assets`` stores under
+#: content-hashed names. Images keep their names, since the scripts of the
+#: menus switch them by name.
+HASHED_ASSET_EXTENSIONS = ('.css', '.js')
+
+#: The directory, in the target directory, of the content-hashed resources.
+ASSETS_DIR = '_static'
+
+
+def isHashedAsset(url):
+    """Whether ``--hash-assets`` stores the resource at *url* by its hash."""
+    return (isResourceURL(url)
+            and urlparse.urlsplit(url).path.endswith(
+                HASHED_ASSET_EXTENSIONS))
+
+
+def getAssetName(url, data):
+    """Return the content-hashed name of the resource at *url*.
+
+    The name keeps the file name of the resource, in a directory named
+    after the hash of its *data*.
+    """
+    digest = hashlib.sha1(data).hexdigest()[:16]
+    filename = urlparse.urlsplit(url).path.rsplit('/', 1)[-1]
+    return '/'.join((ASSETS_DIR, digest, filename))
+
+
+def gzipData(data):
+    """Compress *data* reproducibly, without a time stamp."""
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb', mtime=0) as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+def indexPagesFirst(link):
+    """A `LinkFrontier` priority that retrieves index pages first."""
+    return 0 if link.absoluteURL.endswith('/index.html') else 1
+
+
+class LinkFrontier:
+    """The queue of links that are still to be retrieved.
+
+    Links are retrieved in the order they were added. If a *priority*
+    function is given, it maps each link to a number, and links with lower
+    numbers are retrieved first.
+
+    Every URL is queued only once, no matter how often it is added, so the
+    queue never grows larger than the number of distinct URLs; adding and
+    taking a link costs constant time.
+    """
+
+    def __init__(self, priority=None):
+        self.priority = priority
+        self._queues = {}
+        self._seen = set()
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        """Iterate the queued links in the order they will be retrieved."""
+        for level in sorted(self._queues):
+            yield from self._queues[level]
+
+    def add(self, link):
+        """Queue *link*, unless its URL was ever queued before."""
+        url = link.absoluteURL
+        if url in self._seen:
+            return False
+        self._seen.add(url)
+        level = self.priority(link) if self.priority is not None else 0
+        queue = self._queues.get(level)
+        if queue is None:
+            queue = self._queues[level] = collections.deque()
+        queue.append(link)
+        self._len += 1
+        return True
+
+    def requeue(self, link):
+        """Queue *link* again, even though its URL was queued before."""
+        self._seen.discard(link.absoluteURL)
+        return self.add(link)
+
+    def markSeen(self, urls):
+        """Do not queue links to any of the *urls* from now on."""
+        self._seen.update(urls)
+
+    def pop(self):
+        """Remove and return the next link to retrieve."""
+        if not self._queues:
+            raise IndexError('pop from an empty LinkFrontier')
+        level = min(self._queues)
+        queue = self._queues[level]
+        link = queue.popleft()
+        if not queue:
+            del self._queues[level]
+        self._len -= 1
+        return link
+
+
+class Manifest:
+    """The record of a previous ``--incremental`` export.
+
+    For every URL, we remember the file it was written to, a hash of the
+    contents, the links found in it, the source files and directories it
+    was built from, and whether it shows what the class registry knows
+    about other modules. For the export as a whole, we remember the
+    settings that were used and the configuration files that were loaded;
+    if either changes, no page can be reused.
+    """
+
+    version = 2
+
+    def __init__(self, settings, configuration=None, pages=None):
+        self.settings = settings
+        self.configuration = configuration or {}
+        self.pages = pages or {}
+
+    @classmethod
+    def load(cls, path):
+        """Load the manifest at *path*; return `None` if we cannot."""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get('version') != cls.version:
+            return None
+        return cls(data['settings'], data['configuration'], data['pages'])
+
+    def save(self, path):
+        data = {
+            'version': self.version,
+            'settings': self.settings,
+            'configuration': self.configuration,
+            'pages': self.pages,
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def isCurrent(self, settings):
+        """Can the pages recorded here be reused with *settings*?"""
+        return (self.settings == settings
+                and _statFiles(self.configuration) == self.configuration)
+
+
+class DirectoryWriter:
+    """Write the pages as files below the directory *root*.
+
+    The names of the pages are relative paths separated by ``/``.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        # The directories we know to exist.
+        self._dirs = set()
+
+    def write(self, name, data):
+        dirname = os.path.dirname(name)
+        if dirname not in self._dirs:
+            # Parallel workers may race us to it.
+            os.makedirs(os.path.join(self.root, dirname), exist_ok=True)
+            self._dirs.add(dirname)
+        try:
+            with open(os.path.join(self.root, name), 'wb') as f:
+                f.write(data)
+        except OSError:  # pragma: no cover
+            # The file already exists, so it is a duplicate and a bad one,
+            # since the URL misses `index.hml`. ReST can produce strange URLs
+            # that produce this problem, and we have little control over it.
+
+            # In other words, since we don't specify to open the file
+            # in exclusive creation, perhaps it refers to a
+            # directory? Or the disk is getting full?
+            pass
+
+    def close(self, complete=True):
+        pass
+
+
+#: The default time stamp of the files in the archives, 1980-01-01 UTC.
+ARCHIVE_EPOCH = 315532800
+
+
+def getSourceDate():
+    """Return the time stamp of the files in the archives.
+
+    That is ``SOURCE_DATE_EPOCH`` if it is set, so that an export is
+    reproducible, and the beginning of 1980, the earliest time a ZIP
+    archive can store, otherwise.
+    """
+    epoch = os.environ.get('SOURCE_DATE_EPOCH')
+    if epoch:
+        return max(int(epoch), ARCHIVE_EPOCH)
+    return ARCHIVE_EPOCH
+
+
+class ArchiveWriter:
+    """Stream the pages into the archive *path*.
+
+    The archive is written under a temporary name and only gets its real
+    name when it is closed after a *complete* export, so that an unfinished
+    one does not replace the archive of an earlier run. Of several pages
+    with the same name, the first one is kept. All of them get the time
+    stamp of `getSourceDate`.
+
+    Subclasses open the archive and add the pages to it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = getSourceDate()
+        self._names = set()
+        self._archive = self._open(path + '.tmp')
+
+    def _open(self, path):
+        raise NotImplementedError
+
+    def _add(self, name, data):
+        raise NotImplementedError
+
+    def write(self, name, data):
+        if name not in self._names:
+            self._names.add(name)
+            self._add(name, data)
+
+    def close(self, complete=True):
+        self._archive.close()
+        if complete:
+            os.replace(self.path + '.tmp', self.path)
+
+
+class ZipWriter(ArchiveWriter):
+    """Stream the pages into the ZIP archive *path*."""
+
+    def _open(self, path):
+        return zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+
+    def _add(self, name, data):
+        info = zipfile.ZipInfo(name, time.gmtime(self.mtime)[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.external_attr = 0o644 << 16
+        self._archive.writestr(info, data)
+
+
+class TarWriter(ArchiveWriter):
+    """Stream the pages into the gzipped tar archive *path*."""
+
+    def _open(self, path):
+        self._file = open(path, 'wb')
+        # The gzip header would get the current time and the temporary
+        # name otherwise.
+        self._gzip = gzip.GzipFile('', 'wb', fileobj=self._file,
+                                   mtime=self.mtime)
+        return tarfile.open(fileobj=self._gzip, mode='w')
+
+    def _add(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = self.mtime
+        self._archive.addfile(info, io.BytesIO(data))
+
+    def close(self, complete=True):
+        self._archive.close()
+        self._gzip.close()
+        self._file.close()
+        if complete:
+            os.replace(self.path + '.tmp', self.path)
+
+
+#: The writers for the values of ``--output-format``, and the file
+#: extensions of the archives.
+WRITERS = {
+    'dir': (DirectoryWriter, ''),
+    'zip': (ZipWriter, '.zip'),
+    'tar.gz': (TarWriter, '.tar.gz'),
+}
+
+
+class WriteBehind:
+    """Hand the pages to *writer* in a background thread.
+
+    Up to *maxsize* pages wait to be written; only when that many are
+    waiting does `write` block. An error of the writer is raised by the
+    next call of `write`, or by `close`.
+    """
+
+    def __init__(self, writer, maxsize=64):
+        self.writer = writer
+        self._queue = queue.Queue(maxsize)
+        self._error = None
+        self._thread = threading.Thread(target=self._run,
+                                        name='static-apidoc writer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        for name, data in iter(self._queue.get, None):
+            if self._error is None:
+                try:
+                    self.writer.write(name, data)
+                except BaseException as error:
+                    self._error = error
+
+    def _raise(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def write(self, name, data):
+        self._raise()
+        self._queue.put((name, data))
+
+    def close(self, complete=True):
+        self._queue.put(None)
+        self._thread.join()
+        # Nothing that failed to be written makes a complete export.
+        self.writer.close(complete and self._error is None)
+        self._raise()
+
+
+class PageCollector(list):
+    """Collect the pages written in a worker process.
+
+    The worker sends them to the main process, which writes them into the
+    archive.
+    """
+
+    def write(self, name, data):
+        self.append((name, data))
+
+    def close(self, complete=True):
+        pass
+
+    def take(self):
+        pages = list(self)
+        del self[:]
+        return pages
+
+
 class OnlineBrowser(zope.testbrowser.browser.Browser):
 
     def setUserAndPassword(self, user, pw):
@@ -148,9 +793,50 @@ class OnlineBrowser(zope.testbrowser.browser.Browser):
         self.addHeader('X-zope-handle-errors', str(handle))
 
 
+def _beginLayer(target_package, zcml_file):
+    """Bring up Zope 3 for the publisher backed browsers.
+
+    Returns the layer and the previous configuration context, to be passed to
+    `_endLayer`.
+    """
+    from zope.app.appsetup import appsetup
+
+    if target_package:
+        import importlib
+        package = importlib.import_module(target_package)
+        from zope.app.apidoc.testing import _BrowserLayer
+        layer = _BrowserLayer(
+            package,
+            name="APIDocLayer",
+            zcml_file=zcml_file,
+            features=['static-apidoc'],
+            allowTearDown=True
+        )
+    else:
+        from zope.app.apidoc.testing import APIDocLayer as layer
+
+    layer.setUp()
+    layer.testSetUp()
+
+    # Fix up path for tests.
+    old_appsetup_context = appsetup.getConfigContext()
+    setattr(appsetup, '__config_context', layer.context)
+
+    return layer, old_appsetup_context
+
+
+def _endLayer(layer, old_appsetup_context):
+    from zope.app.appsetup import appsetup
+
+    layer.testTearDown()
+    layer.tearDown()
+    setattr(appsetup, '__config_context', old_appsetup_context)
+
+
 class PublisherBrowser(zope.testbrowser.wsgi.Browser):
 
     old_appsetup_context = None
+    layer = None
     target_package = None
     zcml_file = 'configure.zcml'
 
@@ -160,59 +846,361 @@ class PublisherBrowser(zope.testbrowser.wsgi.Browser):
 
     @classmethod
     def begin(cls):
-        from zope.app.appsetup import appsetup
+        layer, old_appsetup_context = _beginLayer(cls.target_package,
+                                                  cls.zcml_file)
+        self = cls()
+        self.layer = layer
+        self.old_appsetup_context = old_appsetup_context
+        return self
 
-        if cls.target_package:
-            import importlib
-            package = importlib.import_module(cls.target_package)
-            from zope.app.apidoc.testing import _BrowserLayer
-            APIDocLayer = _BrowserLayer(
-                package,
-                name="APIDocLayer",
-                zcml_file=cls.zcml_file,
-                features=['static-apidoc'],
-                allowTearDown=True
-            )
-        else:
-            from zope.app.apidoc.testing import APIDocLayer
+    def end(self):
+        _endLayer(self.layer, self.old_appsetup_context)
+        self.layer = self.old_appsetup_context = None
 
-        APIDocLayer.setUp()
-        APIDocLayer.testSetUp()
+    def setDebugMode(self, debug):
+        self.handleErrors = not debug
 
-        self = cls()
 
-        # Fix up path for tests.
-        self.old_appsetup_context = appsetup.getConfigContext()
-        setattr(appsetup, '__config_context', APIDocLayer.context)
+# The status codes of the redirects the browsers follow.
+_REDIRECTS = (301, 302, 303, 307)
+
+
+class DirectBrowser:
+    """Render the pages in this process, without publishing them.
+
+    This brings up Zope 3 like the `PublisherBrowser`. For every page it
+    traverses to the view of the documentation object and calls it; the
+    response only encodes the result. There is no WSGI environment, no
+    error views or retries of the publisher, and no :mod:`zope.testbrowser`
+    request and response handling.
+    """
+
+    old_appsetup_context = None
+    layer = None
+    target_package = None
+    zcml_file = 'configure.zcml'
+
+    handleErrors = True
+    maxRedirects = 10
+
+    url = None
+    contents = None
+    isHtml = False
 
+    def __init__(self, layer):
+        from zope.app.publication.browser import BrowserPublication
+        self.layer = layer
+        self.publication = BrowserPublication(layer.db)
+        self.environ = {}
+
+    def setUserAndPassword(self, user, pw):
+        """Specify the username and password to use for the retrieval."""
+        user_pw = (user + ':' + pw).encode('utf-8')
+        encoded = base64.b64encode(user_pw).decode('ascii')
+        self.environ['HTTP_AUTHORIZATION'] = 'Basic ' + encoded
+
+    @classmethod
+    def begin(cls):
+        layer, old_appsetup_context = _beginLayer(cls.target_package,
+                                                  cls.zcml_file)
+        self = cls(layer)
+        self.old_appsetup_context = old_appsetup_context
         return self
 
     def end(self):
-        from zope.app.appsetup import appsetup
-
-        from zope.app.apidoc.testing import APIDocLayer
-        APIDocLayer.testTearDown()
-        APIDocLayer.tearDown()
-        setattr(appsetup, '__config_context', self.old_appsetup_context)
-        self.old_appsetup_context = None
+        _endLayer(self.layer, self.old_appsetup_context)
+        self.layer = self.old_appsetup_context = None
 
     def setDebugMode(self, debug):
         self.handleErrors = not debug
 
+    def open(self, url):
+        """Render *url*, following redirects.
 
-class ArbitraryLink(zope.testbrowser.browser.Link):
+        Raises :class:`urllib.error.HTTPError` for error responses, like
+        :mod:`zope.testbrowser` does.
+        """
+        for _ in range(self.maxRedirects):
+            response = self._render(url)
+            status = response.getStatus()
+            if status not in _REDIRECTS:
+                break
+            url = urlparse.urljoin(url, response.getHeader('Location'))
+
+        body = b''.join(response.consumeBodyIter())
+        self.url = url
+        self.isHtml, self.contents = _decodeBody(
+            response.getHeader('Content-Type', ''), body)
+        if status in _REDIRECTS:
+            raise urllib2.HTTPError(url, status, 'Too many redirects',
+                                    [], None)
+        if status >= 400:
+            reason = response.getStatusString().partition(' ')[2]
+            raise urllib2.HTTPError(url, status, reason, [], None)
+
+    def _newRequest(self, url):
+        from zope.publisher.browser import BrowserRequest
+        from zope.publisher.skinnable import setDefaultSkin
+
+        parts = urlparse.urlsplit(url)
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'SERVER_NAME': parts.hostname,
+            'SERVER_PORT': str(parts.port or 80),
+            'HTTP_HOST': parts.netloc,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': urlparse.unquote(parts.path, 'latin-1'),
+            'QUERY_STRING': parts.query,
+        }
+        environ.update(self.environ)
+        request = BrowserRequest(io.BytesIO(), environ)
+        request.setPublication(self.publication)
+        setDefaultSkin(request)
+        request.processInputs()
+        return request
+
+    def _render(self, url):
+        # Render the page of url and return the response.
+        import transaction
+        from zope.publisher.interfaces import NotFound
+        from zope.security.interfaces import Forbidden
+        from zope.security.interfaces import Unauthorized
+
+        request = self._newRequest(url)
+        response = request.response
+        publication = self.publication
+        ob = None
+        publication.beforeTraversal(request)
+        try:
+            # Traverse to the view like the publisher does; the traversers
+            # look up the views with the request.
+            ob = request.traverse(publication.getApplication(request))
+            response.setResult(publication.callObject(request, ob))
+        except NotFound:
+            response.setStatus(404)
+        except Unauthorized:
+            response.setStatus(401)
+        except Forbidden:
+            response.setStatus(403)
+        except Exception:
+            if not self.handleErrors:
+                raise
+            response.setStatus(500)
+        else:
+            return response
+        finally:
+            # Nothing is changed by rendering the pages.
+            transaction.abort()
+            publication.endRequest(request, ob)
+            request.close()
+        # There are no error pages.
+        response.setResult('')
+        return response
+
+
+def _decodeBody(content_type, body):
+    """Return whether *body* is HTML, and the body decoded by its charset.
+
+    Without a charset the body is returned as bytes.
+    """
+    charset = None
+    for param in content_type.split(';')[1:]:
+        name, _, value = param.partition('=')
+        if name.strip().lower() == 'charset':
+            charset = value.strip()
+    return 'html' in content_type, body.decode(charset) if charset else body
+
+
+class FetchedPage:
+    """A page retrieved by the `AsyncFetcher`.
+
+    It has the ``url``, ``isHtml`` and ``contents`` of the browsers, plus
+    the ``status`` and ``reason`` of the response, and the seconds it took
+    to retrieve it as ``elapsed``.
+    """
+
+    elapsed = 0.0
+
+    def __init__(self, url, status, reason, headers, body):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.isHtml, self.contents = _decodeBody(
+            headers.get('Content-Type', ''), body)
+
+
+class AsyncFetcher:
+    """Retrieve pages from a Web server concurrently with :mod:`asyncio`.
+
+    No more than *concurrency* requests are sent at the same time. The
+    connections are kept alive and reused from request to request. If
+    *rate* is given, no more than *rate* requests per second are started
+    for any one host.
+
+    A fetcher belongs to the event loop it is first used in; it is closed
+    in that loop, too.
+    """
+
+    maxRedirects = 10
+
+    def __init__(self, concurrency=4, rate=None):
+        self.concurrency = concurrency
+        self.rate = rate
+        self.headers = {}
+        # The kept-alive connections that are not in use, by host.
+        self._idle = collections.defaultdict(list)
+        # Before Python 3.10 a semaphore belongs to the loop that is
+        # current when it is created, so it is created in fetch().
+        self._slots = None
+        # The loop time at which the next request to a host may start.
+        self._nextStart = {}
 
-    attr_name = 'src'
+    def setUserAndPassword(self, user, pw):
+        """Specify the username and password to use for the retrieval."""
+        user_pw = (user + ':' + pw).encode('utf-8')
+        encoded = base64.b64encode(user_pw).decode('ascii')
+        self.headers['Authorization'] = 'Basic ' + encoded
 
-    def __init__(self, elem, browser, base, attr_name=None):
-        super().__init__(elem, browser, base)
-        if attr_name:
-            self.attr_name = attr_name
+    def setDebugMode(self, debug):
+        self.headers['X-zope-handle-errors'] = str(not debug)
+
+    async def close(self):
+        """Close the kept-alive connections."""
+        writers = [writer for connections in self._idle.values()
+                   for _, writer in connections]
+        self._idle.clear()
+        for writer in writers:
+            writer.close()
+        for writer in writers:
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
 
-    @property
-    def url(self):
-        relurl = self._link[self.attr_name]
-        return self.browser._absoluteUrl(relurl)
+    async def fetch(self, url):
+        """Retrieve *url*, following redirects, and return a `FetchedPage`.
+
+        Error responses are returned like any other. Failing connections
+        raise an exception, and so do more than `maxRedirects` redirects:
+        a `urllib.error.HTTPError` with the status of the last one.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        elapsed = 0.0
+        for _ in range(self.maxRedirects + 1):
+            await self._throttle(urlparse.urlsplit(url).netloc)
+            start = time.perf_counter()
+            async with self._slots:
+                page = await self.get(url)
+            elapsed += time.perf_counter() - start
+            page.elapsed = elapsed
+            location = page.headers.get('Location')
+            if page.status not in _REDIRECTS or not location:
+                return page
+            url = urlparse.urljoin(url, location)
+        raise urllib2.HTTPError(page.url, page.status, 'Too many redirects',
+                                page.headers, None)
+
+    async def _throttle(self, host):
+        if not self.rate:
+            return
+        # The event loop runs in one thread, so we need no lock here.
+        now = asyncio.get_running_loop().time()
+        start = max(now, self._nextStart.get(host, now))
+        self._nextStart[host] = start + 1.0 / self.rate
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def get(self, url):
+        """Retrieve *url*, without following redirects."""
+        parts = urlparse.urlsplit(url)
+        key = parts.scheme, parts.netloc
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        lines = ['GET %s HTTP/1.1' % path, 'Host: ' + parts.netloc,
+                 'Accept-Encoding: identity']
+        lines.extend('%s: %s' % item for item in self.headers.items())
+        request = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+        idle = self._idle[key]
+        while idle:
+            connection = idle.pop()
+            try:
+                return await self._request(url, key, connection, request)
+            except (http.client.HTTPException, OSError):
+                # The server may have dropped the kept-alive connection in
+                # the meantime; try the next one.
+                pass
+        https = key[0] == 'https'
+        connection = await asyncio.open_connection(
+            parts.hostname, parts.port or (443 if https else 80),
+            ssl=https or None)
+        return await self._request(url, key, connection, request)
+
+    async def _request(self, url, key, connection, request):
+        reader, writer = connection
+        try:
+            writer.write(request)
+            await writer.drain()
+            version, status, reason, headers = await self._readHead(reader)
+            header = headers.get('Connection', '').lower()
+            keepAlive = (header != 'close' if version == 'HTTP/1.1'
+                         else header == 'keep-alive')
+            length = headers.get('Content-Length')
+            if status in (204, 304) or 100 <= status < 200:
+                body = b''
+            elif headers.get('Transfer-Encoding', '').lower() == 'chunked':
+                body = await self._readChunks(reader)
+            elif length is not None:
+                body = await reader.readexactly(int(length))
+            else:
+                # The body ends with the connection.
+                body = await reader.read()
+                keepAlive = False
+        except asyncio.IncompleteReadError as e:
+            writer.close()
+            raise http.client.IncompleteRead(e.partial, e.expected)
+        except BaseException:
+            writer.close()
+            raise
+        if keepAlive:
+            self._idle[key].append(connection)
+        else:
+            writer.close()
+        return FetchedPage(url, status, reason, headers, body)
+
+    async def _readHead(self, reader):
+        line = await reader.readline()
+        if not line:
+            raise http.client.RemoteDisconnected(
+                'Remote end closed connection without response')
+        version, _, rest = line.decode('latin-1').strip().partition(' ')
+        status, _, reason = rest.partition(' ')
+        if not version.startswith('HTTP/') or not status.isdigit():
+            raise http.client.BadStatusLine(line)
+        lines = []
+        while line not in (b'\r\n', b'\n', b''):
+            line = await reader.readline()
+            lines.append(line)
+        headers = http.client.parse_headers(io.BytesIO(b''.join(lines)))
+        return version, int(status), reason, headers
+
+    async def _readChunks(self, reader):
+        chunks = []
+        while True:
+            line = await reader.readline()
+            size = int(line.split(b';', 1)[0], 16)
+            if not size:
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        # Skip the trailer.
+        while line not in (b'\r\n', b'\n', b''):
+            line = await reader.readline()
+        return b''.join(chunks)
 
 
 class StaticAPIDocGenerator:
@@ -223,21 +1211,28 @@ class StaticAPIDocGenerator:
     htmlErrors = 0
     otherErrors = 0
     visited = ()
+    reused = 0
+    removed = 0
 
     _old_ignore_modules = None
     _old_import_unknown_modules = None
 
+    #: Set in the child processes started by a ``--workers`` run; those
+    #: retrieve links handed to them by the parent generator.
+    _inWorker = False
+
     def __init__(self, options):
         self.options = options
-        self.linkQueue = []
+        self.linkQueue = self._createFrontier()
 
-        if self.options.ret_kind == 'webserver':  # pragma: no cover
+        if self.options.ret_kind == 'webserver':
             self.browser = OnlineBrowser
             self.base_url = self.options.url
             if self.base_url[-1] != '/':
                 self.base_url += '/'
         else:
-            self.browser = PublisherBrowser
+            self.browser = (DirectBrowser if self.options.direct
+                            else PublisherBrowser)
             self.base_url = 'http://localhost/'
 
             # the.package[:the_file.zcml]
@@ -247,35 +1242,109 @@ class StaticAPIDocGenerator:
                 if len(target) == 2 and target[1]:
                     self.browser.zcml_file = target[1]
 
-        for url in self.options.additional_urls + [self.options.startpage]:
+        # The start page comes first, then the additional URLs in
+        # reverse order, then the packages of --only.
+        self.startURL = Link(self.options.startpage,
+                             self.base_url).absoluteURL
+        for url in ([self.options.startpage]
+                    + self.options.additional_urls[::-1]
+                    + ['/++apidoc++/Code/%s/index.html'
+                       % package.replace('.', '/')
+                       for package in self.options.only]):
             link = Link(url, self.base_url)
-            self.linkQueue.append(link)
+            self.linkQueue.add(link)
 
         self.rootDir = self.options.target_dir
+        # Where the output goes: the directory, or the archive.
+        extension = WRITERS[self.options.output_format][1]
+        self.outputPath = self.rootDir
+        if not self.outputPath.endswith(extension):
+            self.outputPath = self.rootDir.rstrip(os.sep) + extension
         self.maxWidth = getMaxWidth() - 13
         self.needNewLine = False
 
-    def __enter__(self):
-        if not os.path.exists(self.rootDir):
-            os.makedirs(self.rootDir)
+        # Bookkeeping for --incremental: the pages recorded by the previous
+        # run, those of them we may reuse without retrieving them again, and
+        # the pages of this run.
+        self._previousPages = {}
+        self._reusablePages = {}
+        self._pages = {}
+        self._configFiles = set()
+        self._statCache = {}
+        self._sourcesCurrent = None
+        # The statistics of the retrieved pages for --report.
+        self.stats = {}
+        # The names of the resources stored by --hash-assets.
+        self._assets = {}
+
+    def _createFrontier(self):
+        return LinkFrontier(
+            indexPagesFirst if self.options.index_pages_first else None)
+
+    def _isParallel(self):
+        return self.options.workers > 1 and not self._inWorker
+
+    def _isAsync(self):
+        # Worker processes retrieve one page at a time with a browser.
+        return (self.options.ret_kind == 'webserver'
+                and self.options.workers <= 1)
 
-        self.browser = self.browser.begin()
-        self.browser.setUserAndPassword(self.options.username,
-                                        self.options.password)
-
-        self.browser.setDebugMode(self.options.debug)
+    def __enter__(self):
+        if self.options.output_format == 'dir':
+            os.makedirs(self.rootDir, exist_ok=True)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(self.outputPath)),
+                        exist_ok=True)
 
-        self._old_ignore_modules = classregistry.IGNORE_MODULES
-        classregistry.IGNORE_MODULES = set(self.options.ignore_modules)
+        if self._inWorker and self.options.output_format != 'dir':
+            # Only the main process writes into the archive.
+            self.writer = PageCollector()
+        else:
+            writer = WRITERS[self.options.output_format][0]
+            self.writer = WriteBehind(writer(self.outputPath))
+
+        if self._isAsync():
+            self.browser = AsyncFetcher(self.options.concurrency,
+                                        self.options.rate)
+            self.browser.setUserAndPassword(self.options.username,
+                                            self.options.password)
+            self.browser.setDebugMode(self.options.debug)
+        elif not self._isParallel():
+            # In parallel mode, every worker process begins its own browser.
+            self.browser = self.browser.begin()
+            self.browser.setUserAndPassword(self.options.username,
+                                            self.options.password)
+
+            self.browser.setDebugMode(self.options.debug)
+            if self.options.incremental:
+                self._configFiles.update(self._getConfigFiles())
+
+        if self.options.incremental and not self._inWorker:
+            manifest = Manifest.load(self._manifestPath())
+            if manifest is not None:
+                self._previousPages = manifest.pages
+                if manifest.isCurrent(self._getSettings()):
+                    self._reusablePages = manifest.pages
+
+        self._old_ignore_modules = classregistry.setIgnoreModules(
+            self.options.ignore_modules)
 
         self._old_import_unknown_modules = (
             classregistry.__import_unknown_modules__)
         if self.options.import_unknown_modules:
             classregistry.__import_unknown_modules__ = True
 
-    def __exit__(self, *args):
-        self.browser.end()
-        classregistry.IGNORE_MODULES = self._old_ignore_modules
+    def __exit__(self, exc_type, exc_value, traceback):
+        complete = exc_type is None and not self.linkQueue
+        self.writer.close(complete)
+        if (not complete and self.options.output_format != 'dir'
+                and not self._inWorker):
+            self.sendMessage('Unfinished export left in %s.tmp'
+                             % self.outputPath)
+        # The AsyncFetcher is closed in its event loop, by _retrieveAsync().
+        if not self._isAsync() and not self._isParallel():
+            self.browser.end()
+        classregistry.setIgnoreModules(self._old_ignore_modules)
         classregistry.__import_unknown_modules__ = (
             self._old_import_unknown_modules)
 
@@ -287,39 +1356,505 @@ class StaticAPIDocGenerator:
             end_time = t0 + self.options.max_runtime
 
         self.visited = set()
+        if self.options.resume:
+            self._loadCheckpoint()
+        if self.options.sitemap:
+            self._addSitemap()
+        self._nextCheckpoint = t0 + self.options.checkpoint_interval
 
         # Turn off deprecation warnings
         warnings.filterwarnings("ignore", category=DeprecationWarning)
 
         # Work through all links until there are no more to work on.
         self.sendMessage('Starting retrieval.')
-        while self.linkQueue:
-            link = self.linkQueue.pop()
-            # Sometimes things are placed many times into the queue, for
-            # example if the same link appears twice in a page. In those cases,
-            # we can check at this point whether the URL has been already
-            # handled.
-            if link.absoluteURL not in self.visited:
-                self.showProgress(link)
-                self.processLink(link)
-            if end_time and time.time() >= end_time:
-                break
+        inflight = []
+        try:
+            if self._isParallel():
+                self._retrieveInParallel(end_time)
+            elif self._isAsync():
+                asyncio.run(self._retrieveAsync(end_time))
+            else:
+                while self.linkQueue:
+                    link = self.linkQueue.pop()
+                    # The frontier queues every URL only once, but a resumed
+                    # checkpoint may still hold a link we already handled.
+                    if link.absoluteURL not in self.visited:
+                        self.showProgress(link)
+                        inflight = [link]
+                        if not self._reusePage(link):
+                            self.processLink(link)
+                        inflight = []
+                    if end_time and time.time() >= end_time:
+                        break
+                    self._checkpointIfDue()
+        finally:
+            # Keep whatever is left, including the link we were interrupted
+            # in, for a later --resume.
+            self._saveCheckpoint(inflight)
+            if self.options.incremental:
+                self._saveManifest(complete=not self.linkQueue)
 
         t1 = time.time()
 
         self.sendMessage("Run time: %.3f sec" % (t1 - t0))
         self.sendMessage("Links: %i" % self.counter)
+        if self.options.incremental:
+            self.sendMessage("Reused pages: %i" % self.reused)
+            self.sendMessage("Removed pages: %i" % self.removed)
         if self.linkQueue:
             self.sendMessage("Unprocessed links: %d" % len(self.linkQueue))
         self.sendMessage("Link Retrieval Errors: %i" % self.linkErrors)
         self.sendMessage("HTML ParsingErrors: %i" % self.htmlErrors)
+        if self.options.report:
+            self._saveReport()
+
+    def _addSitemap(self):
+        """Queue the pages listed by the documentation modules."""
+        from zope.app.apidoc.sitemap import iterPages
+
+        if self._isParallel():
+            # We have not brought up Zope 3 ourselves.
+            layer, old_appsetup_context = _beginLayer(
+                self.browser.target_package, self.browser.zcml_file)
+        try:
+            root = urlparse.urljoin(self.base_url, '++apidoc++/')
+            for path in iterPages():
+                link = Link(root + path, self.base_url)
+                if self._isInScope(link):
+                    self.linkQueue.add(link)
+        finally:
+            if self._isParallel():
+                _endLayer(layer, old_appsetup_context)
+        self.sendMessage('Sitemap: %i links to retrieve.'
+                         % len(self.linkQueue))
+
+    def _retrieveInParallel(self, end_time):
+        """Hand out the links to a pool of worker processes.
+
+        This process keeps the only link queue and the only visited set;
+        the workers retrieve and write the pages and report the links they
+        found back to us. Every worker has its own queue of tasks, so that
+        we know which links are lost if it dies.
+        """
+        context = multiprocessing.get_context()
+        results = context.Queue()
+        workers = []
+        for _ in range(self.options.workers):
+            tasks = context.Queue()
+            worker = context.Process(
+                target=_serveWorker,
+                args=(type(self), self.options, tasks, results))
+            worker.daemon = True
+            worker.start()
+            workers.append((worker, tasks))
+
+        # Keep a few links in flight per worker, so that no worker waits on
+        # us while we are processing the results of another one. *pending*
+        # maps the URLs to the links and the index of their worker.
+        pending = {}
+        load = [0] * len(workers)
+        try:
+            while self.linkQueue or pending:
+                while self.linkQueue and min(load) < 2:
+                    link = self.linkQueue.pop()
+                    if link.absoluteURL in self.visited:
+                        continue
+                    self.showProgress(link)
+                    if self._reusePage(link):
+                        continue
+                    self.visited.add(link.absoluteURL)
+                    index = load.index(min(load))
+                    load[index] += 1
+                    pending[link.absoluteURL] = (link, index)
+                    workers[index][1].put(link)
+                if not pending:
+                    break
+                self._receiveResult(results, workers, pending, load)
+                if end_time and time.time() >= end_time:
+                    break
+                self._checkpointIfDue(
+                    [link for link, _ in pending.values()])
+        finally:
+            for worker, tasks in workers:
+                tasks.put(None)
+            try:
+                # The workers finish the links they already have; collect
+                # their results, otherwise they cannot exit.
+                while pending:
+                    self._receiveResult(results, workers, pending, load)
+            finally:
+                for worker, _ in workers:
+                    worker.join()
+
+    async def _retrieveAsync(self, end_time):
+        """Retrieve the pages with the `AsyncFetcher`.
+
+        Up to ``--concurrency`` pages are retrieved at the same time; the
+        pages are processed here, in the event loop, as they arrive.
+        """
+        pending = {}
+        try:
+            while self.linkQueue or pending:
+                while (self.linkQueue
+                       and len(pending) < self.browser.concurrency):
+                    link = self.linkQueue.pop()
+                    if link.absoluteURL in self.visited:
+                        continue
+                    self.showProgress(link)
+                    if self._reusePage(link):
+                        continue
+                    self.visited.add(link.absoluteURL)
+                    fetch = asyncio.ensure_future(
+                        self.browser.fetch(link.absoluteURL))
+                    pending[fetch] = link
+                if not pending:
+                    break
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for fetch in done:
+                    await self._processFetched(pending.pop(fetch), fetch)
+                if end_time and time.time() >= end_time:
+                    break
+                self._checkpointIfDue(pending.values())
+        finally:
+            # Finish the pages already requested.
+            if pending:
+                await asyncio.wait(pending)
+            for fetch, link in pending.items():
+                await self._processFetched(link, fetch)
+            await self.browser.close()
+
+    async def _processFetched(self, link, fetch):
+        try:
+            page = fetch.result()
+        except urllib2.HTTPError as e:
+            # Too many redirects; there is no page to write.
+            self._reportLinkError(link, '%s (%i): %s' % (
+                e.msg, e.code, link.absoluteURL))
+            return
+        except (http.client.HTTPException, OSError, ValueError, LookupError):
+            # Like a failing connection, a body that cannot be decoded by
+            # its (unknown) charset is a bad link.
+            self._reportLinkError(link, 'Bad URL: ' + link.absoluteURL)
+            return
+        if page.status >= 400:
+            self._reportLinkError(link, '%s (%i): %s' % (
+                page.reason, page.status, link.absoluteURL))
+        if self.options.hash_assets and page.isHtml:
+            await self._fetchAssets(link, page)
+        self._handleOneResponse(link, page, page.elapsed)
+
+    async def _fetchAssets(self, link, page):
+        """Store the resources of *page* that get content-hashed names.
+
+        The links of a page are rewritten without waiting for anything, so
+        in the event loop its assets are retrieved before, all at once.
+        """
+        baseUrl = getBaseURL(page.contents, page.url)
+        urls = set()
+        for _start, _end, value in findLinkAttributes(page.contents):
+            asset = Link(urlparse.urljoin(baseUrl, value), self.base_url,
+                         link.absoluteURL)
+            if (asset.absoluteURL not in self._assets
+                    and isHashedAsset(asset.absoluteURL)
+                    and asset.isLocalURL() and asset.isApidocLink()):
+                urls.add(asset.absoluteURL)
+        urls = sorted(urls)
+        fetches = [self.browser.fetch(url) for url in urls]
+        results = await asyncio.gather(*fetches, return_exceptions=True)
+        for url, page in zip(urls, results):
+            if isinstance(page, BaseException) or page.status >= 400:
+                self._addAsset(url, None)
+            else:
+                self._addAsset(url, page.contents)
+
+    def _receiveResult(self, results, workers, pending, load):
+        """Wait for the result of a worker and take it over.
+
+        If a worker died, the links it was retrieving are queued again, so
+        that a checkpoint keeps them, and `RuntimeError` is raised.
+        """
+        lost = None
+        while True:
+            try:
+                result = results.get(timeout=1)
+                break
+            except queue.Empty:
+                dead = {index for index, (worker, _) in enumerate(workers)
+                        if not worker.is_alive()}
+                if lost is not None:
+                    # No result of the dead worker was on its way either.
+                    for url in lost:
+                        link, _ = pending.pop(url)
+                        self.visited.discard(url)
+                        self.linkQueue.requeue(link)
+                    raise RuntimeError(
+                        'A static-apidoc worker died while retrieving: '
+                        + ', '.join(sorted(lost)))
+                lost = [url for url, (_, index) in pending.items()
+                        if index in dead] or None
+
+        _, index = pending.pop(result['url'])
+        load[index] -= 1
+        self.linkErrors += result['linkErrors']
+        self.htmlErrors += result['htmlErrors']
+        self.otherErrors += result['otherErrors']
+        self._pages.update(result['pages'])
+        self.stats.update(result['stats'])
+        self._configFiles.update(result['configFiles'])
+        for name, data in result['files']:
+            self.writer.write(name, data)
+        # The worker queued the links in the order the serial retrieval
+        # would have; keep that order, so that the output does not differ.
+        for link in result['links']:
+            self.linkQueue.add(link)
+
+    def _serve(self, tasks, results):
+        """Retrieve the links from *tasks* until we receive `None`."""
+        self.visited = set()
+        with self:
+            for link in iter(tasks.get, None):
+                self.linkQueue = self._createFrontier()
+                self.linkErrors = self.htmlErrors = self.otherErrors = 0
+                self._pages = {}
+                self.stats = {}
+                self.processLink(link)
+                results.put({
+                    'url': link.absoluteURL,
+                    'links': list(self.linkQueue),
+                    'linkErrors': self.linkErrors,
+                    'htmlErrors': self.htmlErrors,
+                    'otherErrors': self.otherErrors,
+                    'pages': self._pages,
+                    'stats': self.stats,
+                    # Only the first result needs to carry these.
+                    'configFiles': self._configFiles,
+                    'files': (self.writer.take()
+                              if isinstance(self.writer, PageCollector)
+                              else []),
+                })
+                self._configFiles = set()
+
+    def _checkpointPath(self):
+        return os.path.join(self.rootDir, CHECKPOINT_NAME)
+
+    def _checkpointIfDue(self, inflight=()):
+        if time.time() >= self._nextCheckpoint:
+            self._saveCheckpoint(inflight)
+            self._nextCheckpoint = (
+                time.time() + self.options.checkpoint_interval)
+
+    def _saveCheckpoint(self, inflight=()):
+        """Save the state of the retrieval, or remove it once we are done.
+
+        The *inflight* links have been taken from the queue, but we do not
+        know their pages yet; we retrieve them first when resuming.
+        """
+        if self.options.output_format != 'dir':
+            # Archives cannot be continued.
+            return
+        path = self._checkpointPath()
+        inflight = list(inflight)
+        if not self.linkQueue and not inflight:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+
+        inflight_urls = {link.absoluteURL for link in inflight}
+        state = {
+            'settings': self._getSettings(),
+            'queue': [[link.absoluteURL, link.referenceURL]
+                      for link in inflight + list(self.linkQueue)],
+            'visited': sorted(self.visited - inflight_urls),
+            'counters': {name: getattr(self, name)
+                         for name in ('counter', 'linkErrors', 'htmlErrors',
+                                      'otherErrors', 'reused')},
+            'pages': self._pages,
+            'configFiles': sorted(self._configFiles),
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def _loadCheckpoint(self):
+        try:
+            with open(self._checkpointPath()) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            self.sendMessage('No checkpoint found; starting from scratch.', 2)
+            return
+        if state.get('settings') != self._getSettings():
+            self.sendMessage(
+                'The checkpoint was made with different settings;'
+                ' starting from scratch.', 2)
+            return
+
+        self.linkQueue = self._createFrontier()
+        for url, referenceURL in state['queue']:
+            self.linkQueue.add(Link(url, self.base_url, referenceURL))
+        self.visited = set(state['visited'])
+        self.linkQueue.markSeen(self.visited)
+        for name, value in state['counters'].items():
+            setattr(self, name, value)
+        self._pages = state['pages']
+        self._configFiles = set(state['configFiles'])
+        self.sendMessage('Resuming with %i links to retrieve.'
+                         % len(self.linkQueue))
+
+    def _manifestPath(self):
+        return os.path.join(self.rootDir, MANIFEST_NAME)
+
+    def _getSettings(self):
+        """The settings that all pages of an export depend on."""
+        return repr((self.base_url, self.options.ret_kind,
+                     self.options.username,
+                     self.options.ignore_modules,
+                     self.options.import_unknown_modules,
+                     self.options.hash_assets, self.options.gzip,
+                     self.options.only, self.options.external_url))
+
+    def _getConfigFiles(self):
+        """The files that all pages of an export are built from.
+
+        These are our own modules and templates and the ZCML files loaded
+        by the publisher.
+        """
+        from zope.app.appsetup import appsetup
+
+        files = set()
+        for dirpath, _dirnames, filenames in os.walk(os.path.dirname(
+                os.path.abspath(__file__))):
+            files.update(os.path.join(dirpath, filename)
+                         for filename in filenames
+                         if not filename.endswith(('.pyc', '.pyo')))
+        context = appsetup.getConfigContext()
+        files.update(getattr(context, '_seen_files', ()))
+        return files
+
+    def _reusePage(self, link):
+        """Reuse the page written by the previous run if it is current."""
+        url = link.absoluteURL
+        entry = self._reusablePages.get(url)
+        if not entry or not entry['sources']:
+            return False
+        if _statFiles(entry['sources'], self._statCache) != entry['sources']:
+            return False
+        if entry['registry'] and not self._areSourcesCurrent():
+            return False
+        if not os.path.isfile(os.path.join(self.rootDir, entry['file'])):
+            return False
+
+        self.visited.add(url)
+        self._pages[url] = entry
+        self.reused += 1
+        for page_url in entry['links']:
+            self.linkQueue.add(Link(page_url, self.base_url, url))
+        return True
+
+    def _areSourcesCurrent(self):
+        """Whether none of the sources of the previous run changed.
+
+        The pages showing what the class registry knows can only be reused
+        then, since the registry is made from all modules.
+        """
+        if self._sourcesCurrent is None:
+            sources = {}
+            current = True
+            for entry in self._reusablePages.values():
+                for path, stat in entry['sources'].items():
+                    current = current and sources.setdefault(
+                        path, stat) == stat
+            self._sourcesCurrent = current and (
+                _statFiles(sources, self._statCache) == sources)
+        return self._sourcesCurrent
+
+    def _recordPage(self, link, filepath, digest, links):
+        url = link.absoluteURL
+        self._pages[url] = {
+            'file': os.path.relpath(filepath, self.rootDir),
+            'hash': digest,
+            'links': links,
+            'sources': _statFiles(_sourcesForURL(url), self._statCache),
+            'registry': _dependsOnRegistry(url),
+        }
+
+    def _saveManifest(self, complete):
+        pages = self._pages
+        if complete:
+            # Whatever the previous run wrote that we did not find this time
+            # is an orphan.
+            current_files = {entry['file'] for entry in pages.values()}
+            for url, entry in self._previousPages.items():
+                if url in pages or entry['file'] in current_files:
+                    continue
+                path = os.path.join(self.rootDir, entry['file'])
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                else:
+                    self.removed += 1
+                if os.path.exists(path + '.gz'):
+                    os.remove(path + '.gz')
+        else:
+            # Keep what we know about the pages we did not get to.
+            pages = dict(self._previousPages)
+            pages.update(self._pages)
+
+        manifest = Manifest(self._getSettings(),
+                            _statFiles(self._configFiles), pages)
+        manifest.save(self._manifestPath())
+
+    def _saveReport(self):
+        report = makeReport(self.stats, self.options.report_top)
+        tmp_path = self.options.report + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.options.report)
+        self.sendMessage("Report: %s" % self.options.report)
+
+    def _isInCodeScope(self, url):
+        path = _codePathForURL(url)
+        return path is not None and any(
+            path == package or path.startswith(package + '.')
+            for package in self.options.only)
+
+    def _isInScope(self, link, referrer=None):
+        """Whether --only lets us retrieve *link*, found on *referrer*.
+
+        The Code browser pages of the packages are in scope, as are all
+        resources. The other pages, like those of interfaces and utilities,
+        are in scope when the start page or a Code browser page in scope
+        refers to them. The navigation pages, like the module menus, are in
+        scope when another navigation page refers to them, since the frames
+        of ``static.html`` only reach them that way.
+        """
+        if not self.options.only:
+            return True
+        url = link.absoluteURL
+        if _codePathForURL(url) is not None:
+            return self._isInCodeScope(url)
+        if isResourceURL(url):
+            return True
+        if referrer is None:
+            return False
+        return (referrer == self.startURL
+                or self._isInCodeScope(referrer)
+                or (_isNavigationURL(referrer) and _isNavigationURL(url)))
 
     def showProgress(self, link):
         self.counter += 1
         if self.options.progress:
-            url = link.absoluteURL[-(self.maxWidth):]
+            prefix = 'Link %5d' % self.counter
+            if self.options.sitemap:
+                # We know the pages up front, so we can tell how many are
+                # left.
+                prefix += '/%d' % (self.counter + len(self.linkQueue))
+            prefix += ': '
+            url = link.absoluteURL[-(self.maxWidth + 12 - len(prefix)):]
             sys.stdout.write('\r' + ' ' * (self.maxWidth + 13))
-            sys.stdout.write('\rLink %5d: %s' % (self.counter, url))
+            sys.stdout.write('\r' + prefix + url)
             sys.stdout.flush()
             self.needNewLine = True
 
@@ -342,19 +1877,16 @@ class StaticAPIDocGenerator:
         self.visited.add(url)
 
         # Retrieve the content
+        start = time.perf_counter()
         try:
             self.browser.open(link.absoluteURL)
         except urllib2.HTTPError as error:
             # Something went wrong with retrieving the page.
-            self.linkErrors += 1
-            self.sendMessage(
-                '%s (%i): %s' % (error.msg, error.code, link.absoluteURL), 2)
-            self.sendMessage('+-> Reference: ' + link.referenceURL, 2)
+            self._reportLinkError(link, '%s (%i): %s' % (
+                error.msg, error.code, link.absoluteURL))
         except (urllib2.URLError, ValueError):
             # We had a bad URL running the publisher browser
-            self.linkErrors += 1
-            self.sendMessage('Bad URL: ' + link.absoluteURL, 2)
-            self.sendMessage('+-> Reference: ' + link.referenceURL, 2)
+            self._reportLinkError(link, 'Bad URL: ' + link.absoluteURL)
         except BaseException:
             # This should never happen outside the debug mode. We really want
             # to catch all exceptions, so that we can investigate them.
@@ -367,100 +1899,164 @@ class StaticAPIDocGenerator:
                 pdb.set_trace()
             return
 
-        self._handleOneResponse(link)
+        self._handleOneResponse(link, elapsed=time.perf_counter() - start)
 
-    def _handleDirForResponse(self, link):
-        url = link.absoluteURL
+    def _reportLinkError(self, link, msg):
+        self.linkErrors += 1
+        self.sendMessage(msg, 2)
+        self.sendMessage('+-> Reference: ' + link.referenceURL, 2)
 
-        # Make sure the directory exists and get a file path.
-        relativeURL = url.replace(self.base_url, '')
+    def _getFilePath(self, link):
+        # Get the file path of the page; the writer makes sure that its
+        # directory exists.
+        relativeURL = link.absoluteURL.replace(self.base_url, '')
         segments = relativeURL.split('/')
         filename = segments.pop()
+        dir_part = os.path.normpath(os.path.join(self.rootDir, *segments))
+        return os.path.join(dir_part, filename)
 
-        dir_part = self.rootDir
-        for segment in segments:
-            dir_part = os.path.join(dir_part, segment)
-            dir_part = os.path.normpath(dir_part)
-            if not os.path.exists(dir_part):
-                os.makedirs(dir_part)
-
-        filepath = os.path.join(dir_part, filename)
-        return filepath
+    def _handleFindLinksForResponse(self, link, found=None, page=None):
+        # Now retrieve all links and rewrite the html.
+        # The absolute URLs of the links are appended to *found*.
+        # *page* is the retrieved page, by default our browser.
+        page = self.browser if page is None else page
+        contents = page.contents
 
-    def _handleFindLinksForResponse(self, link):
-        # Now retrieve all links and rewrite the html
-        contents = self.browser.contents
-
-        if not self.browser.isHtml:
+        if not page.isHtml:
             return contents
 
         url = link.absoluteURL
-        html = self.browser._response.html  # pylint:disable=protected-access
-        baseUrl = self.browser._getBaseUrl()  # pylint:disable=protected-access
-
-        links = html.find_all('a')
-        links = [zope.testbrowser.browser.Link(a, self.browser, baseUrl)
-                 for a in links]
-
-        for tagname, attrname in urltags.items():
-            tags = html.find_all(tagname)
-            tag_links = [ArbitraryLink(a, self.browser, baseUrl, attrname)
-                         for a in tags]
-            links.extend(tag_links)
-
-        mylinks = []
-        for link in links:
-            try:
-                mylinks.append(Link(link.url, self.base_url, url))
-            except KeyError:
-                # Very occasionally we get a tag that doesn't have the expected
-                # attribute.
-                pass
-        links = mylinks
+        baseUrl = getBaseURL(contents, page.url)
 
         relativeURL = url.replace(self.base_url, '')
-        segments = relativeURL.split('/')
-        segments.pop()  # filename
-
-        for page_link in links:
+        up = '../' * relativeURL.count('/')
+
+        def rewrite(value):
+            if value.startswith('#'):
+                # Within the page.
+                return None
+            page_link = Link(urlparse.urljoin(baseUrl, value),
+                             self.base_url, url)
             # Make sure we do not handle unwanted links.
             if (not page_link.isLocalURL()
                     or not page_link.isApidocLink()):  # pragma: no cover
-                continue
-
-            # Add link to the queue
-            if page_link.absoluteURL not in self.visited:
-                self.linkQueue.insert(0, page_link)
-
-            # Rewrite URLs
-            parts = ['..'] * len(segments)
-            parts.append(page_link.absoluteURL.replace(self.base_url, ''))
-            contents = contents.replace(page_link.originalURL, '/'.join(parts))
-
-        return contents
-
-    def _handleOneResponse(self, link):
-        # Get the response content
-
-        filepath = self._handleDirForResponse(link)
+                return None
+
+            if (self.options.hash_assets
+                    and isHashedAsset(page_link.absoluteURL)):
+                name = self._storeAsset(page_link)
+                if name is not None:
+                    return up + name
+
+            relative = page_link.absoluteURL.replace(self.base_url, '')
+            if self._isInScope(page_link, url):
+                # Add link to the queue
+                self.linkQueue.add(page_link)
+                if found is not None:
+                    found.append(page_link.absoluteURL)
+                # Rewrite the URL relative to this page.
+                new_value = up + relative
+            elif self.options.external_url:
+                # Outside of --only; refer to the complete documentation.
+                new_value = self.options.external_url + relative
+            else:
+                new_value = up + relative
+
+            # Keep the fragment.
+            fragment = urlparse.urldefrag(value)[1]
+            if fragment:
+                new_value += '#' + fragment
+            return new_value
+
+        return rewriteLinks(contents, rewrite)
+
+    def _storeAsset(self, link):
+        """Store the resource of *link* under its content-hashed name.
+
+        The resource is retrieved right away, the first time a page refers
+        to it. `None` is returned if it cannot be retrieved.
+        """
+        url = link.absoluteURL
+        if url not in self._assets:
+            self._addAsset(url, self._retrieveAsset(url))
+        return self._assets[url]
+
+    def _addAsset(self, url, contents):
+        # Store the retrieved *contents* of the resource at *url*, if any.
+        if contents is None:
+            self._assets[url] = None
+            return
+        if not isinstance(contents, bytes):
+            contents = contents.encode('utf-8')
+        name = self._assets[url] = getAssetName(url, contents)
+        self._write(name, contents, compress=True)
 
-        contents = self._handleFindLinksForResponse(link)
+    def _retrieveAsset(self, url):
+        # The AsyncFetcher retrieved the assets of the page already, see
+        # _fetchAssets().
+        try:
+            self.browser.open(url)
+        except Exception:
+            return None
+        return self.browser.contents
+
+    def _write(self, name, data, compress=False):
+        self.writer.write(name, data)
+        if compress and self.options.gzip:
+            self.writer.write(name + '.gz', gzipData(data))
+
+    def _handleOneResponse(self, link, page=None, elapsed=0.0):
+        # Get the response content; *elapsed* is the time it took to
+        # retrieve it.
+
+        filepath = self._getFilePath(link)
+        # The browser may retrieve resources while we rewrite the links.
+        page = self.browser if page is None else page
+        isHtml = page.isHtml
+
+        found = []
+        start = time.perf_counter()
+        contents = self._handleFindLinksForResponse(link, found, page)
+        parsed = time.perf_counter() - start
 
         # Write the data into the file
         if not isinstance(contents, bytes):
             contents = contents.encode('utf-8')
-        try:
-            with open(filepath, 'wb') as f:
-                f.write(contents)
-        except OSError:  # pragma: no cover
-            # The file already exists, so it is a duplicate and a bad one,
-            # since the URL misses `index.hml`. ReST can produce strange URLs
-            # that produce this problem, and we have little control over it.
 
-            # In other words, since we don't specify to open the file
-            # in exclusive creation, perhaps it refers to a
-            # directory? Or the disk is getting full?
-            pass
+        if self.options.report:
+            self.stats[link.absoluteURL] = {
+                'render': elapsed,
+                'parse': parsed,
+                'bytes': len(contents),
+                'links': len(found),
+                'package': _packageForURL(link.absoluteURL),
+            }
+
+        if self.options.incremental:
+            digest = hashlib.sha1(contents).hexdigest()
+            self._recordPage(link, filepath, digest, found)
+            previous = self._previousPages.get(link.absoluteURL)
+            if (previous is not None and previous['hash'] == digest
+                    and previous['file'] == self._pages[
+                        link.absoluteURL]['file']
+                    and os.path.isfile(filepath)):
+                # Nothing changed; leave the file alone.
+                return
+
+        name = os.path.relpath(filepath, self.rootDir)
+        self._write(name.replace(os.sep, '/'), contents, compress=isHtml)
+
+
+def _serveWorker(generator_class, options, tasks, results):
+    """Run a worker process of a ``--workers`` retrieval.
+
+    The worker makes its own generator from the *options*, so that only
+    these and the queues need to be sent to it, whichever way
+    :mod:`multiprocessing` starts it.
+    """
+    generator = generator_class(options)
+    generator._inWorker = True
+    generator._serve(tasks, results)
 
 
 ###############################################################################
@@ -471,7 +2067,29 @@ def _create_arg_parser():
     parser = argparse.ArgumentParser()
 
     parser.add_argument("target_dir",
-                        help="The directory to contain the output files")
+                        help="""The directory to contain the output files,
+                        or the archive for --output-format zip and tar.gz""")
+
+    parser.add_argument(
+        '--output-format', choices=sorted(WRITERS), default='dir',
+        help="""Write the pages as files into the target directory (dir,
+        the default), or stream them into a single archive (zip or tar.gz).
+        The extension of the archive is added to the target if it is
+        missing.""")
+
+    parser.add_argument(
+        '--hash-assets', action='store_true', default=False,
+        help="""Store the style sheets and scripts once, under names that
+        contain the hash of their contents (in the _static directory), and
+        refer to them by these names. They can then be cached forever."""
+    )
+
+    parser.add_argument(
+        '--gzip', action='store_true', default=False,
+        help="""Also write a gzipped copy (with the extension .gz) of every
+        HTML page, and of the style sheets and scripts stored by
+        --hash-assets, so that they can be served compressed."""
+    )
 
     ######################################################################
     # Retrieval
@@ -515,8 +2133,16 @@ def _create_arg_parser():
         action="store_const",
         dest='ret_kind',
         const="webserver",
-        help="Use an external Web server that is connected to Zope 3."
-             " This is not tested.")
+        help="""Use an external Web server that is connected to Zope 3.
+        Several pages are retrieved at the same time over persistent
+        connections; see --concurrency and --rate.""")
+
+    retrieval.add_argument(
+        '--direct', action='store_true', default=False,
+        help="""Render the pages in this process, without going through
+        WSGI and zope.testbrowser. Works with both --publisher and
+        --custom-publisher."""
+    )
 
     retrieval.add_argument(
         '--url', '-u', action="store", dest='url',
@@ -574,6 +2200,23 @@ def _create_arg_parser():
         allows you to limit the scope of the generated API documentation."""
     )
 
+    retrieval.add_argument(
+        '--only', action='append', dest='only', metavar='PACKAGE',
+        default=[],
+        help="""Only retrieve the Code browser pages of this package and
+        its subpackages, plus the other pages, like those of interfaces and
+        utilities, that these pages refer to. This option can be given more
+        than once. Links to pages outside of the scope are not followed;
+        see --external-url."""
+    )
+
+    retrieval.add_argument(
+        '--external-url', action='store', metavar='URL',
+        help="""With --only, let the links to pages outside of the scope
+        refer to the complete documentation at this URL (the directory that
+        contains ++apidoc++). By default they stay relative and dangle."""
+    )
+
     # XXX: How can this actually be turned off or disallowed?
     retrieval.add_argument(
         '--load-all',
@@ -591,6 +2234,81 @@ def _create_arg_parser():
         output unfinished. This is most helpful for tests."""
     )
 
+    retrieval.add_argument(
+        '--workers', '-j', action='store', type=int, default=1,
+        help="""Retrieve the pages using this many processes at the same
+        time. Each process brings up its own copy of Zope 3 (or its own
+        connection to the Web server); the processes share the queue of
+        links to retrieve and write into the same target directory."""
+    )
+
+    retrieval.add_argument(
+        '--concurrency', action='store', type=int, default=4,
+        help="""The number of pages to retrieve from the Web server at the
+        same time. This option is only used with --webserver."""
+    )
+
+    retrieval.add_argument(
+        '--rate', action='store', type=float, default=0,
+        help="""Start no more than this many requests per second to the Web
+        server. By default the rate is not limited. This option is only used
+        with --webserver."""
+    )
+
+    retrieval.add_argument(
+        '--sitemap', action='store_true', default=False,
+        help="""Queue all the pages of the documentation modules up front,
+        instead of only finding them by following the links of the pages
+        retrieved. This finds pages no page links to, and shows how many
+        pages are left in the progress output. It cannot be used with
+        --webserver."""
+    )
+
+    retrieval.add_argument(
+        '--report', action='store', metavar='FILE',
+        help="""Write a JSON report of the pages retrieved in this run to
+        FILE. It has the time it took to render and to parse every page,
+        the bytes written and the number of links, with their percentiles
+        and the slowest pages and packages."""
+    )
+
+    retrieval.add_argument(
+        '--report-top', action='store', type=int, default=20, metavar='N',
+        help="""The number of the slowest pages and packages to list in the
+        --report. The default is 20."""
+    )
+
+    retrieval.add_argument(
+        '--incremental', action='store_true', default=False,
+        help="""Keep a manifest of the export in the target directory and
+        use it to only retrieve and write the pages whose sources changed
+        since the last incremental export. Pages that are no longer found
+        are removed. Only the pages of the Code browser can be reused without
+        retrieving them again; the others are retrieved, but only written if
+        they changed. Any change to the loaded ZCML files causes a full
+        export. It cannot be used with --webserver."""
+    )
+
+    retrieval.add_argument(
+        '--index-pages-first', action='store_true', default=False,
+        help="""Retrieve the index pages before all other pages, so that an
+        export stopped early can at least be navigated."""
+    )
+
+    retrieval.add_argument(
+        '--resume', action='store_true', default=False,
+        help="""Continue the export where the last run into the same
+        target directory stopped, for example because of --max-runtime.
+        Unfinished runs always leave a checkpoint in the target directory;
+        it is removed once an export is complete."""
+    )
+
+    retrieval.add_argument(
+        '--checkpoint-interval', action='store', type=int, default=60,
+        help="""Save a checkpoint for --resume after this many seconds,
+        in case the program is killed."""
+    )
+
     ######################################################################
     # Reporting
 
@@ -627,7 +2345,25 @@ def _create_arg_parser():
 def get_options(args=None):
     # original_testrunner_args = args
 
-    options = _create_arg_parser().parse_args(args)
+    parser = _create_arg_parser()
+    options = parser.parse_args(args)
+    if options.ret_kind == 'webserver':
+        if options.sitemap:
+            parser.error('--sitemap cannot be used with --webserver')
+        if options.direct:
+            parser.error('--direct cannot be used with --webserver')
+        # The sources of the pages are only known for the code this
+        # process runs, not for the server's.
+        if options.incremental:
+            parser.error('--incremental cannot be used with --webserver')
+    if options.external_url and not options.external_url.endswith('/'):
+        options.external_url += '/'
+    if options.output_format != 'dir':
+        if options.incremental:
+            parser.error('--incremental can only be used with'
+                         ' --output-format dir')
+        if options.resume:
+            parser.error('--resume can only be used with --output-format dir')
 
     # options.original_testrunner_args = original_testrunner_args
 
@@ -15,9 +15,12 @@
 
 """
 import doctest
+import importlib
+import json
 import os
 import sys
 import unittest
+from urllib.error import HTTPError
 
 import zope.app.renderer
 import zope.component.testing
@@ -262,6 +265,13 @@ class TestUtilities(unittest.TestCase):
             utilities.safe_import = old_safe_import
 
 
+class _DyingGenerator(static.StaticAPIDocGenerator):
+    # Its workers die on the first link.
+
+    def processLink(self, link):
+        os._exit(1)
+
+
 class TestStatic(unittest.TestCase):
 
     def _tempdir(self):
@@ -278,6 +288,399 @@ class TestStatic(unittest.TestCase):
         self.assertIn('static.html',
                       os.listdir(os.path.join(tmpdir, 'dir', '++apidoc++')))
 
+    def _listFiles(self, root):
+        return sorted(os.path.relpath(os.path.join(dirpath, name), root)
+                      for dirpath, _, names in os.walk(root)
+                      for name in names)
+
+    def test_run_workers(self):
+        # The workers are started the way macOS and Windows do, which
+        # needs everything sent to them to be picklable.
+        import multiprocessing
+        tmpdir = self._tempdir()
+        args = ['--only', 'zope.app.apidoc.codemodule.browser',
+                '--startpage',
+                '/++apidoc++/Code/zope/app/apidoc/codemodule/browser/'
+                'index.html']
+        serial = static.main(args + [os.path.join(tmpdir, 'serial')])
+
+        old_get_context = multiprocessing.get_context
+        static.multiprocessing.get_context = (
+            lambda method=None: old_get_context('spawn'))
+        try:
+            maker = static.main(args + ['--workers', '2',
+                                        os.path.join(tmpdir, 'dir')])
+        finally:
+            static.multiprocessing.get_context = old_get_context
+
+        self.assertEqual(serial.visited, maker.visited)
+        self.assertEqual(maker.counter, len(maker.visited))
+        self.assertEqual(self._listFiles(os.path.join(tmpdir, 'serial')),
+                         self._listFiles(os.path.join(tmpdir, 'dir')))
+
+    def test_run_workers_dying(self):
+        tmpdir = self._tempdir()
+        page = '/++apidoc++/Code/zope/app/apidoc/apidoc/index.html'
+        with self.assertRaises(RuntimeError):
+            static.main(['--workers', '2', '--startpage', page, tmpdir],
+                        generator=_DyingGenerator)
+
+        # The page is kept for a later --resume.
+        with open(os.path.join(tmpdir, static.CHECKPOINT_NAME)) as f:
+            queued = [url for url, _ in json.load(f)['queue']]
+        self.assertIn('http://localhost' + page, queued)
+
+    def test_run_zip(self):
+        import zipfile
+        tmpdir = self._tempdir()
+        page = '/++apidoc++/Code/zope/app/apidoc/codemodule/browser/'
+        static.main(['--only', 'zope.app.apidoc.codemodule.browser',
+                     '--startpage', page + 'index.html', '--output-format',
+                     'zip', os.path.join(tmpdir, 'apidoc')])
+
+        self.assertEqual(['apidoc.zip'], os.listdir(tmpdir))
+        with zipfile.ZipFile(os.path.join(tmpdir, 'apidoc.zip')) as archive:
+            names = archive.namelist()
+            self.assertIn(page[1:] + 'index.html', names)
+            self.assertIn('<html', archive.read(
+                page[1:] + 'index.html').decode('utf-8'))
+        self.assertEqual(len(names), len(set(names)))
+
+    def test_run_zip_unfinished(self):
+        tmpdir = self._tempdir()
+        path = os.path.join(tmpdir, 'apidoc.zip')
+        with open(path, 'wb') as f:
+            f.write(b'previous')
+        maker = static.main(['--max-runtime', '1', '--output-format', 'zip',
+                             path])
+
+        # The archive of the previous run is kept.
+        self.assertTrue(maker.linkQueue)
+        self.assertEqual(['apidoc.zip', 'apidoc.zip.tmp'],
+                         sorted(os.listdir(tmpdir)))
+        with open(path, 'rb') as f:
+            self.assertEqual(b'previous', f.read())
+
+    def test_run_tar_workers(self):
+        import tarfile
+        tmpdir = self._tempdir()
+        path = os.path.join(tmpdir, 'apidoc.tar.gz')
+        page = '/++apidoc++/Code/zope/app/apidoc/codemodule/browser/'
+        maker = static.main(['--only', 'zope.app.apidoc.codemodule.browser',
+                             '--startpage', page + 'index.html',
+                             '--workers', '2', '--output-format', 'tar.gz',
+                             path])
+
+        self.assertEqual(['apidoc.tar.gz'], os.listdir(tmpdir))
+        with tarfile.open(path) as archive:
+            names = archive.getnames()
+        self.assertIn(page[1:] + 'index.html', names)
+        self.assertLessEqual(len(names), maker.counter)
+
+    def test_archive_options(self):
+        for option in ('--incremental', '--resume'):
+            with self.assertRaises(SystemExit):
+                static.get_options(['--output-format', 'zip', option,
+                                    'target'])
+
+    def test_archives_reproducible(self):
+        import struct
+        import tarfile
+        import zipfile
+        tmpdir = self._tempdir()
+        old = os.environ.pop('SOURCE_DATE_EPOCH', None)
+        if old is not None:
+            self.addCleanup(os.environ.__setitem__, 'SOURCE_DATE_EPOCH', old)
+        self.addCleanup(os.environ.pop, 'SOURCE_DATE_EPOCH', None)
+
+        def export(writer, path):
+            archive = writer(path)
+            archive.write('a.html', b'page')
+            archive.write('a.html', b'duplicate')
+            archive.close()
+            with open(path, 'rb') as f:
+                return f.read()
+
+        for writer, extension in ((static.ZipWriter, '.zip'),
+                                  (static.TarWriter, '.tar.gz')):
+            self.assertEqual(
+                export(writer, os.path.join(tmpdir, 'a' + extension)),
+                export(writer, os.path.join(tmpdir, 'b' + extension)))
+        with zipfile.ZipFile(os.path.join(tmpdir, 'a.zip')) as zip:
+            self.assertEqual((1980, 1, 1, 0, 0, 0),
+                             zip.getinfo('a.html').date_time)
+            self.assertEqual(b'page', zip.read('a.html'))
+        data = export(static.TarWriter, os.path.join(tmpdir, 'a.tar.gz'))
+        # Neither does the gzip header have the time of the export.
+        self.assertEqual(static.ARCHIVE_EPOCH,
+                         struct.unpack('<I', data[4:8])[0])
+
+        os.environ['SOURCE_DATE_EPOCH'] = '1500000000'
+        path = os.path.join(tmpdir, 'epoch')
+        export(static.TarWriter, path + '.tar.gz')
+        with tarfile.open(path + '.tar.gz') as tar:
+            self.assertEqual(1500000000, tar.getmember('a.html').mtime)
+            self.assertEqual(b'page', tar.extractfile('a.html').read())
+        export(static.ZipWriter, path + '.zip')
+        with zipfile.ZipFile(path + '.zip') as zip:
+            self.assertEqual((2017, 7, 14, 2, 40, 0),
+                             zip.getinfo('a.html').date_time)
+
+    def test_WriteBehind(self):
+        tmpdir = self._tempdir()
+        writer = static.WriteBehind(static.DirectoryWriter(tmpdir),
+                                    maxsize=1)
+        for i in range(3):
+            writer.write('a/b/%i.html' % i, b'page')
+        writer.close()
+        self.assertEqual(['0.html', '1.html', '2.html'],
+                         sorted(os.listdir(os.path.join(tmpdir, 'a', 'b'))))
+
+        class Failing:
+            complete = None
+
+            def write(self, name, data):
+                raise OSError('disk full')
+
+            def close(self, complete=True):
+                self.complete = complete
+
+        failing = Failing()
+        writer = static.WriteBehind(failing)
+        writer.write('a.html', b'page')
+        with self.assertRaises(OSError):
+            writer.close()
+        self.assertFalse(failing.complete)
+
+    def test_run_report(self):
+        import json
+        tmpdir = self._tempdir()
+        report_path = os.path.join(tmpdir, 'report.json')
+        page = '/++apidoc++/Code/zope/app/apidoc/apidoc/index.html'
+        maker = static.main(['--max-runtime', '2', '--startpage', page,
+                             '--report', report_path, '--report-top', '3',
+                             os.path.join(tmpdir, 'dir')])
+
+        with open(report_path) as f:
+            report = json.load(f)
+        self.assertEqual(len(maker.stats), report['pages'])
+        entry = report['urls']['http://localhost' + page]
+        self.assertEqual('zope.app.apidoc', entry['package'])
+        self.assertGreater(entry['render'], 0)
+        self.assertGreater(entry['bytes'], 0)
+        self.assertGreater(entry['links'], 0)
+        self.assertLessEqual(len(report['slowest_pages']), 3)
+        costs = [package['render'] + package['parse']
+                 for package in report['slowest_packages']]
+        self.assertLessEqual(len(costs), 3)
+        self.assertEqual(sorted(costs, reverse=True), costs)
+
+    def test_makeReport(self):
+        def entry(render, package=None):
+            return {'render': render, 'parse': 0.5, 'bytes': 10,
+                    'links': 2, 'package': package}
+
+        report = static.makeReport({
+            'http://localhost/a': entry(1.0, 'a'),
+            'http://localhost/b': entry(3.0, 'a'),
+            'http://localhost/c': entry(2.0, 'c'),
+            'http://localhost/d': entry(0.0),
+        }, top=2)
+
+        self.assertEqual(4, report['pages'])
+        self.assertEqual(6.0, report['totals']['render'])
+        self.assertEqual(40, report['totals']['bytes'])
+        self.assertEqual({'p50': 1.0, 'p90': 3.0, 'p95': 3.0, 'p99': 3.0,
+                          'p100': 3.0}, report['percentiles']['render'])
+        self.assertEqual(['http://localhost/b', 'http://localhost/c'],
+                         [page['url'] for page in report['slowest_pages']])
+        self.assertEqual(
+            [{'package': 'a', 'pages': 2, 'render': 4.0, 'parse': 1.0,
+              'bytes': 20, 'links': 4},
+             {'package': 'c', 'pages': 1, 'render': 2.0, 'parse': 0.5,
+              'bytes': 10, 'links': 2}],
+            report['slowest_packages'])
+
+    def test_packageForURL(self):
+        # Only the URL counts, the modules need not be imported.
+        code = 'http://localhost/++apidoc++/Code/'
+        for path, package in [
+                ('notimported/index.html', 'notimported'),
+                ('notimported/sub/index.html', 'notimported'),
+                ('notimported/sub/module/index.html', 'notimported.sub'),
+                ('notimported/sub/module/Class/index.html',
+                 'notimported.sub'),
+                ('notimported/sub/README.rst/index.html', 'notimported.sub'),
+                ('index.html', None)]:
+            self.assertEqual(package, static._packageForURL(code + path))
+        self.assertIsNone(static._packageForURL(
+            'http://localhost/++apidoc++/Interface/index.html'))
+
+    def test_run_sitemap(self):
+        tmpdir = self._tempdir()
+        page = '/++apidoc++/Code/zope/app/apidoc/apidoc/index.html'
+        maker = static.main(['--max-runtime', '1', '--sitemap',
+                             '--startpage', page, tmpdir])
+
+        queued = {link.absoluteURL for link in maker.linkQueue}
+        queued.update(maker.visited)
+        root = 'http://localhost/++apidoc++/'
+        for path in ('Code/zope/app/apidoc/apidoc/APIDocumentation/',
+                     'ZCML/ALL/configure/',
+                     'Interface/zope.app.apidoc.interfaces.'
+                     'IDocumentationModule/'):
+            self.assertIn(root + path + 'index.html', queued)
+
+        with self.assertRaises(SystemExit):
+            static.get_options(['--webserver', '--sitemap', 'target'])
+        with self.assertRaises(SystemExit):
+            static.get_options(['--webserver', '--incremental', 'target'])
+        with self.assertRaises(SystemExit):
+            static.get_options(['--webserver', '--direct', 'target'])
+
+    def test_run_direct(self):
+        tmpdir = self._tempdir()
+        page = '/++apidoc++/Code/zope/app/apidoc/apidoc/index.html'
+        contents = {}
+        for kind in ('publisher', 'direct'):
+            args = ['--max-runtime', '1', '--startpage', page,
+                    os.path.join(tmpdir, kind)]
+            if kind == 'direct':
+                args.append('--direct')
+            static.main(args)
+            with open(os.path.join(tmpdir, kind, page[1:])) as f:
+                contents[kind] = f.read()
+
+        self.assertIn('APIDocumentation', contents['direct'])
+        self.assertEqual(contents['publisher'], contents['direct'])
+
+        # Missing pages are bad links.
+        maker = static.main([
+            '--max-runtime', '1', '--direct', '--startpage',
+            '/++apidoc++/Code/no/such/module/index.html',
+            os.path.join(tmpdir, 'missing')])
+        self.assertEqual(1, maker.linkErrors)
+        self.assertEqual(0, maker.otherErrors)
+
+    def test_direct_redirects(self):
+        from zope.publisher.browser import BrowserResponse
+
+        class Browser(static.DirectBrowser):
+            maxRedirects = 3
+
+            def __init__(self):
+                self.rendered = []
+
+            def _render(self, url):
+                self.rendered.append(url)
+                response = BrowserResponse()
+                if len(self.rendered) < self.target:
+                    response.setStatus(302)
+                    response.setHeader('Location', 'next/')
+                response.setHeader('Content-Type', 'text/html')
+                response.setResult('done')
+                return response
+
+        browser = Browser()
+        browser.target = 3
+        browser.open('http://localhost/')
+        self.assertEqual('http://localhost/next/next/', browser.url)
+        self.assertEqual('done', browser.contents)
+
+        browser = Browser()
+        browser.target = 4
+        with self.assertRaises(HTTPError) as context:
+            browser.open('http://localhost/')
+        self.assertEqual(302, context.exception.code)
+        self.assertEqual(3, len(browser.rendered))
+
+    def test_run_hash_assets_publisher(self):
+        tmpdir = self._tempdir()
+        page = '/++apidoc++/Code/zope/app/apidoc/apidoc/index.html'
+        static.main(['--max-runtime', '1', '--startpage', page,
+                     '--hash-assets', tmpdir])
+
+        static_dir = os.path.join(tmpdir, static.ASSETS_DIR)
+        names = [name for digest in os.listdir(static_dir)
+                 for name in os.listdir(os.path.join(static_dir, digest))]
+        self.assertIn('apidoc.css', names)
+        with open(os.path.join(tmpdir, page[1:])) as f:
+            self.assertIn('../../../../../' + static.ASSETS_DIR, f.read())
+
+    def test_incremental(self):
+        tmpdir = self._tempdir()
+        url = 'http://localhost/++apidoc++/Code/zope/app/apidoc/apidoc/'
+        args = ['--max-runtime', '10', '--incremental',
+                '--startpage', url[16:], tmpdir]
+
+        maker = static.main(args)
+        self.assertEqual(0, maker.reused)
+        manifest = static.Manifest.load(
+            os.path.join(tmpdir, static.MANIFEST_NAME))
+        entry = manifest.pages[url + 'index.html']
+        self.assertIn(sys.modules[APIDocumentation.__module__].__file__,
+                      entry['sources'])
+
+        # Nothing changed, so the second run does not need to
+        # retrieve the page again.
+        maker = static.main(args)
+        self.assertGreater(maker.reused, 0)
+        self.assertEqual(entry, maker._pages[url + 'index.html'])
+
+    def test_incremental_new_module(self):
+        # A module added to a package between two runs is exported.
+        tmpdir = self._tempdir()
+        package = os.path.join(tmpdir, 'src', 'zope', 'apidoctestpkg')
+        os.makedirs(package)
+        for name in ('__init__.py', 'first.py'):
+            with open(os.path.join(package, name), 'w') as f:
+                f.write('"""A module."""\n')
+        # zope is a namespace package whose path does not follow sys.path.
+        self.addCleanup(setattr, zope, '__path__', zope.__path__)
+        zope.__path__ = list(zope.__path__) + [os.path.dirname(package)]
+        for name in ('', '.first', '.second'):
+            self.addCleanup(sys.modules.pop, 'zope.apidoctestpkg' + name,
+                            None)
+        # The Code browser only shows modules that were imported.
+        importlib.invalidate_caches()
+        importlib.import_module('zope.apidoctestpkg.first')
+
+        target = os.path.join(tmpdir, 'dir')
+        args = ['--incremental', '--only', 'zope.apidoctestpkg',
+                '--startpage', '/++apidoc++/Code/zope/apidoctestpkg/',
+                target]
+        static.main(args)
+        code = os.path.join(target, '++apidoc++', 'Code', 'zope',
+                            'apidoctestpkg')
+        self.assertEqual(['first', 'index.html'],
+                         sorted(os.listdir(code)))
+
+        with open(os.path.join(package, 'second.py'), 'w') as f:
+            f.write('"""Another module."""\n')
+        importlib.invalidate_caches()
+        importlib.import_module('zope.apidoctestpkg.second')
+        # Make sure the directory looks modified on coarse file systems.
+        stat = os.stat(package)
+        os.utime(package, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        maker = static.main(args)
+        self.assertIn('second', os.listdir(code))
+        self.assertNotIn(
+            'http://localhost/++apidoc++/Code/zope/apidoctestpkg/index.html',
+            [url for url in maker._pages
+             if maker._pages[url] is maker._previousPages.get(url)])
+
+    def test_resume(self):
+        tmpdir = self._tempdir()
+        maker = static.main(['--max-runtime', '1', tmpdir])
+        self.assertTrue(maker.linkQueue)
+        self.assertTrue(
+            os.path.exists(os.path.join(tmpdir, static.CHECKPOINT_NAME)))
+
+        resumed = static.main(['--max-runtime', '1', '--resume', tmpdir])
+        self.assertGreater(resumed.counter, maker.counter)
+        self.assertLess(maker.visited, resumed.visited)
+
     def test_run_404(self):
         tmpdir = self._tempdir()
         # Fetch a 404 page
@@ -372,6 +775,61 @@ class TestStatic(unittest.TestCase):
                 "http://external.site/",
                 "http://localhost/").isLocalURL())
 
+    def test_findLinkAttributes(self):
+        contents = (
+            '<html><head><script src="s.js"></script>'
+            '<script>var a = \'<a href="script">\';</script>'
+            '<!-- <a href="comment"> --></head><body>'
+            '<a title="href=title" href="one?a=1&amp;b=2">1</a>'
+            '<a name="anchor">'
+            "<img alt='a>b' src=two.png />"
+            '</body></html>')
+        found = list(static.findLinkAttributes(contents))
+        self.assertEqual(['s.js', 'one?a=1&b=2', 'two.png'],
+                         [url for _start, _end, url in found])
+        start, end, _url = found[1]
+        self.assertEqual('one?a=1&amp;b=2', contents[start:end])
+
+    def test_rewriteLinks(self):
+        contents = ('<a href="http://localhost/a">a</a> http://localhost/a'
+                    ' <a href="http://localhost/ab">ab</a>')
+        rewritten = static.rewriteLinks(
+            contents,
+            lambda url: 'a/index.html' if url.endswith('/a') else None)
+        # Only the link itself is rewritten, not the text or longer URLs.
+        self.assertEqual('<a href="a/index.html">a</a> http://localhost/a'
+                         ' <a href="http://localhost/ab">ab</a>',
+                         rewritten)
+
+    def test_LinkFrontier(self):
+        frontier = static.LinkFrontier()
+        self.assertTrue(frontier.add(static.Link('a', 'http://localhost/')))
+        self.assertTrue(frontier.add(static.Link('b', 'http://localhost/')))
+        # Every URL is queued once only, also after it was retrieved.
+        self.assertFalse(frontier.add(static.Link('a', 'http://localhost/')))
+        self.assertEqual(2, len(frontier))
+        self.assertEqual('http://localhost/a/index.html',
+                         frontier.pop().absoluteURL)
+        self.assertFalse(frontier.add(static.Link('a', 'http://localhost/')))
+        frontier.markSeen(['http://localhost/c/index.html'])
+        self.assertFalse(frontier.add(static.Link('c', 'http://localhost/')))
+        self.assertEqual(['http://localhost/b/index.html'],
+                         [link.absoluteURL for link in frontier])
+        # Links lost by a worker are queued again.
+        link = static.Link('a', 'http://localhost/')
+        self.assertTrue(frontier.requeue(link))
+        self.assertEqual(2, len(frontier))
+
+    def test_LinkFrontier_priority(self):
+        frontier = static.LinkFrontier(static.indexPagesFirst)
+        frontier.add(static.Link('a.png', 'http://localhost/'))
+        frontier.add(static.Link('b/', 'http://localhost/'))
+        self.assertEqual('http://localhost/b/index.html',
+                         frontier.pop().absoluteURL)
+        self.assertEqual('http://localhost/a.png',
+                         frontier.pop().absoluteURL)
+        self.assertRaises(IndexError, frontier.pop)
+
     def test_OnlineBrowser(self):
         browser = static.OnlineBrowser.begin()
         browser.setUserAndPassword('user', 'password')
@@ -384,6 +842,296 @@ class TestStatic(unittest.TestCase):
 
         browser.end()
 
+    def _serve(self, pages):
+        # A stand-in for a Web server in front of Zope 3, serving *pages*.
+        import socketserver
+        import threading
+        from wsgiref import simple_server
+
+        requests = []
+
+        def app(environ, start_response):
+            requests.append(environ)
+            path = environ['PATH_INFO']
+            if path not in pages:
+                start_response('404 Not Found', [('Content-Type',
+                                                  'text/plain')])
+                return [b'Not Found']
+            content_type, body = pages[path]
+            if content_type == 'redirect':
+                start_response('302 Found', [('Location', body)])
+                return [b'']
+            start_response('200 OK', [('Content-Type', content_type)])
+            return [body.encode('utf-8')]
+
+        class Server(socketserver.ThreadingMixIn,
+                     simple_server.WSGIServer):
+            daemon_threads = True
+
+        class Handler(simple_server.WSGIRequestHandler):
+            def log_message(self, *args):
+                pass
+
+        server = simple_server.make_server('127.0.0.1', 0, app,
+                                           server_class=Server,
+                                           handler_class=Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return 'http://127.0.0.1:%i/' % server.server_port, requests
+
+    def test_run_webserver(self):
+        tmpdir = self._tempdir()
+        html = 'text/html;charset=utf-8'
+        url, requests = self._serve({
+            '/++apidoc++/static.html': (
+                html, '<a href="a.html#top">A</a>'
+                      '<a href="/++apidoc++/b/">B</a>'
+                      '<a href="http://example.com/">elsewhere</a>'
+                      '<a href="missing.html">missing</a>'),
+            '/++apidoc++/a.html': (html, '<a href="static.html">up</a>'),
+            '/++apidoc++/b/index.html': (html, '<img src="../a.html">'),
+            '/@@/varrow.png': ('image/png', 'PNG'),
+        })
+
+        maker = static.main([tmpdir, '--webserver', '--url', url,
+                             '--concurrency', '3', '--max-runtime', '10'])
+
+        apidoc = os.path.join(tmpdir, '++apidoc++')
+        with open(os.path.join(apidoc, 'static.html')) as f:
+            self.assertEqual(
+                '<a href="../++apidoc++/a.html#top">A</a>'
+                '<a href="../++apidoc++/b/index.html">B</a>'
+                '<a href="http://example.com/">elsewhere</a>'
+                '<a href="../++apidoc++/missing.html">missing</a>',
+                f.read())
+        with open(os.path.join(apidoc, 'b', 'index.html')) as f:
+            self.assertEqual('<img src="../../++apidoc++/a.html">',
+                             f.read())
+        with open(os.path.join(tmpdir, '@@', 'varrow.png')) as f:
+            self.assertEqual('PNG', f.read())
+        self.assertEqual(10, maker.counter)
+        # missing.html and the other default additional URLs.
+        self.assertEqual(6, maker.linkErrors)
+        self.assertEqual(maker.counter, len(requests))
+        self.assertEqual('Basic bWdyOm1ncnB3',
+                         requests[0]['HTTP_AUTHORIZATION'])
+
+    def test_run_webserver_bad_charset(self):
+        tmpdir = self._tempdir()
+        url, requests = self._serve({
+            '/++apidoc++/static.html': (
+                'text/html;charset=utf-8',
+                '<a href="a.html">A</a><a href="b.html">B</a>'),
+            '/++apidoc++/a.html': ('text/html;charset=unknown', 'A'),
+            '/++apidoc++/b.html': ('text/html;charset=ascii', '\xe9'),
+        })
+
+        maker = static.main([tmpdir, '--webserver', '--url', url,
+                             '--max-runtime', '10'])
+
+        self.assertIn(url + '++apidoc++/a.html', maker.visited)
+        self.assertIn(url + '++apidoc++/b.html', maker.visited)
+        # Both pages, and the default additional URLs.
+        self.assertEqual(8, maker.linkErrors)
+        self.assertEqual(0, maker.otherErrors)
+
+    def test_run_hash_assets(self):
+        import gzip
+        tmpdir = self._tempdir()
+        html = 'text/html;charset=utf-8'
+        url, requests = self._serve({
+            '/++apidoc++/static.html': (
+                html, '<link href="/@@/apidoc.css" rel="stylesheet">'
+                      '<a href="sub/page.html">sub</a>'),
+            '/++apidoc++/sub/page.html': (
+                html, '<link href="../../@@/apidoc.css" rel="stylesheet">'
+                      '<script src="/@@/utilities.js"></script>'
+                      '<img src="/@@/varrow.png">'),
+            '/@@/apidoc.css': ('text/css', 'body {}'),
+            '/@@/utilities.js': ('text/javascript', 'var x;'),
+            '/@@/varrow.png': ('image/png', 'PNG'),
+        })
+
+        static.main([tmpdir, '--webserver', '--url', url, '--hash-assets',
+                     '--gzip', '--max-runtime', '10'])
+
+        css = static.getAssetName('/@@/apidoc.css', b'body {}')
+        js = static.getAssetName('/@@/utilities.js', b'var x;')
+        self.assertTrue(css.startswith('_static/'))
+        self.assertTrue(css.endswith('/apidoc.css'))
+        with open(os.path.join(tmpdir, css)) as f:
+            self.assertEqual('body {}', f.read())
+        with gzip.open(os.path.join(tmpdir, js + '.gz')) as f:
+            self.assertEqual(b'var x;', f.read())
+        # The resources are retrieved only once, and not stored by URL.
+        paths = [environ['PATH_INFO'] for environ in requests]
+        self.assertEqual(1, paths.count('/@@/apidoc.css'))
+        self.assertFalse(os.path.exists(
+            os.path.join(tmpdir, '@@', 'apidoc.css')))
+
+        page = os.path.join(tmpdir, '++apidoc++', 'sub', 'page.html')
+        expected = ('<link href="../../%s" rel="stylesheet">'
+                    '<script src="../../%s"></script>'
+                    '<img src="../../@@/varrow.png">' % (css, js))
+        with open(page) as f:
+            self.assertEqual(expected, f.read())
+        with gzip.open(page + '.gz') as f:
+            self.assertEqual(expected, f.read().decode('utf-8'))
+        self.assertFalse(os.path.exists(
+            os.path.join(tmpdir, '@@', 'varrow.png.gz')))
+
+    def test_run_only_menus(self):
+        # The frames of static.html reach the module menus through the
+        # module list.
+        tmpdir = self._tempdir()
+        static.main(['--only', 'zope.app.apidoc.codemodule.browser',
+                     tmpdir])
+
+        apidoc = os.path.join(tmpdir, '++apidoc++')
+        for name in ('Code', 'Interface', 'ZCML'):
+            self.assertTrue(os.path.exists(
+                os.path.join(apidoc, name, '@@staticmenu.html')), name)
+        code = os.path.join(apidoc, 'Code', 'zope', 'app', 'apidoc')
+        self.assertTrue(os.path.exists(os.path.join(
+            code, 'codemodule', 'browser', 'index.html')))
+        self.assertFalse(os.path.exists(os.path.join(code, 'index.html')))
+
+    def test_run_only(self):
+        tmpdir = self._tempdir()
+        html = 'text/html;charset=utf-8'
+        url, requests = self._serve({
+            '/++apidoc++/static.html': (
+                html, '<a href="Code/@@staticmenu.html">menu</a>'),
+            '/++apidoc++/Code/@@staticmenu.html': (
+                html, '<a href="a/index.html">a</a>'
+                      '<a href="a/b/index.html">a.b</a>'),
+            '/++apidoc++/Code/a/b/index.html': (
+                html, '<a href="c/index.html">a.b.c</a>'
+                      '<a href="../index.html#x">a</a>'
+                      '<a href="../../../Interface/I/index.html">I</a>'
+                      '<link href="/@@/apidoc.css" rel="stylesheet">'),
+            '/++apidoc++/Code/a/b/c/index.html': (html, 'a.b.c'),
+            '/++apidoc++/Interface/I/index.html': (
+                html, '<a href="../J/index.html">J</a>'),
+            '/@@/apidoc.css': ('text/css', 'body {}'),
+        })
+
+        static.main([tmpdir, '--webserver', '--url', url, '--only', 'a.b',
+                     '--external-url', 'https://example.com/docs',
+                     '--max-runtime', '10'])
+
+        paths = {environ['PATH_INFO'] for environ in requests}
+        for path in ('/++apidoc++/static.html',
+                     '/++apidoc++/Code/@@staticmenu.html',
+                     '/++apidoc++/Code/a/b/index.html',
+                     '/++apidoc++/Code/a/b/c/index.html',
+                     '/++apidoc++/Interface/I/index.html',
+                     '/@@/apidoc.css'):
+            self.assertIn(path, paths)
+        self.assertNotIn('/++apidoc++/Code/a/index.html', paths)
+        self.assertNotIn('/++apidoc++/Interface/J/index.html', paths)
+
+        external = 'https://example.com/docs/++apidoc++/'
+        with open(os.path.join(tmpdir, '++apidoc++', 'Code', 'a', 'b',
+                               'index.html')) as f:
+            self.assertEqual(
+                '<a href="../../../../++apidoc++/Code/a/b/c/index.html">'
+                'a.b.c</a>'
+                '<a href="%sCode/a/index.html#x">a</a>'
+                '<a href="../../../../++apidoc++/Interface/I/index.html">'
+                'I</a>'
+                '<link href="../../../../@@/apidoc.css" rel="stylesheet">'
+                % external, f.read())
+        with open(os.path.join(tmpdir, '++apidoc++', 'Interface', 'I',
+                               'index.html')) as f:
+            self.assertEqual(
+                '<a href="%sInterface/J/index.html">J</a>' % external,
+                f.read())
+
+    def test_AsyncFetcher_rate(self):
+        import asyncio
+        import time
+        url, requests = self._serve({'/': ('text/plain', 'x')})
+        fetcher = static.AsyncFetcher(concurrency=4, rate=20)
+
+        async def fetch_all():
+            try:
+                return await asyncio.gather(
+                    *[fetcher.fetch(url) for _ in range(5)])
+            finally:
+                await fetcher.close()
+
+        start = time.time()
+        pages = asyncio.run(fetch_all())
+        # Five requests at 20 per second take at least 0.2 seconds.
+        self.assertGreaterEqual(time.time() - start, 0.19)
+        self.assertEqual([b'x'] * 5, [page.contents for page in pages])
+        self.assertEqual(5, len(requests))
+
+    def test_AsyncFetcher_redirects(self):
+        import asyncio
+        url, requests = self._serve({
+            '/a': ('redirect', '/b'),
+            '/b': ('redirect', '/c'),
+            '/c': ('text/plain', 'c'),
+            '/loop': ('redirect', '/loop'),
+        })
+        fetcher = static.AsyncFetcher()
+        fetcher.maxRedirects = 2
+
+        async def fetch(path):
+            try:
+                return await fetcher.fetch(url + path)
+            finally:
+                await fetcher.close()
+
+        page = asyncio.run(fetch('a'))
+        self.assertEqual(url + 'c', page.url)
+        self.assertEqual(b'c', page.contents)
+
+        # The last redirect is not taken for the page.
+        del requests[:]
+        with self.assertRaises(HTTPError) as exc:
+            asyncio.run(fetch('loop'))
+        self.assertEqual(302, exc.exception.code)
+        self.assertEqual(3, len(requests))
+
+    def test_AsyncFetcher_chunked(self):
+        # A server keeping the connection alive, with chunked bodies.
+        import asyncio
+        requests = []
+
+        async def handle(reader, writer):
+            while await reader.readuntil(b'\r\n\r\n'):
+                requests.append(writer)
+                writer.write(b'HTTP/1.1 200 OK\r\n'
+                             b'Content-Type: text/html;charset=utf-8\r\n'
+                             b'Transfer-Encoding: chunked\r\n\r\n'
+                             b'3\r\n<p>\r\n'
+                             b'2;x=y\r\n\xc3\xa9\r\n0\r\n\r\n')
+                await writer.drain()
+
+        async def fetch_twice():
+            server = await asyncio.start_server(handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            fetcher = static.AsyncFetcher()
+            try:
+                url = 'http://127.0.0.1:%i/' % port
+                return [await fetcher.fetch(url), await fetcher.fetch(url)]
+            finally:
+                await fetcher.close()
+                server.close()
+
+        pages = asyncio.run(fetch_twice())
+        self.assertEqual(['<p>\xe9'] * 2, [page.contents for page in pages])
+        self.assertTrue(pages[0].isHtml)
+        # The connection was kept alive.
+        self.assertEqual(2, len(requests))
+        self.assertIs(requests[0], requests[1])
+
     def test_mutually_exclusive_group(self):
         tmpdir = self._tempdir()
 
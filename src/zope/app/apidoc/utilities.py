@@ -16,10 +16,14 @@
 """
 __docformat__ = 'restructuredtext'
 
+import collections
+import functools
+import hashlib
 import inspect
 import os.path
 import re
 import sys
+import threading
 import types
 
 import zope.i18nmessageid
@@ -28,15 +32,17 @@ from zope.component import getMultiAdapter
 from zope.container.interfaces import IReadContainer
 from zope.interface import implementedBy
 from zope.interface import implementer
+from zope.proxy import isProxy
 from zope.publisher.browser import TestRequest
 from zope.security.checker import Global
 from zope.security.checker import getCheckerForInstancesOf
 from zope.security.interfaces import INameBasedChecker
 from zope.security.proxy import isinstance
 from zope.security.proxy import removeSecurityProxy
+from zope.testing.cleanup import addCleanUp
 
 import zope.app
-from zope.app.apidoc.classregistry import IGNORE_MODULES
+from zope.app.apidoc.classregistry import isIgnored
 from zope.app.apidoc.classregistry import safe_import
 
 
@@ -49,6 +55,15 @@ space_re = re.compile(r'\n^( *)\S', re.M)
 
 _marker = object()
 
+# The attribute of parents keeping their located copies.
+_LOCATED_COPIES = '_v_apidocLocatedCopies'
+
+# The attribute of class declarations keeping their attribute interfaces.
+_ATTRIBUTE_INTERFACES = '_v_apidocAttributeInterfaces'
+
+#: The permission tables of the checkers, by the identity of the checker.
+_permissionTables = {}
+
 
 def relativizePath(path):
     """Convert the path to a relative form."""
@@ -124,6 +139,38 @@ class DocumentationModuleBase(ReadContainerBase):
         return located
 
 
+def cachedLocatedCopy(withParentAndName):
+    """Decorate a ``withParentAndName`` method to reuse the copies it makes.
+
+    The copy of an object with a parent and a name is kept on the parent,
+    keyed by the identity of the object and the name, so that asking for it
+    again, for example when the same branch is traversed twice, returns the
+    same copy instead of a new one. The copies live as long as the parent.
+    Proxied parents don't keep copies.
+
+    An object whose contents can be built again, after its copies were made,
+    counts the times in its ``_copyGeneration`` attribute; its copies of
+    another generation are not reused.
+    """
+    @functools.wraps(withParentAndName)
+    def wrapper(self, parent, name):
+        if isProxy(parent):
+            return withParentAndName(self, parent, name)
+        try:
+            copies = parent.__dict__.setdefault(_LOCATED_COPIES, {})
+        except AttributeError:
+            return withParentAndName(self, parent, name)
+        key = (id(self), name)
+        generation = getattr(self, '_copyGeneration', None)
+        entry = copies.get(key)
+        # Keeping the original pins its id.
+        if entry is None or entry[0] is not self or entry[1] != generation:
+            entry = copies[key] = (self, generation,
+                                   withParentAndName(self, parent, name))
+        return entry[2]
+    return wrapper
+
+
 def getPythonPath(obj):
     """Return the path of the object in standard Python notation.
 
@@ -158,9 +205,8 @@ def isReferencable(path):
 
     # There are certain paths that we do not want to reference, most often
     # because they are outside the scope of this documentation
-    for exclude_name in IGNORE_MODULES:
-        if path.startswith(exclude_name):
-            return False
+    if isIgnored(path):
+        return False
     split_path = path.rsplit('.', 1)
     if len(split_path) == 2:
         module_name, obj_name = split_path
@@ -198,23 +244,72 @@ def _evalId(id):
     return id
 
 
+def getPermissionTable(checker):
+    """Get the permissions of the attributes protected by a checker.
+
+    Return a dictionary mapping the attribute names to the ids of their
+    read and write permissions, which are None if there is no permission.
+    The table is made once per checker, and again when it protects more
+    attributes. None is returned if the checker does not keep dictionaries
+    of permissions.
+    """
+    get_permissions = getattr(checker, 'get_permissions', None)
+    if get_permissions is None or not INameBasedChecker.providedBy(checker):
+        return None
+    set_permissions = getattr(checker, 'set_permissions', None) or {}
+    size = (len(get_permissions), len(set_permissions))
+    cached = _permissionTables.get(id(checker))
+    if cached is not None and cached[0] is checker and cached[1] == size:
+        return cached[2]
+    table = {name: (_evalId(permission), None)
+             for name, permission in get_permissions.items()}
+    for name, permission in set_permissions.items():
+        table[name] = (table.get(name, (None,))[0], _evalId(permission))
+    _permissionTables[id(checker)] = (checker, size, table)
+    return table
+
+
+def getAllPermissionIds(names=None, checker=_marker, klass=_marker):
+    """Get the permissions of several attributes.
+
+    Return a dictionary mapping the names to the permission entries of
+    :func:`getPermissionIds`. If no names are given, they are the public
+    attributes of *klass*, or the attributes protected by *checker*.
+    """
+    assert (klass is _marker) != (checker is _marker)
+
+    if klass is not _marker:
+        checker = getCheckerForInstancesOf(klass)
+        if names is None:
+            names = getPublicAttributes(klass)
+
+    table = getPermissionTable(checker)
+    if names is None:
+        names = sorted(table or ())
+
+    if table is not None:
+        permissions = {name: table.get(name, (None, None)) for name in names}
+    elif checker is not None and INameBasedChecker.providedBy(checker):
+        permissions = {name: (_evalId(checker.permission_id(name)),
+                              _evalId(checker.setattr_permission_id(name)))
+                       for name in names}
+    else:
+        return {name: {'read_perm': None, 'write_perm': None}
+                for name in names}
+
+    return {name: {'read_perm': read or _('n/a'),
+                   'write_perm': write or _('n/a')}
+            for name, (read, write) in permissions.items()}
+
+
 def getPermissionIds(name, checker=_marker, klass=_marker):
     """Get the permissions of an attribute."""
     assert (klass is _marker) != (checker is _marker)
-    entry = {}
 
     if klass is not _marker:
         checker = getCheckerForInstancesOf(klass)
 
-    if checker is not None and INameBasedChecker.providedBy(checker):
-        entry['read_perm'] = _evalId(checker.permission_id(name)) \
-            or _('n/a')
-        entry['write_perm'] = _evalId(checker.setattr_permission_id(name)) \
-            or _('n/a')
-    else:
-        entry['read_perm'] = entry['write_perm'] = None
-
-    return entry
+    return getAllPermissionIds((name,), checker)[name]
 
 
 def _checkFunctionType(func):
@@ -249,6 +344,34 @@ def getPublicAttributes(obj):
     return attrs
 
 
+def getAttributeInterfaces(klass):
+    """Map the attribute names to the interfaces of the class declaring them.
+
+    The interfaces are the ones the class implements and their bases. The
+    map is kept on the ``implementedBy(klass)`` declaration and is made
+    again when the declaration changes.
+    """
+    spec = implementedBy(klass)
+    iro = spec.__iro__
+    cached = getattr(spec, _ATTRIBUTE_INTERFACES, None)
+    if cached is not None and cached[0] is iro:
+        return cached[1]
+    interfaces = {}
+    for interface in spec:
+        interfaces[interface] = 1
+        for base in interface.getBases():
+            interfaces[base] = 1
+    result = {}
+    for interface in interfaces:
+        for name in interface.names():
+            result.setdefault(name, interface)
+    try:
+        setattr(spec, _ATTRIBUTE_INTERFACES, (iro, result))
+    except AttributeError:  # pragma: no cover
+        pass
+    return result
+
+
 def getInterfaceForAttribute(name, interfaces=_marker, klass=_marker,
                              asPath=True):
     """Determine the interface in which an attribute is defined."""
@@ -258,21 +381,14 @@ def getInterfaceForAttribute(name, interfaces=_marker, klass=_marker,
         raise ValueError("must specify only one of interfaces and klass")
 
     if interfaces is _marker:
-        direct_interfaces = list(implementedBy(klass))
-        interfaces = {}
-        for interface in direct_interfaces:
-            interfaces[interface] = 1
-            for base in interface.getBases():
-                interfaces[base] = 1
-        interfaces = interfaces.keys()
-
-    for interface in interfaces:
-        if name in interface.names():
-            if asPath:
-                return getPythonPath(interface)
-            return interface
+        interface = getAttributeInterfaces(klass).get(name)
+    else:
+        interface = next((interface for interface in interfaces
+                          if name in interface.names()), None)
 
-    return None
+    if interface is not None and asPath:
+        return getPythonPath(interface)
+    return interface
 
 
 def columnize(entries, columns=3):
@@ -321,6 +437,76 @@ def dedentString(text):
     return re.compile('\n {%i}' % dedent, re.M).sub('\n', text)
 
 
+class RenderCache:
+    """A bounded cache of rendered texts.
+
+    It keeps at most `maxEntries` texts, of at most `maxBytes` bytes in
+    UTF-8 together, and drops the least recently used ones to make room.
+    It counts the hits, misses and evictions, and can be used from several
+    threads.
+    """
+
+    def __init__(self, maxEntries=1000, maxBytes=8 * 1024 * 1024):
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Drop all texts and reset the counters."""
+        with self._lock:
+            self._entries = collections.OrderedDict()
+            self.bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the text kept under key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, text):
+        """Keep the text under key, unless it is larger than the cache."""
+        size = len(text.encode('utf-8', 'surrogatepass'))
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            if size > self.maxBytes or self.maxEntries < 1:
+                return
+            self._entries[key] = (text, size)
+            self.bytes += size
+            while (len(self._entries) > self.maxEntries
+                   or self.bytes > self.maxBytes):
+                _, (_, dropped) = self._entries.popitem(last=False)
+                self.bytes -= dropped
+                self.evictions += 1
+
+    def getStatistics(self):
+        """Return the counters and the size of the cache."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+#: The cache of :func:`renderText`, keyed by the hash of the text and the
+#: source format.
+renderCache = RenderCache()
+
+
 def renderText(text, module=None, format=None, dedent=True):
     # dedent is ignored, we always dedent
     if not text:
@@ -340,6 +526,14 @@ def renderText(text, module=None, format=None, dedent=True):
     if isinstance(text, bytes):
         text = text.decode('utf-8', 'replace')
 
+    key = None
+    if isinstance(text, str):
+        digest = hashlib.sha1(text.encode('utf-8', 'surrogatepass'))
+        key = (digest.digest(), format)
+        rendered = renderCache.get(key)
+        if rendered is not None:
+            return rendered
+
     try:
         text = dedentString(text)
     except TypeError as e:
@@ -348,4 +542,15 @@ def renderText(text, module=None, format=None, dedent=True):
     source = createObject(format, text)
 
     renderer = getMultiAdapter((source, TestRequest()))
-    return renderer.render()
+    rendered = renderer.render()
+    if key is not None and isinstance(rendered, str):
+        renderCache.set(key, rendered)
+    return rendered
+
+
+def cleanUp():
+    _permissionTables.clear()
+    renderCache.clear()
+
+
+addCleanUp(cleanUp)